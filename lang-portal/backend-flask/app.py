@@ -1,77 +1,111 @@
+import importlib
+
 from flask import Flask, g
-from flask_cors import CORS
 
 from lib.db import Db
+from lib.cache import ResponseCache
+from lib.cors import ActivityOrigins
+from lib.jobs import Jobs
+from lib.learners import Learners
+from lib.serialization import provider_class
+from lib.tracing import QueryTracer
 
-import routes.words
-import routes.groups
-import routes.study_sessions
-import routes.dashboard
-import routes.study_activities
-
-def get_allowed_origins(app):
-    try:
-        cursor = app.db.cursor()
-        cursor.execute('SELECT url FROM study_activities')
-        urls = cursor.fetchall()
-        # Convert URLs to origins (e.g., https://example.com/app -> https://example.com)
-        origins = set()
-        for url in urls:
-            try:
-                from urllib.parse import urlparse
-                parsed = urlparse(url['url'])
-                origin = f"{parsed.scheme}://{parsed.netloc}"
-                origins.add(origin)
-            except:
-                continue
-        return list(origins) if origins else ["*"]
-    except:
-        return ["*"]  # Fallback to allow all origins if there's an error
+# Imported by create_app, so importing this module (e.g. for create_app in
+# tasks and benchmarks) doesn't pay for every route and its dependencies
+ROUTE_MODULES = [
+    'routes.words',
+    'routes.groups',
+    'routes.study_sessions',
+    'routes.dashboard',
+    'routes.study_activities',
+    'routes.export',
+    'routes.debug',
+]
 
 def create_app(test_config=None):
     app = Flask(__name__)
     
     if test_config is None:
         app.config.from_mapping(
-            DATABASE='words.db'
+            DATABASE='words.db',
+            DB_POOL_SIZE=8,
+            RESPONSE_CACHE_SIZE=512,
+            RESPONSE_CACHE_TTL=300,
+            SQL_TRACING=True,
+            SLOW_QUERY_MS=100,
+            SQL_TRACE_HISTORY=100,
+            DEBUG_QUERIES=False,
+            LEARNERS_DIR=None,
+            LEARNER_POOLS=64,
+            DEFAULT_LEARNER='default',
+            BACKUPS_DIR=None,
+            BACKUPS_KEEP=10,
+            REPLICA_DATABASE=None,
+            REPLICA_REFRESH=0,
+            JSON_PROVIDER='auto'
         )
+        # Any of these can be overridden with FLASK_<KEY>, e.g. FLASK_LEARNERS_DIR
+        app.config.from_prefixed_env()
     else:
         app.config.update(test_config)
     
-    # Initialize database first since we need it for CORS configuration
-    app.db = Db(database=app.config['DATABASE'])
+    # orjson when installed (see lib/serialization.py)
+    app.json = provider_class(app.config.get('JSON_PROVIDER', 'auto'))(app)
+    
+    # Connections are opened on first use, not here
+    app.db = Db(
+        database=app.config['DATABASE'],
+        pool_size=app.config.get('DB_POOL_SIZE', 8),
+        learners_dir=app.config.get('LEARNERS_DIR'),
+        max_learner_pools=app.config.get('LEARNER_POOLS', 64),
+        replica=app.config.get('REPLICA_DATABASE'),
+        replica_refresh=float(app.config.get('REPLICA_REFRESH', 0))
+    )
     
-    # Get allowed origins from study_activities table
-    allowed_origins = get_allowed_origins(app)
+    # One database per learner, picked by the X-Learner header
+    if app.config.get('LEARNERS_DIR'):
+        Learners(app)
     
-    # In development, add localhost to allowed origins
-    if app.debug:
-        allowed_origins.extend(["http://localhost:8080", "http://127.0.0.1:8080"])
+    # In-process response cache for read-heavy routes
+    app.cache = ResponseCache(
+        app.db,
+        max_entries=app.config.get('RESPONSE_CACHE_SIZE', 512),
+        ttl=app.config.get('RESPONSE_CACHE_TTL', 300)
+    )
+    
+    # Background maintenance jobs (e.g. clearing study history)
+    app.jobs = Jobs(app)
+    
+    # Per-request SQL tracing: Server-Timing headers, /debug/queries and the slow-query log
+    if app.config.get('SQL_TRACING', True):
+        app.db.tracer = QueryTracer(
+            app,
+            slow_query_ms=app.config.get('SLOW_QUERY_MS', 100),
+            history=app.config.get('SQL_TRACE_HISTORY', 100)
+        )
     
-    # Configure CORS with combined origins
-    CORS(app, resources={
-        r"/*": {
-            "origins": allowed_origins,
-            "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"]
-        }
-    })
+    # CORS for responses no route handles, allowing the study activities' origins
+    # (read on first use and refreshed when activities change)
+    ActivityOrigins(app)
 
-    # Close database connection
+    # Return the request's database connection to the pool
     @app.teardown_appcontext
     def close_db(exception):
         app.db.close()
 
     # load routes -----------
-    routes.words.load(app)
-    routes.groups.load(app)
-    routes.study_sessions.load(app)
-    routes.dashboard.load(app)
-    routes.study_activities.load(app)
+    for name in ROUTE_MODULES:
+        importlib.import_module(name).load(app)
     
     return app
 
-app = create_app()
+# The module-level app (for `flask run`, `uvicorn asgi:application` and
+# `from app import app`) is created on first access rather than on import
+def __getattr__(name):
+    if name == 'app':
+        globals()['app'] = create_app()
+        return globals()['app']
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    create_app().run(debug=True)
\ No newline at end of file
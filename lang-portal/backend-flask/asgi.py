@@ -0,0 +1,5 @@
+from app import app
+from lib.asgi import AsgiApp
+
+# ASGI entry point: uvicorn asgi:application
+application = AsgiApp(app, workers=app.config.get('ASGI_WORKERS'))
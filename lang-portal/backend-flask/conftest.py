@@ -0,0 +1,33 @@
+import os
+from contextlib import contextmanager
+
+import pytest
+
+# sql/, seed/ and the migrations are read relative to this directory
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+
+@contextmanager
+def backend_cwd():
+  previous = os.getcwd()
+  os.chdir(BACKEND_DIR)
+  try:
+    yield
+  finally:
+    os.chdir(previous)
+
+# A small synthetic database (see lib/synthetic.py), built once per test run
+@pytest.fixture(scope='session')
+def synthetic_database(tmp_path_factory):
+  from lib import synthetic
+  database = str(tmp_path_factory.mktemp('synthetic') / 'synthetic.db')
+  with backend_cwd():
+    synthetic.generate(database, words=5000, groups=20, sessions=2000, reviews=40000)
+  return database
+
+@pytest.fixture
+def app(synthetic_database):
+  from app import create_app
+  with backend_cwd():
+    app = create_app({'DATABASE': synthetic_database, 'RESPONSE_CACHE_SIZE': 0})
+    yield app
+    app.db.dispose()
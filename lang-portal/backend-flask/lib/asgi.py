@@ -0,0 +1,150 @@
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+# ASGI front end for the Flask app. The event loop owns the client
+# connections (thousands of idle or slow clients cost no threads) and each
+# request runs the unchanged WSGI app on a bounded thread pool, sized to the
+# database pool so requests queue for a thread rather than for a connection.
+# Response bodies are handed back in batches, so streamed exports stay
+# streamed.
+
+# A response body is passed to the event loop once this many bytes are ready
+# (or the body ends); most responses take a single hop
+SEND_BUFFER_SIZE = 64 * 1024
+
+class RequestTooLarge(Exception):
+  pass
+
+def build_environ(scope, body):
+  server = scope.get('server') or ('localhost', 80)
+  client = scope.get('client') or ('', 0)
+  environ = {
+    'REQUEST_METHOD': scope['method'],
+    'SCRIPT_NAME': scope.get('root_path', '').encode('utf-8').decode('latin-1'),
+    'PATH_INFO': scope['path'].encode('utf-8').decode('latin-1'),
+    'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+    'SERVER_NAME': str(server[0]),
+    'SERVER_PORT': str(server[1] if server[1] is not None else 80),
+    'SERVER_PROTOCOL': 'HTTP/' + scope.get('http_version', '1.1'),
+    'REMOTE_ADDR': client[0],
+    'REMOTE_PORT': str(client[1]),
+    'wsgi.version': (1, 0),
+    'wsgi.url_scheme': scope.get('scheme', 'http'),
+    'wsgi.input': io.BytesIO(body),
+    'wsgi.errors': sys.stderr,
+    'wsgi.multithread': True,
+    'wsgi.multiprocess': False,
+    'wsgi.run_once': False,
+  }
+  for name, value in scope.get('headers', []):
+    name = name.decode('latin-1').upper().replace('-', '_')
+    value = value.decode('latin-1')
+    if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+      key = name
+    else:
+      key = 'HTTP_' + name
+    environ[key] = environ[key] + ',' + value if key in environ else value
+  return environ
+
+class WsgiResponse:
+  def __init__(self, app, environ):
+    self.status = None
+    self.headers = None
+    self.iterable = app(environ, self.start_response)
+    self.iterator = iter(self.iterable)
+    self.closed = False
+
+  def start_response(self, status, headers, exc_info=None):
+    if exc_info and self.status is not None:
+      raise exc_info[1].with_traceback(exc_info[2])
+    self.status = int(status.split(' ', 1)[0])
+    self.headers = [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+
+  # Next batch of the body and whether the body has ended (the response is
+  # then closed on the same hop)
+  def read(self):
+    chunks = []
+    size = 0
+    for chunk in self.iterator:
+      if chunk:
+        chunks.append(chunk)
+        size += len(chunk)
+      if size >= SEND_BUFFER_SIZE:
+        return b''.join(chunks), False
+    self.close()
+    return b''.join(chunks), True
+
+  def close(self):
+    if not self.closed:
+      self.closed = True
+      if hasattr(self.iterable, 'close'):
+        self.iterable.close()
+
+class AsgiApp:
+  def __init__(self, app, workers=None, max_body_size=16 * 1024 * 1024):
+    self.app = app
+    self.workers = workers or app.config.get('DB_POOL_SIZE', 8)
+    self.max_body_size = max_body_size
+    self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='asgi')
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] == 'lifespan':
+      await self.lifespan(receive, send)
+    elif scope['type'] == 'http':
+      await self.http(scope, receive, send)
+    else:
+      raise ValueError(f"Unsupported ASGI scope type: {scope['type']}")
+
+  async def lifespan(self, receive, send):
+    while True:
+      message = await receive()
+      if message['type'] == 'lifespan.startup':
+        await send({'type': 'lifespan.startup.complete'})
+      elif message['type'] == 'lifespan.shutdown':
+        self.executor.shutdown(wait=True)
+        self.app.db.dispose()
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+
+  async def read_body(self, receive):
+    body = bytearray()
+    while True:
+      message = await receive()
+      if message['type'] == 'http.disconnect':
+        return None
+      body += message.get('body', b'')
+      if len(body) > self.max_body_size:
+        raise RequestTooLarge('Request body too large')
+      if not message.get('more_body', False):
+        return bytes(body)
+
+  # Runs on a worker thread: the WSGI app and the first batch of its body
+  def start(self, environ):
+    response = WsgiResponse(self.app, environ)
+    return (response, *response.read())
+
+  async def http(self, scope, receive, send):
+    try:
+      body = await self.read_body(receive)
+    except RequestTooLarge as e:
+      await send({'type': 'http.response.start', 'status': 413, 'headers': [(b'content-type', b'text/plain')]})
+      await send({'type': 'http.response.body', 'body': str(e).encode()})
+      return
+    if body is None:
+      return  # Client went away before sending the whole request
+
+    loop = asyncio.get_running_loop()
+    environ = build_environ(scope, body)
+    response, chunk, done = await loop.run_in_executor(self.executor, self.start, environ)
+    try:
+      await send({'type': 'http.response.start', 'status': response.status, 'headers': response.headers})
+      while not done:
+        await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        chunk, done = await loop.run_in_executor(self.executor, response.read)
+      await send({'type': 'http.response.body', 'body': chunk})
+    finally:
+      if not response.closed:
+        # Client disconnected mid-stream; release what the body holds
+        await loop.run_in_executor(self.executor, response.close)
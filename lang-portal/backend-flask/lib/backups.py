@@ -0,0 +1,130 @@
+import os
+import re
+import sqlite3
+from datetime import datetime, timezone
+
+# Online copies of a database with SQLite's backup API. The source is copied
+# in one step, inside a single read transaction: in WAL mode that never blocks
+# the app's writers, and the copy is the database as of one commit however
+# busy the app is. Copies are written next to their target and renamed into
+# place, so a backup file is either complete or absent.
+
+# <database stem>-<UTC time>-<label>.db, e.g. words-20250101T120000123456Z-reset.db
+SNAPSHOT_NAME = re.compile(r'^(?P<stem>.+)-(?P<taken>\d{8}T\d{12}Z)-(?P<label>[A-Za-z0-9_]+)\.db$')
+
+class InvalidBackup(Exception):
+  pass
+
+def _copy(source_path, target_path):
+  # sqlite3.connect() would create a missing source
+  if not os.path.exists(source_path):
+    raise FileNotFoundError(f"No database at {source_path}")
+  source = sqlite3.connect(source_path)
+  target = sqlite3.connect(target_path)
+  try:
+    source.backup(target)
+  finally:
+    source.close()
+    target.close()
+
+def backup(database, target):
+  partial = f'{target}.{os.getpid()}.partial'
+  try:
+    _copy(database, partial)
+    os.replace(partial, target)
+  finally:
+    if os.path.exists(partial):
+      os.remove(partial)
+  return target
+
+# Copy `database` over `target` in place, as one write transaction on the
+# target, so connections already open on it see the new contents (a read
+# replica, see lib/db.py)
+def refresh(database, target):
+  _copy(database, target)
+  # The copy went through the target's WAL; fold it back into the file now
+  # rather than let it grow by a database's worth per refresh while readers
+  # keep the automatic checkpoints from finishing
+  connection = sqlite3.connect(target, timeout=30)
+  try:
+    connection.execute('PRAGMA wal_checkpoint(TRUNCATE)').fetchone()
+  finally:
+    connection.close()
+
+# Point-in-time copy of `database` in `directory`, named after the database
+# and the time it was taken. With `keep`, only the newest `keep` snapshots of
+# that database and label are kept.
+def snapshot(database, directory, label='manual', keep=None):
+  os.makedirs(directory, exist_ok=True)
+  stem = os.path.splitext(os.path.basename(database))[0]
+  taken = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+  path = backup(database, os.path.join(directory, f'{stem}-{taken}-{label}.db'))
+  if keep:
+    for old in snapshots(directory, database, label=label)[:-keep]:
+      os.remove(old)
+  return path
+
+# Snapshots of `database` in `directory`, oldest first
+def snapshots(directory, database, label=None):
+  if not os.path.isdir(directory):
+    return []
+  stem = os.path.splitext(os.path.basename(database))[0]
+  found = []
+  for name in os.listdir(directory):
+    match = SNAPSHOT_NAME.match(name)
+    if match and match['stem'] == stem and label in (None, match['label']):
+      found.append((match['taken'], os.path.join(directory, name)))
+  return [path for _, path in sorted(found)]
+
+def _check(connection, path):
+  result = connection.execute('PRAGMA quick_check').fetchone()[0]
+  if result != 'ok':
+    raise InvalidBackup(f"{path} is damaged: {result}")
+  tables = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+  if not {'words', 'study_sessions', 'cache_generations'} <= tables:
+    raise InvalidBackup(f"{path} is not a lang-portal database")
+
+# Replace the contents of `database` with `source` while the app is running.
+# The source is checked and copied aside first. Its cache generations are
+# moved past the live ones there, so no process keeps serving responses it
+# cached before the restore. The copy then goes into the live file in one
+# write transaction: readers see the old or the restored data, never a mix.
+# Run `invoke migrate` afterwards if the snapshot predates a migration.
+def restore(source, database):
+  staged = f'{database}.{os.getpid()}.restore'
+  try:
+    try:
+      _copy(source, staged)
+    except sqlite3.DatabaseError as e:
+      raise InvalidBackup(f"{source} is not a usable database: {e}")
+    connection = sqlite3.connect(staged, isolation_level=None)
+    try:
+      _check(connection, source)
+      generations = []
+      if os.path.exists(database):
+        live = sqlite3.connect(database)
+        try:
+          generations = live.execute('SELECT scope, generation FROM cache_generations').fetchall()
+        finally:
+          live.close()
+      connection.execute('BEGIN IMMEDIATE')
+      connection.execute('UPDATE cache_generations SET generation = generation + 1')
+      connection.executemany('''
+        INSERT INTO cache_generations (scope, generation) VALUES (?, ? + 1)
+        ON CONFLICT (scope) DO UPDATE SET generation = MAX(generation, excluded.generation)
+      ''', generations)
+      connection.execute('COMMIT')
+    finally:
+      connection.close()
+    _copy(staged, database)
+    # Writes that landed between reading the live generations and the copy
+    live = sqlite3.connect(database)
+    try:
+      with live:
+        live.execute('UPDATE cache_generations SET generation = generation + 1')
+    finally:
+      live.close()
+  finally:
+    for path in (staged, staged + '-wal', staged + '-shm'):
+      if os.path.exists(path):
+        os.remove(path)
@@ -0,0 +1,373 @@
+import asyncio
+import http.client
+import json
+import math
+import multiprocessing
+import socket
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.routing import BuildError
+from werkzeug.serving import WSGIRequestHandler, make_server
+
+# Latency benchmark for every route the app registers. Each endpoint is
+# driven through the Flask test client (in-process, no network) and,
+# optionally, through a real threaded WSGI server with concurrent clients.
+
+# Query-string variants worth tracking on top of the bare routes
+EXTRA_GETS = [
+  '/words?sort_by=correct_count&order=desc',
+  '/words?page=200',
+  '/groups/1/words?sort_by=correct_count',
+  '/words/search?q=ka',
+  '/words/search?q=mountian',
+]
+
+# Payloads for the write routes; routes without one (e.g. reset) are skipped
+WRITE_PAYLOADS = {
+  ('POST', '/api/study-sessions'): {'group_id': 1, 'study_activity_id': 1},
+  ('POST', '/api/study-sessions/1/review'): {'word_id': 1, 'correct': True},
+  ('POST', '/api/study-sessions/1/reviews'): [{'word_id': i, 'correct': i % 3 != 0} for i in range(1, 51)],
+}
+
+def endpoints(app):
+  adapter = app.url_map.bind('localhost')
+  found = []
+  for rule in app.url_map.iter_rules():
+    if rule.endpoint == 'static':
+      continue
+    try:
+      path = adapter.build(rule.endpoint, {argument: 1 for argument in rule.arguments})
+    except BuildError:
+      continue  # Arguments that are not ids (e.g. /export/<name>)
+    if 'GET' in rule.methods:
+      found.append(('GET', path, None))
+    if 'POST' in rule.methods and ('POST', path) in WRITE_PAYLOADS:
+      found.append(('POST', path, WRITE_PAYLOADS[('POST', path)]))
+  found.extend(('GET', path, None) for path in EXTRA_GETS)
+  # Reads first, so writes don't change what the reads are measured against
+  return sorted(set((method, path, json.dumps(body) if body is not None else None) for method, path, body in found),
+                key=lambda endpoint: (endpoint[0] != 'GET', endpoint[1]))
+
+def percentile(samples, p):
+  ordered = sorted(samples)
+  index = max(0, math.ceil(p / 100 * len(ordered)) - 1)
+  return ordered[index]
+
+def summarize(samples, seconds):
+  return {
+    'requests': len(samples),
+    'p50_ms': percentile(samples, 50) * 1000,
+    'p95_ms': percentile(samples, 95) * 1000,
+    'p99_ms': percentile(samples, 99) * 1000,
+    'mean_ms': statistics.fmean(samples) * 1000,
+    'rps': len(samples) / seconds if seconds else 0.0,
+  }
+
+# Number of SQL statements one request issues. Statements run by triggers are
+# reported with the text of the statement that fired them, so consecutive
+# repeats are collapsed.
+def count_queries(app, client, method, path, body):
+  statements = []
+  app.db.set_trace_callback(statements.append)
+  try:
+    client.open(path, method=method, data=body, content_type='application/json')
+  finally:
+    app.db.set_trace_callback(None)
+  return len([sql for i, sql in enumerate(statements) if i == 0 or sql != statements[i - 1]])
+
+def bench_test_client(app, method, path, body, requests):
+  client = app.test_client()
+  client.open(path, method=method, data=body, content_type='application/json')  # Warm up
+  samples = []
+  status = None
+  started = time.perf_counter()
+  for _ in range(requests):
+    request_started = time.perf_counter()
+    response = client.open(path, method=method, data=body, content_type='application/json')
+    samples.append(time.perf_counter() - request_started)
+    status = response.status_code
+  result = summarize(samples, time.perf_counter() - started)
+  result['status'] = status
+  result['queries'] = count_queries(app, client, method, path, body)
+  return result
+
+def _http_request(host, port, method, path, body):
+  connection = http.client.HTTPConnection(host, port)
+  try:
+    started = time.perf_counter()
+    connection.request(method, path, body=body, headers={'Content-Type': 'application/json'} if body else {})
+    connection.getresponse().read()
+    return time.perf_counter() - started
+  finally:
+    connection.close()
+
+def bench_server(host, port, method, path, body, requests, concurrency):
+  with ThreadPoolExecutor(max_workers=concurrency) as pool:
+    started = time.perf_counter()
+    samples = list(pool.map(lambda _: _http_request(host, port, method, path, body), range(requests)))
+    return summarize(samples, time.perf_counter() - started)
+
+class QuietRequestHandler(WSGIRequestHandler):
+  def log_request(self, *args, **kwargs):
+    pass
+
+class Server:
+  def __init__(self, app, host='127.0.0.1'):
+    self.server = make_server(host, 0, app, threaded=True, request_handler=QuietRequestHandler)
+    self.host, self.port = host, self.server.server_port
+    self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+  def __enter__(self):
+    self.thread.start()
+    return self
+
+  def __exit__(self, *exc):
+    self.server.shutdown()
+
+def run(app, requests=200, concurrency=16, server=True):
+  results = {}
+  targets = endpoints(app)
+  for method, path, body in targets:
+    results[f'{method} {path}'] = {'test_client': bench_test_client(app, method, path, body, requests)}
+  if server:
+    with Server(app) as running:
+      for method, path, body in targets:
+        results[f'{method} {path}']['server'] = bench_server(running.host, running.port, method, path, body, requests, concurrency)
+  return results
+
+def report(results):
+  lines = [f"{'endpoint':<48} {'status':>6} {'queries':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'srv p95':>8} {'srv p99':>8} {'srv r/s':>8}"]
+  for name, result in results.items():
+    client = result['test_client']
+    server = result.get('server')
+    line = (f"{name[:48]:<48} {client['status']:>6} {client['queries']:>7} "
+            f"{client['p50_ms']:>8.2f} {client['p95_ms']:>8.2f} {client['p99_ms']:>8.2f} {client['rps']:>8.0f}")
+    if server:
+      line += f" {server['p95_ms']:>8.2f} {server['p99_ms']:>8.2f} {server['rps']:>8.0f}"
+    lines.append(line)
+  return '\n'.join(lines)
+
+# WSGI (threaded Werkzeug) vs ASGI (uvicorn + lib.asgi) under many concurrent
+# clients. Each server runs in its own process so the load generator, an
+# asyncio client holding `concurrency` connections open at once, does not
+# compete with it for the GIL.
+SERVER_PATHS = [
+  '/words',
+  '/groups/1/words',
+  '/api/study-sessions',
+  '/api/groups/1/due',
+  '/dashboard/stats',
+  '/api/study-activities',
+]
+
+def _serve(kind, database, port):
+  from app import create_app
+  app = create_app({'DATABASE': database})
+  if kind == 'asgi':
+    import uvicorn
+    from lib.asgi import AsgiApp
+    uvicorn.run(AsgiApp(app), host='127.0.0.1', port=port, log_level='warning', backlog=2048)
+  else:
+    server = make_server('127.0.0.1', port, app, threaded=True, request_handler=QuietRequestHandler)
+    server.serve_forever()
+
+def _free_port():
+  with socket.socket() as probe:
+    probe.bind(('127.0.0.1', 0))
+    return probe.getsockname()[1]
+
+class ServerProcess:
+  def __init__(self, kind, database, startup_timeout=30.0):
+    self.port = _free_port()
+    self.startup_timeout = startup_timeout
+    self.process = multiprocessing.get_context('spawn').Process(target=_serve, args=(kind, database, self.port), daemon=True)
+
+  def __enter__(self):
+    self.process.start()
+    deadline = time.monotonic() + self.startup_timeout
+    while True:
+      try:
+        socket.create_connection(('127.0.0.1', self.port), timeout=1).close()
+        return self
+      except OSError:
+        if time.monotonic() > deadline or not self.process.is_alive():
+          self.process.terminate()
+          raise RuntimeError(f"server on port {self.port} did not start")
+        time.sleep(0.1)
+
+  def __exit__(self, *exc):
+    self.process.terminate()
+    self.process.join()
+
+async def _async_request(port, request):
+  started = time.perf_counter()
+  reader, writer = await asyncio.open_connection('127.0.0.1', port)
+  try:
+    writer.write(request)
+    await writer.drain()
+    status = int((await reader.readline()).split(b' ', 2)[1])
+    await reader.read()  # Connection: close, the body ends at EOF
+    return time.perf_counter() - started, status
+  finally:
+    writer.close()
+
+async def _async_load(port, path, requests, concurrency):
+  request = f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n'.encode()
+  samples, errors = [], 0
+  remaining = iter(range(requests))
+
+  async def client():
+    nonlocal errors
+    for _ in remaining:
+      try:
+        seconds, status = await _async_request(port, request)
+      except (OSError, ValueError, IndexError):
+        errors += 1
+        continue
+      if status >= 500:
+        errors += 1
+      samples.append(seconds)
+
+  started = time.perf_counter()
+  await asyncio.gather(*(client() for _ in range(concurrency)))
+  return samples, errors, time.perf_counter() - started
+
+def bench_concurrent(port, path, requests, concurrency):
+  samples, errors, seconds = asyncio.run(_async_load(port, path, requests, concurrency))
+  result = summarize(samples, seconds) if samples else {'requests': 0}
+  result['errors'] = errors
+  return result
+
+def compare_servers(database, paths=SERVER_PATHS, requests=5000, concurrency=500):
+  results = {path: {} for path in paths}
+  for kind in ('wsgi', 'asgi'):
+    with ServerProcess(kind, database) as server:
+      for path in paths:
+        bench_concurrent(server.port, path, min(requests, concurrency), concurrency)  # Warm up
+        results[path][kind] = bench_concurrent(server.port, path, requests, concurrency)
+  return results
+
+def report_servers(results):
+  lines = [f"{'endpoint':<28} {'server':<6} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>6}"]
+  for path, by_kind in results.items():
+    for kind, result in by_kind.items():
+      if not result['requests']:
+        lines.append(f"{path[:28]:<28} {kind:<6} {'-':>8} {'-':>8} {'-':>8} {'-':>8} {result['errors']:>6}")
+        continue
+      lines.append(f"{path[:28]:<28} {kind:<6} {result['rps']:>8.0f} {result['p50_ms']:>8.2f} "
+                   f"{result['p95_ms']:>8.2f} {result['p99_ms']:>8.2f} {result['errors']:>6}")
+  return '\n'.join(lines)
+
+# Cold start, measured in fresh interpreters: importing app, create_app() and
+# the first request (which opens the database). `total` is the whole process,
+# interpreter startup included.
+STARTUP_SCRIPT = '''
+import json, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app({'DATABASE': sys.argv[1]})
+created = time.perf_counter()
+app.test_client().get('/api/study-activities')
+finished = time.perf_counter()
+print(json.dumps({
+  'import_ms': (imported - started) * 1000,
+  'create_app_ms': (created - imported) * 1000,
+  'first_request_ms': (finished - created) * 1000,
+}))
+'''
+
+def bench_startup(database, runs=10):
+  phases = {}
+  for _ in range(runs):
+    started = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT, database], check=True, capture_output=True, text=True).stdout
+    total_ms = (time.perf_counter() - started) * 1000
+    for phase, ms in {**json.loads(output.splitlines()[-1]), 'total_ms': total_ms}.items():
+      phases.setdefault(phase, []).append(ms)
+  return {phase: statistics.median(samples) for phase, samples in phases.items()}
+
+def report_startup(result):
+  return '\n'.join(f"{phase[:-len('_ms')]:<14} {ms:>8.1f} ms" for phase, ms in result.items())
+
+# A startup regression is a phase more than `tolerance` slower than the
+# baseline, ignoring differences under `floor_ms`
+def compare_startup(result, baseline_path, tolerance=0.25, floor_ms=5.0):
+  with open(baseline_path) as file:
+    baseline = json.load(file)
+  return [
+    f"{phase}: {baseline[phase]:.1f}ms -> {ms:.1f}ms"
+    for phase, ms in result.items()
+    if phase in baseline and ms > baseline[phase] * (1 + tolerance) and ms - baseline[phase] > floor_ms
+  ]
+
+# Serialization microbenchmark: CPU time (time.process_time, so it isn't
+# skewed by other processes) per request of the routes whose cost is mostly
+# building and encoding JSON, with each JSON provider, and how much of it is
+# the encoding alone
+SERIALIZATION_PATHS = [
+  '/words',
+  '/groups/1/words',
+  '/api/study-sessions?per_page=50',
+  '/api/study-sessions/1?per_page=50',
+  '/api/groups/1/due?limit=100',
+]
+
+def _cpu_us(function, runs):
+  function()  # Warm up
+  started = time.process_time()
+  for _ in range(runs):
+    function()
+  return (time.process_time() - started) / runs * 1e6
+
+def bench_serialization(database, paths=SERIALIZATION_PATHS, requests=500, providers=('json', 'orjson')):
+  from app import create_app
+  results = {}
+  for provider in providers:
+    app = create_app({'DATABASE': database, 'JSON_PROVIDER': provider, 'SQL_TRACING': False})
+    client = app.test_client()
+    for path in paths:
+      payload = client.get(path).get_json()
+      with app.app_context():
+        encode_us = _cpu_us(lambda: app.json.response(payload), requests)
+      results.setdefault(path, {})[provider] = {
+        'request_us': _cpu_us(lambda: client.get(path), requests),
+        'encode_us': encode_us,
+        'bytes': len(app.json.dumps(payload).encode('utf-8')),
+      }
+    app.db.dispose()
+  return results
+
+def report_serialization(results):
+  providers = list(next(iter(results.values())))
+  lines = [f"{'path':<36} " + ' '.join(f"{provider + ' req/enc us':>22}" for provider in providers)]
+  for path, by_provider in results.items():
+    cells = [f"{r['request_us']:>12.0f} / {r['encode_us']:>7.0f}" for r in by_provider.values()]
+    lines.append(f"{path:<36} " + ' '.join(f"{cell:>22}" for cell in cells))
+  return '\n'.join(lines)
+
+def save_baseline(results, path):
+  with open(path, 'w') as file:
+    json.dump(results, file, indent=2, sort_keys=True)
+
+# Compare test-client p95 and query counts against a saved baseline. A
+# regression is a p95 more than `tolerance` slower (ignoring sub-`floor_ms`
+# noise) or any increase in the number of queries.
+def compare(results, baseline_path, tolerance=0.25, floor_ms=1.0):
+  with open(baseline_path) as file:
+    baseline = json.load(file)
+  regressions = []
+  for name, result in results.items():
+    if name not in baseline:
+      continue
+    before, after = baseline[name]['test_client'], result['test_client']
+    if after['p95_ms'] > before['p95_ms'] * (1 + tolerance) and after['p95_ms'] - before['p95_ms'] > floor_ms:
+      regressions.append(f"{name}: p95 {before['p95_ms']:.2f}ms -> {after['p95_ms']:.2f}ms")
+    if after['queries'] > before['queries']:
+      regressions.append(f"{name}: queries {before['queries']} -> {after['queries']}")
+  return regressions
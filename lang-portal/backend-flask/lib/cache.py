@@ -0,0 +1,89 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from flask import g, request, make_response
+
+# Bump the generation of one or more cache scopes. Call inside the write
+# transaction so the invalidation commits (or rolls back) with the data.
+def bump_generation(cursor, *scopes):
+  cursor.executemany('''
+    INSERT INTO cache_generations (scope, generation) VALUES (?, 1)
+    ON CONFLICT (scope) DO UPDATE SET generation = generation + 1
+  ''', [(scope,) for scope in scopes])
+
+# In-process LRU/TTL cache of GET responses with ETag revalidation. Entries
+# are keyed by learner, path and query string and are only served while the
+# generations of the scopes they depend on are unchanged.
+class ResponseCache:
+  def __init__(self, db, max_entries=512, ttl=300):
+    self.db = db
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+
+  def generations(self, scopes):
+    cursor = self.db.cursor()
+    cursor.execute('SELECT scope, generation FROM cache_generations')
+    current = {row['scope']: row['generation'] for row in cursor.fetchall()}
+    return tuple(current.get(scope, 0) for scope in scopes)
+
+  def _get(self, key, generations):
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is None:
+        return None
+      if entry['generations'] != generations or entry['expires'] < time.monotonic():
+        del self._entries[key]
+        return None
+      self._entries.move_to_end(key)
+      return entry
+
+  def _put(self, key, entry):
+    with self._lock:
+      self._entries[key] = entry
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+
+  def cached(self, *scopes):
+    def decorator(view):
+      @functools.wraps(view)
+      def wrapper(*args, **kwargs):
+        key = (g.get('learner'), request.full_path)
+        generations = self.generations(scopes)
+        etag = hashlib.sha1(repr((key, scopes, generations)).encode('utf-8')).hexdigest()
+
+        # The ETag is derived from the generations, so a matching
+        # If-None-Match is answered without running the view at all
+        if request.if_none_match.contains_weak(etag):
+          response = make_response('', 304)
+          response.set_etag(etag, weak=True)
+          return response
+
+        entry = self._get(key, generations)
+        if entry is None:
+          response = make_response(view(*args, **kwargs))
+          if response.status_code != 200:
+            return response
+          entry = {
+            'generations': generations,
+            'expires': time.monotonic() + self.ttl,
+            'body': response.get_data(),
+            'mimetype': response.mimetype
+          }
+          self._put(key, entry)
+
+        response = make_response(entry['body'], 200)
+        response.mimetype = entry['mimetype']
+        response.set_etag(etag, weak=True)
+        return response
+      return wrapper
+    return decorator
@@ -0,0 +1,63 @@
+import threading
+from urllib.parse import urlparse
+
+from flask_cors.core import ACL_ORIGIN, FLASK_CORS_EVALUATED, get_cors_options, set_cors_headers
+
+# App-wide CORS for responses that no route's @cross_origin() handled (404s,
+# 405s, preflights of unknown paths). The allowed origins are those of the
+# study activities' URLs, read on first use rather than at startup and
+# cached until the 'activities' cache generation changes, so activities
+# added later are allowed without a restart.
+
+CORS_OPTIONS = {
+  "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+  "allow_headers": ["Content-Type", "Authorization", "X-Learner"]
+}
+
+# Allowed in debug mode on top of the activities
+DEBUG_ORIGINS = ["http://localhost:8080", "http://127.0.0.1:8080"]
+
+# Origins (scheme://host[:port]) of the given URLs, or ["*"] if there are none
+def url_origins(urls):
+  origins = set()
+  for url in urls:
+    parsed = urlparse(url or '')
+    if parsed.scheme and parsed.netloc:
+      origins.add(f"{parsed.scheme}://{parsed.netloc}")
+  return sorted(origins) if origins else ["*"]
+
+class ActivityOrigins:
+  def __init__(self, app):
+    self.app = app
+    self._key = None
+    self._options = None
+    self._lock = threading.Lock()
+    app.after_request(self._after_request)
+
+  def _load(self):
+    cursor = self.app.db.cursor()
+    cursor.execute('SELECT url FROM study_activities')
+    return url_origins(row['url'] for row in cursor.fetchall())
+
+  def options(self):
+    try:
+      generation = self.app.cache.generations(('activities',))
+      key = (generation, self.app.debug)
+      if key != self._key:
+        origins = self._load()
+        if self.app.debug:
+          origins = origins + DEBUG_ORIGINS
+        with self._lock:
+          self._options = get_cors_options(self.app, CORS_OPTIONS, {"origins": origins})
+          self._key = key
+    except Exception:
+      if self._options is None:
+        # Fall back to allowing all origins until the database can be read
+        return get_cors_options(self.app, CORS_OPTIONS, {"origins": ["*"]})
+    return self._options
+
+  def _after_request(self, response):
+    if hasattr(response, FLASK_CORS_EVALUATED) or response.headers.get(ACL_ORIGIN):
+      return response
+    set_cors_headers(response, self.options())
+    return response
@@ -0,0 +1,16 @@
+# Readers for the trigger-maintained row_counts table (see
+# sql/migrations/0002_create_row_counts.sql)
+
+def get_count(cursor, scope, scope_id=0):
+  cursor.execute('SELECT count FROM row_counts WHERE scope = ? AND scope_id = ?', (scope, scope_id))
+  row = cursor.fetchone()
+  return row[0] if row else 0
+
+# Listings count by default; `include_total=false` skips it entirely
+def include_total(args):
+  return args.get('include_total', 'true').lower() not in ('false', '0', 'no')
+
+def total_pages(total, per_page):
+  if total is None:
+    return None
+  return (total + per_page - 1) // per_page
@@ -1,30 +1,450 @@
+import functools
+import logging
+import os
 import sqlite3
 import json
-from flask import g
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from flask import g, has_app_context
 
+from lib import backups
+from lib.cache import bump_generation
+from lib.migrations import Migrator
+
+# Pragmas applied to every pooled connection (journal_mode is set once, on connect)
+CONNECTION_PRAGMAS = (
+  'PRAGMA synchronous = NORMAL',   # Safe with WAL, avoids an fsync per commit
+  'PRAGMA cache_size = -16000',    # ~16MB page cache per connection
+  'PRAGMA mmap_size = 268435456',  # Map up to 256MB of the database file
+  'PRAGMA temp_store = MEMORY',
+  'PRAGMA busy_timeout = 5000',
+)
+
+logger = logging.getLogger(__name__)
+
+# Review items deleted per transaction when clearing history in batches
+CLEAR_HISTORY_BATCH = 2000
+
+class PoolTimeout(Exception):
+  pass
+
+# Per-process pool of reader connections plus a single serialized writer.
+# Readers are opened with `query_only` so a stray write on the read path fails
+# loudly instead of contending with the writer. In WAL mode readers never block
+# behind the writer (and vice versa).
+class ConnectionPool:
+  def __init__(self, database, max_readers=8, timeout=5.0, health_check_interval=30.0):
+    self.database = database
+    self.max_readers = max_readers
+    self.timeout = timeout
+    self.health_check_interval = health_check_interval
+    self.pid = os.getpid()
+    self._idle = []  # Stack of (connection, last_used) so hot connections are reused first
+    self._created = 0
+    self._condition = threading.Condition()
+    self._writer = None
+    self._writer_last_used = 0.0
+    self._writer_lock = threading.RLock()
+    self.trace_callback = None  # Applied to connections as they are handed out
+    self.closed = False
+
+  def _connect(self, readonly):
+    connection = sqlite3.connect(
+      self.database,
+      timeout=self.timeout,
+      isolation_level=None,  # Autocommit; writes open explicit transactions
+      check_same_thread=False
+    )
+    connection.row_factory = sqlite3.Row  # Return rows as dictionaries
+    connection.execute('PRAGMA journal_mode = WAL')
+    for pragma in CONNECTION_PRAGMAS:
+      connection.execute(pragma)
+    if readonly:
+      connection.execute('PRAGMA query_only = ON')
+    return connection
+
+  def _healthy(self, connection):
+    try:
+      connection.execute('SELECT 1').fetchone()
+      return True
+    except sqlite3.Error:
+      return False
+
+  def acquire(self):
+    deadline = time.monotonic() + self.timeout
+    with self._condition:
+      while not self._idle and self._created >= self.max_readers:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+          raise PoolTimeout(f"No reader connection available after {self.timeout}s")
+        self._condition.wait(remaining)
+      if self._idle:
+        connection, last_used = self._idle.pop()
+      else:
+        connection, last_used = None, None
+        self._created += 1
+
+    if connection is not None:
+      # Only ping connections that have been sitting idle for a while
+      if time.monotonic() - last_used < self.health_check_interval or self._healthy(connection):
+        connection.set_trace_callback(self.trace_callback)
+        return connection
+      try:
+        connection.close()
+      except sqlite3.Error:
+        pass
+
+    try:
+      connection = self._connect(readonly=True)
+    except Exception:
+      with self._condition:
+        self._created -= 1
+        self._condition.notify()
+      raise
+    connection.set_trace_callback(self.trace_callback)
+    return connection
+
+  def release(self, connection):
+    try:
+      if connection.in_transaction:
+        connection.rollback()
+    except sqlite3.Error:
+      # Broken connection, drop it and free the slot
+      with self._condition:
+        self._created -= 1
+        self._condition.notify()
+      return
+    if self.closed:
+      connection.close()
+      return
+    with self._condition:
+      self._idle.append((connection, time.monotonic()))
+      self._condition.notify()
+
+  @contextmanager
+  def writer(self):
+    with self._writer_lock:
+      idle = time.monotonic() - self._writer_last_used
+      if self._writer is not None and idle >= self.health_check_interval and not self._healthy(self._writer):
+        try:
+          self._writer.close()
+        except sqlite3.Error:
+          pass
+        self._writer = None
+      if self._writer is None:
+        self._writer = self._connect(readonly=False)
+      self._writer.set_trace_callback(self.trace_callback)
+      try:
+        yield self._writer
+      finally:
+        self._writer_last_used = time.monotonic()
+
+  def close(self):
+    with self._condition:
+      self.closed = True
+      idle, self._idle = self._idle, []
+      self._created -= len(idle)
+    for connection, _ in idle:
+      connection.close()
+    with self._writer_lock:
+      if self._writer is not None:
+        self._writer.close()
+        self._writer = None
+
+# With `learners_dir` set, each learner's study history lives in its own
+# database, <learners_dir>/<learner>.db, created on first use as a copy of
+# `database` (the shared vocabulary) without its history. Connections are
+# routed to the database of the learner in flask's `g.learner` (see
+# lib/learners.py), so sessions, reviews, schedules, dashboards and resets
+# of one learner only ever touch that learner's file.
+#
+# With `replica` set (off by default), views wrapped in replica_reads() read
+# from that file instead: a copy of `database` refreshed in place by `invoke
+# replicate`, or every `replica_refresh` seconds by a thread in this process
+# when that is non-zero (each process then copies the whole database, so
+# leave it at 0 behind several workers). Their queries then never compete
+# with the review write path for the primary's pages, locks or checkpoints,
+# at the cost of data up to one refresh old. Writes always go to the primary.
 class Db:
-  def __init__(self, database='words.db'):
+  def __init__(self, database='words.db', pool_size=8, learners_dir=None, max_learner_pools=64,
+               replica=None, replica_refresh=0.0):
     self.database = database
-    self.connection = None
+    self.pool_size = pool_size
+    self.learners_dir = learners_dir
+    self.max_learner_pools = max_learner_pools
+    self.replica = replica
+    self.replica_refresh = replica_refresh
+    self._pool = None
+    self._replica_pool = None
+    self._replicator = None  # (pid, threading.Event stopping the refresh thread)
+    self._learner_pools = OrderedDict()  # learner -> ConnectionPool, least recently used first
+    self._pool_lock = threading.Lock()
+    self._replica_lock = threading.Lock()  # Serializes the first copy of the replica
+    self.trace_callback = None
+    self.tracer = None  # Optional lib.tracing.QueryTracer wrapping handed-out cursors
+
+  def pool(self):
+    learner = g.get('learner') if has_app_context() else None
+    if learner is not None:
+      return self._learner_pool(learner)
+    if self.replica and has_app_context() and g.get('read_replica'):
+      return self.replica_pool()
+    return self.primary_pool()
+
+  def primary_pool(self):
+    # Pools are per process: connections must never be shared across a fork
+    if self._pool is None or self._pool.pid != os.getpid():
+      with self._pool_lock:
+        if self._pool is None or self._pool.pid != os.getpid():
+          self._pool = ConnectionPool(self.database, max_readers=self.pool_size)
+          self._pool.trace_callback = self.trace_callback
+    return self._pool
+
+  # Only the most recently used learners keep a pool open, so open files stay
+  # bounded however many learners there are
+  def _learner_pool(self, learner):
+    pool = self._learner_pools.get(learner)
+    if pool is None and not os.path.exists(self.learner_database(learner)):
+      self.create_learner(learner)
+    evicted = []
+    opened = False
+    with self._pool_lock:
+      pool = self._learner_pools.get(learner)
+      if pool is None or pool.pid != os.getpid():
+        pool = ConnectionPool(self.learner_database(learner), max_readers=self.pool_size)
+        pool.trace_callback = self.trace_callback
+        self._learner_pools[learner] = pool
+        opened = True
+      self._learner_pools.move_to_end(learner)
+      while len(self._learner_pools) > self.max_learner_pools:
+        evicted.append(self._learner_pools.popitem(last=False)[1])
+    # Connections still checked out of an evicted pool are closed when released
+    for pool_to_close in evicted:
+      pool_to_close.close()
+    # Vocabulary added to the shared database since the learner's file was
+    # last synced (imports also sync every learner, see sync_learners)
+    if opened:
+      self.sync_learner(learner, pool)
+    return pool
+
+  def replica_pool(self):
+    pool = self._replica_pool
+    if pool is not None and pool.pid == os.getpid():
+      return pool
+    # A missing replica is copied first. That takes as long as a backup, so
+    # it happens outside _pool_lock (which every pool lookup takes) and only
+    # requests waiting for the replica wait for it
+    with self._replica_lock:
+      if not os.path.exists(self.replica):
+        self.refresh_replica()
+    pool = ConnectionPool(self.replica, max_readers=self.pool_size)
+    pool.trace_callback = self.trace_callback
+    with self._pool_lock:
+      if self._replica_pool is None or self._replica_pool.pid != os.getpid():
+        self._replica_pool = pool
+        self._start_replicator()
+        return pool
+      current = self._replica_pool
+    # Another thread got there first; this pool never opened a connection
+    pool.close()
+    return current
+
+  # Copy the primary over the replica in one write transaction on the
+  # replica: its open readers keep their snapshot and see the new contents
+  # from their next query. Reading the primary never blocks its writers.
+  def refresh_replica(self):
+    backups.refresh(self.database, self.replica)
+
+  def _start_replicator(self):
+    if not self.replica_refresh:
+      return
+    stop = threading.Event()
+    self._replicator = (os.getpid(), stop)
+    threading.Thread(target=self._replicate, args=(stop,), name='replica-refresh', daemon=True).start()
+
+  def _replicate(self, stop):
+    while not stop.wait(self.replica_refresh):
+      try:
+        self.refresh_replica()
+      except Exception:
+        # Keep serving the last good copy, try again next time
+        logger.exception("Refreshing the replica %s failed", self.replica)
+
+  # Route decorator: the view's reads go to the replica, when there is one
+  # and the request isn't a learner's (learners have no replica)
+  def replica_reads(self, view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+      g.read_replica = True
+      return view(*args, **kwargs)
+    return wrapper
+
+  def learner_database(self, learner):
+    return os.path.join(self.learners_dir, learner + '.db')
+
+  # Learners that have a database, by name
+  def learners(self):
+    if not self.learners_dir or not os.path.isdir(self.learners_dir):
+      return []
+    return sorted(name[:-3] for name in os.listdir(self.learners_dir) if name.endswith('.db'))
+
+  # Create a learner's database: a snapshot of the shared one (schema,
+  # vocabulary and activities) with its study history cleared. It is linked
+  # into place only once complete, so concurrent first requests (from any
+  # process) agree on one file.
+  def create_learner(self, learner):
+    os.makedirs(self.learners_dir, exist_ok=True)
+    path = self.learner_database(learner)
+    partial = f'{path}.{os.getpid()}.{threading.get_ident()}.partial'
+    source = sqlite3.connect(self.database)
+    target = sqlite3.connect(partial, isolation_level=None)
+    try:
+      source.backup(target)
+      target.execute('BEGIN IMMEDIATE')
+      self.clear_history(target.cursor())
+      # The copy's vocabulary is the shared one as of its generations
+      target.execute('''
+        INSERT OR REPLACE INTO vocabulary_sync (scope, generation)
+        SELECT scope, generation FROM cache_generations WHERE scope IN ('vocabulary', 'activities')
+      ''')
+      target.execute('COMMIT')
+    finally:
+      source.close()
+      target.close()
+    try:
+      os.link(partial, path)
+    except FileExistsError:
+      pass
+    finally:
+      os.remove(partial)
+
+  # Generations of the shared vocabulary scopes, as a dict
+  def _vocabulary_generations(self, connection, table):
+    rows = connection.execute(f'''
+      SELECT scope, generation FROM {table} WHERE scope IN ('vocabulary', 'activities')
+    ''').fetchall()
+    return {row[0]: row[1] for row in rows}
+
+  # Copy words, groups, word_groups and study_activities added or changed in
+  # the shared database since the learner's last sync into the learner's
+  # database (sql/learners/sync_vocabulary.sql), in one transaction on it.
+  # Returns whether anything had changed.
+  def sync_learner(self, learner, pool=None):
+    pool = pool or self._learner_pool(learner)
+    shared = self.primary_pool()
+    connection = shared.acquire()
+    try:
+      generations = self._vocabulary_generations(connection, 'cache_generations')
+    finally:
+      shared.release(connection)
+    with pool.writer() as connection:
+      # Learners not migrated yet (invoke migrate --learners-dir) are synced
+      # once they are
+      migrated = connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'vocabulary_sync'"
+      ).fetchone()
+      if not migrated or self._vocabulary_generations(connection, 'vocabulary_sync') == generations:
+        return False
+      # ATTACH is not allowed inside a transaction
+      connection.execute('ATTACH DATABASE ? AS shared', (self.database,))
+      try:
+        connection.execute('BEGIN IMMEDIATE')
+        try:
+          cursor = self._cursor(connection)
+          self.execute_script(cursor, self.sql('learners/sync_vocabulary.sql'))
+          bump_generation(cursor, 'vocabulary', 'activities')
+          connection.commit()
+        except BaseException:
+          connection.rollback()
+          raise
+      finally:
+        connection.execute('DETACH DATABASE shared')
+    return True
+
+  # sync_learner() for every learner with a database (e.g. after an import
+  # into the shared one); returns the learners that were updated
+  def sync_learners(self):
+    updated = []
+    for learner in self.learners():
+      pool = ConnectionPool(self.learner_database(learner), max_readers=1)
+      try:
+        if self.sync_learner(learner, pool):
+          updated.append(learner)
+      finally:
+        pool.close()
+    return updated
+
+  # Receive every SQL statement run on any pooled connection (None to stop)
+  def set_trace_callback(self, callback):
+    self.trace_callback = callback
+    self.pool().trace_callback = callback
+    with self._pool_lock:
+      for pool in self._learner_pools.values():
+        pool.trace_callback = callback
+      if self._replica_pool is not None:
+        self._replica_pool.trace_callback = callback
 
   def get(self):
     if 'db' not in g:
-      g.db = sqlite3.connect(self.database)
-      g.db.row_factory = sqlite3.Row  # Return rows as dictionaries
+      # Remember the pool, the connection goes back to it even if the
+      # learner's pool is evicted meanwhile
+      g.db_pool = self.pool()
+      g.db = g.db_pool.acquire()
     return g.db
 
   def commit(self):
     self.get().commit()
 
   def cursor(self):
-    # Ensure the connection is valid before getting a cursor
+    # Read-only cursor on this request's pooled reader connection
     connection = self.get()
-    return connection.cursor()
+    return self._cursor(connection)
+
+  def _cursor(self, connection):
+    cursor = connection.cursor()
+    return self.tracer.wrap(cursor) if self.tracer else cursor
+
+  @contextmanager
+  def transaction(self):
+    # All writes go through the single writer connection, one transaction at
+    # a time (the primary's, also in views reading from the replica)
+    learner = g.get('learner') if has_app_context() else None
+    pool = self._learner_pool(learner) if learner is not None else self.primary_pool()
+    with pool.writer() as connection:
+      if connection.in_transaction:
+        # Nested use joins the outer transaction
+        yield self._cursor(connection)
+        return
+      connection.execute('BEGIN IMMEDIATE')
+      try:
+        yield self._cursor(connection)
+        connection.commit()
+      except BaseException:
+        connection.rollback()
+        raise
 
   def close(self):
     db = g.pop('db', None)
+    pool = g.pop('db_pool', None)
     if db is not None:
-      db.close()
+      pool.release(db)
+
+  def dispose(self):
+    if self._pool is not None:
+      self._pool.close()
+      self._pool = None
+    if self._replicator is not None:
+      self._replicator[1].set()
+      self._replicator = None
+    if self._replica_pool is not None:
+      self._replica_pool.close()
+      self._replica_pool = None
+    with self._pool_lock:
+      pools, self._learner_pools = list(self._learner_pools.values()), OrderedDict()
+    for pool in pools:
+      pool.close()
 
   # Function to load SQL from a file
   def sql(self, filepath):
@@ -36,99 +456,130 @@ class Db:
     with open(filepath, 'r') as file:
       return json.load(file)
 
+  # Run a multi-statement script on a cursor. Unlike executescript() this does
+  # not COMMIT first, so it composes with Db.transaction()
+  def execute_script(self, cursor, script):
+    statement = ''
+    for line in script.splitlines(keepends=True):
+      statement += line
+      if sqlite3.complete_statement(statement):
+        cursor.execute(statement)
+        statement = ''
+
   def setup_tables(self,cursor):
     # Create the necessary tables
     cursor.execute(self.sql('setup/create_table_words.sql'))
-    self.get().commit()
-
     cursor.execute(self.sql('setup/create_table_word_reviews.sql'))
-    self.get().commit()
-
     cursor.execute(self.sql('setup/create_table_word_review_items.sql'))
-    self.get().commit()
-
     cursor.execute(self.sql('setup/create_table_groups.sql'))
-    self.get().commit()
-
     cursor.execute(self.sql('setup/create_table_word_groups.sql'))
-    self.get().commit()
-
     cursor.execute(self.sql('setup/create_table_study_activities.sql'))
-    self.get().commit()
-
     cursor.execute(self.sql('setup/create_table_study_sessions.sql'))
-    self.get().commit()
 
-  def import_study_activities_json(self,cursor,data_json_path):
-    study_actvities = self.load_json(data_json_path)
-    for activity in study_actvities:
-      cursor.execute('''
-      INSERT INTO study_activities (name,url,preview_url) VALUES (?,?,?)
-      ''', (activity['name'],activity['url'],activity['preview_url'],))
-    self.get().commit()
+  # Delete all study sessions and their reviews; the triggers clear what is
+  # derived from them (word stats, schedules, dashboard and rollups)
+  def clear_history(self, cursor):
+    # Review items first, they reference the sessions
+    cursor.execute('DELETE FROM word_review_items')
+    cursor.execute('DELETE FROM study_sessions')
+    bump_generation(cursor, 'history')
 
-  def import_word_json(self,cursor,group_name,data_json_path):
-      # Insert a new group
-      cursor.execute('''
-        INSERT INTO groups (name) VALUES (?)
-      ''', (group_name,))
-      self.get().commit()
+  # clear_history() for a live database: whole sessions at a time, about
+  # `batch_size` review items per transaction, so writers only ever wait for
+  # one batch. Sessions started after the call are kept. Returns the number
+  # of sessions deleted.
+  def clear_history_in_batches(self, batch_size=CLEAR_HISTORY_BATCH, pause=0.0):
+    with self.transaction() as cursor:
+      cursor.execute('SELECT MAX(id) AS high FROM study_sessions')
+      high = cursor.fetchone()['high'] or 0
+    last = 0
+    deleted = 0
+    while last < high:
+      with self.transaction() as cursor:
+        # The next sessions until their review items fill a batch
+        cursor.execute('''
+          SELECT s.id, COALESCE(rc.count, 0) AS reviews
+          FROM study_sessions s
+          LEFT JOIN row_counts rc ON rc.scope = 'session_review_items' AND rc.scope_id = s.id
+          WHERE s.id > ? AND s.id <= ?
+          ORDER BY s.id
+          LIMIT ?
+        ''', (last, high, batch_size))
+        end, reviews, sessions = high, 0, 0
+        for session in cursor.fetchall():
+          end = session['id']
+          reviews += session['reviews']
+          sessions += 1
+          if reviews >= batch_size:
+            break
+        # Review items first, they reference the sessions
+        cursor.execute('DELETE FROM word_review_items WHERE study_session_id > ? AND study_session_id <= ?', (last, end))
+        cursor.execute('DELETE FROM study_sessions WHERE id > ? AND id <= ?', (last, end))
+        bump_generation(cursor, 'history')
+      deleted += sessions
+      last = end
+      if pause:
+        time.sleep(pause)
+    return deleted
 
-      # Get the ID of the group
-      cursor.execute('SELECT id FROM groups WHERE name = ?', (group_name,))
-      core_verbs_group_id = cursor.fetchone()[0]
+  # Apply every pending migration in sql/migrations on an open transaction
+  # (see lib/migrations.py), e.g. while creating a database
+  def run_migrations(self, cursor):
+    return Migrator(self).migrate_all(cursor)
 
-      # Insert some sample words (verbs) from JSON file and associate with the group
-      words = self.load_json(data_json_path)
+  # Recompute one derived table (e.g. 'dashboard_stats') from scratch
+  def rebuild(self, cursor, name):
+    self.execute_script(cursor, self.sql('rebuild/' + name + '.sql'))
 
-      for word in words:
-        # Insert the word into the words table
-        cursor.execute('''
-          INSERT INTO words (kanji, romaji, english, parts) VALUES (?, ?, ?, ?)
-        ''', (word['kanji'], word['romaji'], word['english'], json.dumps(word['parts'])))
-        
-        # Get the last inserted word's ID
-        word_id = cursor.lastrowid
+  # Apply pending migrations one transaction each, then run their online
+  # backfills batch by batch
+  def migrate(self, pause=0.0, log=None):
+    return Migrator(self).migrate(pause=pause, log=log)
 
-        # Insert the word-group relationship into word_groups table
-        cursor.execute('''
-          INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)
-        ''', (word_id, core_verbs_group_id))
-      self.get().commit()
+  # What migrate() would do, without changing anything
+  def migration_plan(self):
+    connection = self.pool().acquire()
+    try:
+      return Migrator(self).plan(connection.cursor())
+    finally:
+      self.pool().release(connection)
 
-      # Update the words_count in the groups table by counting all words in the group
+  def import_study_activities_json(self,cursor,data_json_path):
+    study_actvities = self.load_json(data_json_path)
+    for activity in study_actvities:
       cursor.execute('''
-        UPDATE groups
-        SET words_count = (
-          SELECT COUNT(*) FROM word_groups WHERE group_id = ?
-        )
-        WHERE id = ?
-      ''', (core_verbs_group_id, core_verbs_group_id))
-
-      self.get().commit()
+      INSERT INTO study_activities (name,url,preview_url) VALUES (?,?,?)
+      ''', (activity['name'],activity['url'],activity['preview_url'],))
+    bump_generation(cursor, 'activities')
 
-      print(f"Successfully added {len(words)} verbs to the '{group_name}' group.")
+  def import_word_json(self,cursor,group_name,data_json_path):
+      # Stream, deduplicate and bulk insert the words (see lib/importer.py)
+      from lib import importer
+      stats = importer.import_words(cursor, data_json_path, group_name)
+      print(f"Successfully added {stats.inserted} words to the '{group_name}' group.")
+      return stats
 
   # Initialize the database with sample data
   def init(self, app):
     with app.app_context():
-      cursor = self.cursor()
-      self.setup_tables(cursor)
-      self.import_word_json(
-        cursor=cursor,
-        group_name='Core Verbs',
-        data_json_path='seed/data_verbs.json'
-      )
-      self.import_word_json(
-        cursor=cursor,
-        group_name='Core Adjectives',
-        data_json_path='seed/data_adjectives.json'
-      )
-
-      self.import_study_activities_json(
-        cursor=cursor,
-        data_json_path='seed/study_activities.json'
-      )
+      with self.transaction() as cursor:
+        self.setup_tables(cursor)
+        self.run_migrations(cursor)
+        self.import_word_json(
+          cursor=cursor,
+          group_name='Core Verbs',
+          data_json_path='seed/data_verbs.json'
+        )
+        self.import_word_json(
+          cursor=cursor,
+          group_name='Core Adjectives',
+          data_json_path='seed/data_adjectives.json'
+        )
+
+        self.import_study_activities_json(
+          cursor=cursor,
+          data_json_path='seed/study_activities.json'
+        )
 
 # Create an instance of the Db class
 db = Db()
@@ -0,0 +1,92 @@
+import csv
+import io
+import json
+import zlib
+from datetime import datetime, timezone
+
+from lib.serialization import dumps_line
+
+# Streaming exports. Rows are read from a pooled reader connection in batches
+# of plain tuples and encoded as NDJSON or CSV into ~64KB chunks, optionally
+# gzip compressed, so memory use does not depend on the size of the table.
+
+BATCH_SIZE = 1000
+CHUNK_SIZE = 1 << 16
+
+CONTENT_TYPES = {
+  'ndjson': 'application/x-ndjson; charset=utf-8',
+  'csv': 'text/csv; charset=utf-8',
+}
+
+# `since` accepts ISO 8601 (a date or a datetime, optionally with an offset)
+# and is compared against the stored UTC 'YYYY-MM-DD HH:MM:SS' timestamps
+def parse_since(value):
+  try:
+    since = datetime.fromisoformat(value.replace('Z', '+00:00'))
+  except ValueError:
+    raise ValueError(f"invalid since: {value}")
+  if since.tzinfo is not None:
+    since = since.astimezone(timezone.utc).replace(tzinfo=None)
+  return since.strftime('%Y-%m-%d %H:%M:%S')
+
+# Yield the rows of a query as tuples. The connection is held only while the
+# response is being streamed and goes back to the pool when the generator
+# finishes or is closed by a disconnecting client.
+def stream_rows(pool, sql, params=()):
+  connection = pool.acquire()
+  cursor = connection.cursor()
+  try:
+    cursor.row_factory = None
+    cursor.execute(sql, params)
+    while True:
+      batch = cursor.fetchmany(BATCH_SIZE)
+      if not batch:
+        return
+      yield from batch
+  finally:
+    cursor.close()
+    pool.release(connection)
+
+def ndjson_lines(columns, rows, json_columns=(), bool_columns=()):
+  encode = dumps_line
+  for row in rows:
+    record = dict(zip(columns, row))
+    for column in json_columns:
+      record[column] = json.loads(record[column]) if record[column] else None
+    for column in bool_columns:
+      record[column] = bool(record[column])
+    yield encode(record) + '\n'
+
+def csv_lines(columns, rows):
+  buffer = io.StringIO()
+  writer = csv.writer(buffer, lineterminator='\n')
+  writer.writerow(columns)
+  for row in rows:
+    writer.writerow(row)
+    if buffer.tell() >= CHUNK_SIZE:
+      yield buffer.getvalue()
+      buffer.seek(0)
+      buffer.truncate()
+  yield buffer.getvalue()
+
+# Join lines into chunks of about CHUNK_SIZE bytes, gzip compressed if asked
+def chunks(lines, gzip=False):
+  # Level 1: exports are large and streamed, speed matters more than ratio.
+  # wbits 31 selects the gzip container.
+  compressor = zlib.compressobj(1, zlib.DEFLATED, 31) if gzip else None
+  pending = []
+  size = 0
+  for line in lines:
+    pending.append(line)
+    size += len(line)
+    if size >= CHUNK_SIZE:
+      data = ''.join(pending).encode('utf-8')
+      pending, size = [], 0
+      data = compressor.compress(data) if compressor else data
+      if data:
+        yield data
+  data = ''.join(pending).encode('utf-8')
+  if compressor:
+    data = compressor.compress(data) + compressor.flush()
+  if data:
+    yield data
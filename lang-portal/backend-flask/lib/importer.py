@@ -0,0 +1,238 @@
+import csv
+import json
+import os
+import time
+
+from lib import snapshots
+from lib.cache import bump_generation
+
+# Bulk vocabulary import. Files are streamed (JSON arrays are decoded one
+# element at a time), rows are deduplicated on (kanji, romaji) and loaded
+# through a temp staging table with set-based INSERTs, all inside the
+# caller's transaction.
+
+FORMATS = {'.json': 'json', '.jsonl': 'jsonl', '.ndjson': 'jsonl', '.csv': 'csv'}
+
+# Above this many new words (and when they at least double the table) the
+# words/word_groups indexes are dropped and rebuilt once after the load
+DEFER_INDEXES_MIN_ROWS = 10000
+
+class ImportStats:
+  def __init__(self):
+    self.read = 0
+    self.skipped = 0
+    self.duplicates = 0
+    self.inserted = 0
+    self.linked = 0
+    self.seconds = 0.0
+    self.deferred_indexes = False
+
+  @property
+  def rows_per_sec(self):
+    return self.read / self.seconds if self.seconds else 0.0
+
+  def __str__(self):
+    return (
+      f"read {self.read} rows ({self.skipped} invalid, {self.duplicates} duplicates), "
+      f"inserted {self.inserted} words, linked {self.linked} to the group "
+      f"in {self.seconds:.2f}s ({self.rows_per_sec:,.0f} rows/sec)"
+    )
+
+def detect_format(path):
+  extension = os.path.splitext(path)[1].lower()
+  if extension not in FORMATS:
+    raise ValueError(f"Unsupported vocabulary file: {path} (expected one of {', '.join(FORMATS)})")
+  return FORMATS[extension]
+
+# Yield the elements of a top-level JSON array of objects without loading
+# the whole file
+def read_json(path, chunk_size=1 << 16):
+  decoder = json.JSONDecoder()
+  with open(path, 'r', encoding='utf-8') as file:
+    buffer = file.read(chunk_size)
+    position = 0
+    started = False
+    while True:
+      # Skip whitespace and separators, reading more of the file as needed
+      while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+          position += 1
+        if position < len(buffer):
+          break
+        buffer, position = file.read(chunk_size), 0
+        if not buffer:
+          if started:
+            raise ValueError(f"{path}: unterminated JSON array")
+          return
+      if not started:
+        if buffer[position] != '[':
+          raise ValueError(f"{path}: expected a JSON array of words")
+        started = True
+        position += 1
+        continue
+      if buffer[position] == ']':
+        return
+      try:
+        item, position = decoder.raw_decode(buffer, position)
+      except json.JSONDecodeError:
+        # The element straddles the end of the buffer
+        chunk = file.read(chunk_size)
+        if not chunk:
+          raise
+        buffer, position = buffer[position:] + chunk, 0
+        continue
+      yield item
+
+def read_jsonl(path):
+  with open(path, 'r', encoding='utf-8') as file:
+    for line in file:
+      if line.strip():
+        yield json.loads(line)
+
+# CSV columns: kanji, romaji, english and optionally parts (as a JSON string)
+def read_csv(path):
+  with open(path, 'r', encoding='utf-8', newline='') as file:
+    for row in csv.DictReader(file):
+      parts = row.get('parts')
+      row['parts'] = json.loads(parts) if parts else []
+      yield row
+
+READERS = {'json': read_json, 'jsonl': read_jsonl, 'csv': read_csv}
+
+def _rows(items, stats):
+  seen = set()
+  for item in items:
+    stats.read += 1
+    try:
+      kanji, romaji, english = item['kanji'].strip(), item['romaji'].strip(), item['english'].strip()
+    except (KeyError, AttributeError, TypeError):
+      stats.skipped += 1
+      continue
+    if not kanji or not romaji or not english:
+      stats.skipped += 1
+      continue
+    if (kanji, romaji) in seen:
+      stats.duplicates += 1
+      continue
+    seen.add((kanji, romaji))
+    yield kanji, romaji, english, json.dumps(item.get('parts') or [], ensure_ascii=False)
+
+def get_or_create_group(cursor, group_name):
+  cursor.execute('SELECT id FROM groups WHERE name = ?', (group_name,))
+  group = cursor.fetchone()
+  if group:
+    return group[0]
+  cursor.execute('INSERT INTO groups (name) VALUES (?)', (group_name,))
+  return cursor.lastrowid
+
+def _drop_indexes(cursor, tables):
+  cursor.execute(f'''
+    SELECT name, sql FROM sqlite_master
+    WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN ({','.join('?' * len(tables))})
+  ''', tables)
+  indexes = cursor.fetchall()
+  for name, _ in indexes:
+    cursor.execute(f'DROP INDEX "{name}"')
+  return [sql for _, sql in indexes]
+
+# Import a vocabulary file into `group_name` (created if needed). Must run
+# inside a write transaction, e.g. `with db.transaction() as cursor`.
+def import_words(cursor, path, group_name, format=None, defer_indexes=None):
+  stats = ImportStats()
+  started = time.perf_counter()
+  reader = READERS[format or detect_format(path)]
+
+  group_id = get_or_create_group(cursor, group_name)
+
+  cursor.execute('DROP TABLE IF EXISTS temp.import_staging')
+  cursor.execute('''
+    CREATE TEMP TABLE import_staging (
+      seq INTEGER PRIMARY KEY,
+      kanji TEXT NOT NULL,
+      romaji TEXT NOT NULL,
+      english TEXT NOT NULL,
+      parts TEXT NOT NULL,
+      word_id INTEGER,
+      is_new INTEGER NOT NULL DEFAULT 0,
+      linked INTEGER NOT NULL DEFAULT 0
+    )
+  ''')
+  cursor.executemany('''
+    INSERT INTO import_staging (kanji, romaji, english, parts) VALUES (?, ?, ?, ?)
+  ''', _rows(reader(path), stats))
+
+  # Match words that already exist, and note which are already in the group
+  cursor.execute('''
+    UPDATE import_staging SET word_id = (
+      SELECT w.id FROM words w
+      WHERE w.kanji = import_staging.kanji AND w.romaji = import_staging.romaji
+      ORDER BY w.id LIMIT 1
+    )
+  ''')
+  cursor.execute('''
+    UPDATE import_staging SET linked = EXISTS (
+      SELECT 1 FROM word_groups wg
+      WHERE wg.word_id = import_staging.word_id AND wg.group_id = ?
+    )
+    WHERE word_id IS NOT NULL
+  ''', (group_id,))
+  stats.duplicates += cursor.execute('SELECT COUNT(*) FROM import_staging WHERE word_id IS NOT NULL').fetchone()[0]
+
+  # Allocate ids for the new words up front so the group links can be
+  # inserted set-based too
+  cursor.execute('''
+    SELECT MAX(
+      COALESCE((SELECT MAX(id) FROM words), 0),
+      COALESCE((SELECT seq FROM sqlite_sequence WHERE name = 'words'), 0)
+    )
+  ''')
+  next_id = cursor.fetchone()[0]
+  cursor.execute('''
+    WITH numbered AS (
+      SELECT seq, ROW_NUMBER() OVER (ORDER BY seq) AS n
+      FROM import_staging
+      WHERE word_id IS NULL
+    )
+    UPDATE import_staging SET word_id = ? + numbered.n, is_new = 1
+    FROM numbered
+    WHERE numbered.seq = import_staging.seq
+  ''', (next_id,))
+  new_words = cursor.execute('SELECT COUNT(*) FROM import_staging WHERE is_new = 1').fetchone()[0]
+  existing_words = next_id
+
+  if defer_indexes is None:
+    defer_indexes = new_words >= DEFER_INDEXES_MIN_ROWS and new_words >= existing_words
+  index_sql = _drop_indexes(cursor, ('words', 'word_groups')) if defer_indexes else []
+  stats.deferred_indexes = bool(defer_indexes)
+
+  cursor.execute('''
+    INSERT INTO words (id, kanji, romaji, english, parts)
+    SELECT word_id, kanji, romaji, english, parts
+    FROM import_staging
+    WHERE is_new = 1
+    ORDER BY word_id
+  ''')
+  stats.inserted = cursor.rowcount
+  cursor.execute('''
+    INSERT INTO word_groups (word_id, group_id)
+    SELECT word_id, ? FROM import_staging WHERE linked = 0 ORDER BY word_id
+  ''', (group_id,))
+  stats.linked = cursor.rowcount
+
+  for sql in index_sql:
+    cursor.execute(sql)
+
+  # Refresh the words_count counter cache for the group
+  cursor.execute('''
+    UPDATE groups
+    SET words_count = (SELECT COUNT(*) FROM word_groups WHERE group_id = ?)
+    WHERE id = ?
+  ''', (group_id, group_id))
+  cursor.execute('DROP TABLE temp.import_staging')
+  bump_generation(cursor, 'vocabulary')
+
+  # Study activities download the group as a snapshot, have it ready
+  snapshots.build(cursor, group_id)
+
+  stats.seconds = time.perf_counter() - started
+  return stats
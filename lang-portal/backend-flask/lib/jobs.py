@@ -0,0 +1,69 @@
+import threading
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import g
+
+# Maintenance work too long for a request (e.g. archiving and clearing a large
+# study history) runs on a background thread; the request that starts it gets
+# the job back at once and clients poll its status. A job runs with the
+# learner of the request that started it, so it touches the same database.
+# Jobs live in the process that started them: behind several worker processes
+# poll with the same worker, or run the equivalent invoke task instead.
+
+def _now():
+  return datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+class Jobs:
+  def __init__(self, app, history=50):
+    self.app = app
+    self.history = history
+    self._jobs = OrderedDict()  # id -> job, oldest first
+    self._lock = threading.Lock()
+
+  # Start `work()` in the background, unless the same kind of job is already
+  # running for this learner, in which case that job is returned instead
+  def start(self, kind, work):
+    learner = g.get('learner')
+    with self._lock:
+      for job in self._jobs.values():
+        if job['kind'] == kind and job['learner'] == learner and job['status'] == 'running':
+          return job
+      job = {
+        'id': uuid.uuid4().hex,
+        'kind': kind,
+        'learner': learner,
+        'status': 'running',
+        'started_at': _now(),
+        'finished_at': None,
+        'result': None,
+        'error': None,
+      }
+      self._jobs[job['id']] = job
+      # Forget the oldest finished jobs
+      finished = [id for id, old in self._jobs.items() if old['status'] != 'running']
+      for id in finished[:max(0, len(self._jobs) - self.history)]:
+        del self._jobs[id]
+    threading.Thread(target=self._run, args=(job, work), name=f'job-{kind}', daemon=True).start()
+    return job
+
+  def _run(self, job, work):
+    with self.app.app_context():
+      if job['learner'] is not None:
+        g.learner = job['learner']
+      try:
+        result, status, error = work(), 'done', None
+      except Exception as e:
+        self.app.logger.exception('Job %s (%s) failed', job['id'], job['kind'])
+        result, status, error = None, 'failed', str(e)
+    with self._lock:
+      job.update(result=result, status=status, error=error, finished_at=_now())
+
+  # The job with this id, if it was started for the current learner
+  def get(self, id):
+    with self._lock:
+      job = self._jobs.get(id)
+      if job is None or job['learner'] != g.get('learner'):
+        return None
+      return dict(job)
@@ -0,0 +1,118 @@
+import unicodedata
+
+# Romaji <-> kana conversion (modified Hepburn, as used by the seed data:
+# long vowels are written out, e.g. どう -> dou) for search normalization.
+
+HIRAGANA = {
+  'あ': 'a', 'い': 'i', 'う': 'u', 'え': 'e', 'お': 'o',
+  'か': 'ka', 'き': 'ki', 'く': 'ku', 'け': 'ke', 'こ': 'ko',
+  'が': 'ga', 'ぎ': 'gi', 'ぐ': 'gu', 'げ': 'ge', 'ご': 'go',
+  'さ': 'sa', 'し': 'shi', 'す': 'su', 'せ': 'se', 'そ': 'so',
+  'ざ': 'za', 'じ': 'ji', 'ず': 'zu', 'ぜ': 'ze', 'ぞ': 'zo',
+  'た': 'ta', 'ち': 'chi', 'つ': 'tsu', 'て': 'te', 'と': 'to',
+  'だ': 'da', 'ぢ': 'ji', 'づ': 'zu', 'で': 'de', 'ど': 'do',
+  'な': 'na', 'に': 'ni', 'ぬ': 'nu', 'ね': 'ne', 'の': 'no',
+  'は': 'ha', 'ひ': 'hi', 'ふ': 'fu', 'へ': 'he', 'ほ': 'ho',
+  'ば': 'ba', 'び': 'bi', 'ぶ': 'bu', 'べ': 'be', 'ぼ': 'bo',
+  'ぱ': 'pa', 'ぴ': 'pi', 'ぷ': 'pu', 'ぺ': 'pe', 'ぽ': 'po',
+  'ま': 'ma', 'み': 'mi', 'む': 'mu', 'め': 'me', 'も': 'mo',
+  'や': 'ya', 'ゆ': 'yu', 'よ': 'yo',
+  'ら': 'ra', 'り': 'ri', 'る': 'ru', 'れ': 're', 'ろ': 'ro',
+  'わ': 'wa', 'ゐ': 'i', 'ゑ': 'e', 'を': 'o', 'ん': 'n', 'ゔ': 'vu',
+  'ぁ': 'a', 'ぃ': 'i', 'ぅ': 'u', 'ぇ': 'e', 'ぉ': 'o',
+}
+
+# Small ya/yu/yo after an i-row kana: き + ゃ -> kya, し + ゃ -> sha
+YOUON = {'ゃ': 'a', 'ゅ': 'u', 'ょ': 'o'}
+YOUON_STEMS = {'shi': 'sh', 'chi': 'ch', 'ji': 'j'}
+
+KATAKANA_OFFSET = ord('ア') - ord('あ')
+
+# Macron spellings of long vowels, normalized to the written-out form
+MACRONS = str.maketrans({'ā': 'aa', 'ī': 'ii', 'ū': 'uu', 'ē': 'ei', 'ō': 'ou', 'â': 'aa', 'î': 'ii', 'û': 'uu', 'ê': 'ei', 'ô': 'ou'})
+
+def to_hiragana(text):
+  return ''.join(
+    chr(ord(char) - KATAKANA_OFFSET) if 'ァ' <= char <= 'ヴ' else char
+    for char in text
+  )
+
+def is_kana(char):
+  return 'ぁ' <= char <= 'ゟ' or '゠' <= char <= 'ヿ'
+
+def has_kana(text):
+  return any(is_kana(char) for char in text)
+
+# Kana (hiragana or katakana) to romaji; anything else is kept as is
+def to_romaji(text):
+  text = to_hiragana(unicodedata.normalize('NFKC', text))
+  result = []
+  double_next = False
+  for char in text:
+    if char == 'っ':
+      double_next = True
+      continue
+    if char in YOUON and result and result[-1].endswith('i'):
+      stem = result[-1]
+      for full, short in YOUON_STEMS.items():
+        if stem.endswith(full):
+          stem = stem[:-len(full)] + short
+          break
+      else:
+        stem = stem[:-1] + 'y'
+      result[-1] = stem + YOUON[char]
+      continue
+    if char == 'ー':
+      # Long vowel mark repeats the previous vowel
+      if result and result[-1][-1:] in 'aiueo':
+        result.append(result[-1][-1])
+      continue
+    romaji = HIRAGANA.get(char, char)
+    if double_next:
+      if romaji[:1] not in 'aiueon':
+        romaji = ('t' if romaji.startswith('ch') else romaji[0]) + romaji
+      double_next = False
+    result.append(romaji)
+  return ''.join(result)
+
+ROMAJI = {}
+for kana, romaji in HIRAGANA.items():
+  if kana not in 'ぁぃぅぇぉゐゑをぢづ':
+    ROMAJI.setdefault(romaji, kana)
+ROMAJI.update({'o': 'お', 'wo': 'を', 'si': 'し', 'ti': 'ち', 'tu': 'つ', 'hu': 'ふ', 'zi': 'じ'})
+for kana, romaji in list(HIRAGANA.items()):
+  if romaji.endswith('i') and len(romaji) > 1 and kana not in 'ゐぢ':
+    stem = YOUON_STEMS.get(romaji, romaji[:-1] + 'y')
+    for small, vowel in YOUON.items():
+      ROMAJI.setdefault(stem + vowel, kana + small)
+ROMAJI_LENGTHS = sorted({len(romaji) for romaji in ROMAJI}, reverse=True)
+
+# Romaji to hiragana, longest match first. Returns None if the text is not
+# entirely romaji (e.g. English), so callers can skip the kana variant.
+def to_kana(text):
+  text = normalize_romaji(text)
+  result = []
+  i = 0
+  while i < len(text):
+    char = text[i]
+    if char in ' -\'':
+      i += 1
+      continue
+    # Doubled consonant -> small tsu (kitte, matcha)
+    if i + 1 < len(text) and char not in 'aiueon' and (text[i + 1] == char or (char == 't' and text[i + 1] == 'c')):
+      result.append('っ')
+      i += 1
+      continue
+    for length in ROMAJI_LENGTHS:
+      chunk = text[i:i + length]
+      if chunk in ROMAJI:
+        result.append(ROMAJI[chunk])
+        i += length
+        break
+    else:
+      return None
+  return ''.join(result)
+
+# Lowercase, spell out macron long vowels and drop n' separators
+def normalize_romaji(text):
+  return unicodedata.normalize('NFC', text).lower().translate(MACRONS).replace("n'", 'n')
@@ -0,0 +1,39 @@
+import re
+
+from flask import g, jsonify, request
+
+# Per-learner data. With LEARNERS_DIR configured every request names its
+# learner in the X-Learner header and is served from that learner's own
+# database (see Db.pool), created on the first request. Requests without the
+# header (e.g. from frontend-react, which doesn't send it) are served as
+# DEFAULT_LEARNER, or refused when that is empty. Nothing a learner does
+# reads or writes another learner's rows, and the size of one learner's
+# history doesn't depend on how many learners there are.
+
+LEARNER_HEADER = 'X-Learner'
+
+# Learner names are used as file names
+LEARNER_NAME = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# Served from the shared database without a learner
+SHARED_PATH_PREFIXES = ('/debug/',)
+
+class Learners:
+  def __init__(self, app):
+    self.app = app
+    self.default = app.config.get('DEFAULT_LEARNER')
+    if self.default and not LEARNER_NAME.match(self.default):
+      raise ValueError(f"invalid DEFAULT_LEARNER: {self.default}")
+    app.before_request(self._before_request)
+
+  def _before_request(self):
+    # Preflights carry no custom headers, CORS answers them
+    if request.method == 'OPTIONS' or request.path.startswith(SHARED_PATH_PREFIXES):
+      return None
+    learner = request.headers.get(LEARNER_HEADER) or self.default
+    if not learner:
+      return jsonify({"error": f"{LEARNER_HEADER} header is required"}), 400
+    if not LEARNER_NAME.match(learner):
+      return jsonify({"error": f"invalid {LEARNER_HEADER}: letters, digits, '-' and '_' only, at most 64"}), 400
+    g.learner = learner
+    return None
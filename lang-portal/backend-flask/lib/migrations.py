@@ -0,0 +1,182 @@
+import hashlib
+import os
+import re
+import sqlite3
+import time
+
+# Versioned schema migrations. Each sql/migrations/NNNN_name.sql runs once, in
+# its own transaction, and is recorded in schema_migrations with a checksum of
+# its file. Two directives (SQL comments) extend a migration:
+#
+#   -- rebuild: <name>
+#       Recompute a derived table with sql/rebuild/<name>.sql, in the same
+#       transaction, once the migration's schema is in place.
+#
+#   -- backfill: <table> [batch <rows>]
+#       Everything below this line is an online backfill. It runs after the
+#       migration has committed, over rowid ranges of <table> (bound to
+#       :start and :end, start <= rowid < end), one short transaction per
+#       batch. Readers are never blocked and writers only wait for the
+#       current batch. Progress is recorded after every batch, so an
+#       interrupted backfill resumes where it stopped. The migration itself
+#       must make sure rows written from then on get the new value (a column
+#       DEFAULT or a trigger); the backfill covers the rows that existed.
+#
+# Adding a column with ALTER TABLE ... ADD COLUMN does not rewrite the table
+# in SQLite, so "add a column, then backfill it" stays online on any size of
+# table. CREATE INDEX does read the whole table: it blocks writers (not
+# readers) while it builds.
+
+BACKFILL = re.compile(r'^--\s*backfill:\s*(\w+)(?:\s+batch\s+(\d+))?\s*$', re.MULTILINE)
+REBUILD = re.compile(r'^--\s*rebuild:\s*(\w+)\s*$', re.MULTILINE)
+FILENAME = re.compile(r'^(\d+)_(\w+)\.sql$')
+
+DEFAULT_BATCH_SIZE = 5000
+
+class MigrationError(Exception):
+  pass
+
+class Migration:
+  def __init__(self, version, name, text):
+    self.version = version
+    self.name = name
+    self.checksum = hashlib.sha256(text.encode('utf-8')).hexdigest()
+    self.rebuilds = REBUILD.findall(text)
+    backfill = BACKFILL.search(text)
+    if backfill:
+      self.sql = text[:backfill.start()]
+      self.backfill_table = backfill.group(1)
+      self.backfill_batch = int(backfill.group(2) or DEFAULT_BATCH_SIZE)
+      self.backfill_sql = text[backfill.end():]
+    else:
+      self.sql = text
+      self.backfill_table = None
+      self.backfill_batch = None
+      self.backfill_sql = None
+
+  @property
+  def filename(self):
+    return f'{self.version:04d}_{self.name}.sql'
+
+def discover(directory=os.path.join('sql', 'migrations')):
+  migrations = []
+  for filename in sorted(os.listdir(directory)):
+    match = FILENAME.match(filename)
+    if not match:
+      continue
+    with open(os.path.join(directory, filename)) as file:
+      migrations.append(Migration(int(match.group(1)), match.group(2), file.read()))
+  versions = [migration.version for migration in migrations]
+  if len(versions) != len(set(versions)):
+    raise MigrationError(f"Duplicate migration versions in {directory}")
+  return migrations
+
+class Migrator:
+  def __init__(self, db, directory=os.path.join('sql', 'migrations')):
+    self.db = db
+    self.directory = directory
+
+  # Recorded migrations by version (none before the first versioned migrate)
+  def applied(self, cursor):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'schema_migrations'")
+    if cursor.fetchone() is None:
+      return {}
+    cursor.execute('SELECT * FROM schema_migrations ORDER BY version')
+    return {row['version']: row for row in cursor.fetchall()}
+
+  # What `migrate` would do: migrations to apply, backfills to finish and
+  # applied migrations whose file has changed since
+  def plan(self, cursor):
+    applied = self.applied(cursor)
+    migrations = discover(self.directory)
+    return {
+      'pending': [migration for migration in migrations if migration.version not in applied],
+      'backfilling': [
+        migration for migration in migrations
+        if migration.version in applied and migration.backfill_sql and applied[migration.version]['backfilled_at'] is None
+      ],
+      'changed': [
+        migration for migration in migrations
+        if migration.version in applied and applied[migration.version]['checksum'] != migration.checksum
+      ],
+    }
+
+  # Apply one migration on `cursor` and record it (backfill not included)
+  def apply(self, cursor, migration):
+    started = time.perf_counter()
+    cursor.execute(self.db.sql('setup/create_table_schema_migrations.sql'))
+    self.db.execute_script(cursor, migration.sql)
+    for name in migration.rebuilds:
+      self.db.rebuild(cursor, name)
+    cursor.execute('''
+      INSERT INTO schema_migrations (version, name, checksum, duration_ms, backfilled_at)
+      VALUES (?, ?, ?, ?, CASE WHEN ? THEN NULL ELSE CURRENT_TIMESTAMP END)
+    ''', (migration.version, migration.name, migration.checksum,
+          (time.perf_counter() - started) * 1000, migration.backfill_sql is not None))
+
+  # Run (or resume) a migration's backfill, one transaction per batch
+  def backfill(self, migration, pause=0.0, log=None):
+    with self.db.transaction() as cursor:
+      cursor.execute(f'SELECT MIN(rowid) AS low, MAX(rowid) AS high FROM {migration.backfill_table}')
+      bounds = cursor.fetchone()
+      cursor.execute('SELECT backfill_position FROM schema_migrations WHERE version = ?', (migration.version,))
+      position = cursor.fetchone()['backfill_position']
+    # Rows added after this point are the migration's DEFAULT/trigger's job
+    high = bounds['high'] if bounds['high'] is not None else -1
+    start = position if position is not None else (bounds['low'] or 0)
+
+    batches = 0
+    while start <= high:
+      end = start + migration.backfill_batch
+      with self.db.transaction() as cursor:
+        for statement in _statements(migration.backfill_sql):
+          cursor.execute(statement, {'start': start, 'end': end})
+        cursor.execute('UPDATE schema_migrations SET backfill_position = ? WHERE version = ?', (end, migration.version))
+      batches += 1
+      if log and batches % 100 == 0:
+        log(f"  {migration.filename}: backfilled {migration.backfill_table} up to rowid {end - 1} of {high}")
+      start = end
+      if pause:
+        time.sleep(pause)
+
+    with self.db.transaction() as cursor:
+      cursor.execute('UPDATE schema_migrations SET backfilled_at = CURRENT_TIMESTAMP WHERE version = ?', (migration.version,))
+    if log:
+      log(f"Backfilled {migration.filename} ({batches} batches of {migration.backfill_batch} {migration.backfill_table} rows)")
+
+  def _backfills(self, plan):
+    return plan['backfilling'] + [migration for migration in plan['pending'] if migration.backfill_sql]
+
+  # Apply pending migrations, each in its own transaction, then finish their
+  # backfills. Returns the plan that was carried out.
+  def migrate(self, pause=0.0, log=None):
+    with self.db.transaction() as cursor:
+      plan = self.plan(cursor)
+    for migration in plan['pending']:
+      started = time.perf_counter()
+      with self.db.transaction() as cursor:
+        self.apply(cursor, migration)
+      if log:
+        log(f"Applied {migration.filename} ({(time.perf_counter() - started) * 1000:.0f}ms)")
+    for migration in self._backfills(plan):
+      self.backfill(migration, pause=pause, log=log)
+    return plan
+
+  # Apply everything pending on an open transaction (new databases, where
+  # there is nothing to stay online for)
+  def migrate_all(self, cursor):
+    plan = self.plan(cursor)
+    for migration in plan['pending']:
+      self.apply(cursor, migration)
+    for migration in self._backfills(plan):
+      self.backfill(migration)
+    return plan
+
+def _statements(script):
+  statement = ''
+  for line in script.splitlines(keepends=True):
+    statement += line
+    if sqlite3.complete_statement(statement):
+      if statement.strip():
+        yield statement
+      statement = ''
@@ -0,0 +1,55 @@
+import base64
+import json
+
+# Upper bound on a client-chosen per_page
+MAX_PER_PAGE = 100
+
+class InvalidCursor(ValueError):
+  pass
+
+# Cursors are opaque to clients: the sort settings plus the (sort value, id)
+# of the last row on the page, base64 encoded. Keying on id as well as the
+# sort column keeps ordering stable when sort values repeat.
+def encode_cursor(sort_by, order, key):
+  payload = json.dumps({"s": sort_by, "o": order, "k": list(key)}, separators=(',', ':'))
+  return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(token, sort_by, order):
+  try:
+    padded = token + '=' * (-len(token) % 4)
+    payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    key = payload['k']
+  except (ValueError, KeyError, TypeError):
+    raise InvalidCursor("Invalid cursor")
+  if payload.get('s') != sort_by or payload.get('o') != order or not isinstance(key, list) or len(key) != 2:
+    raise InvalidCursor("Cursor does not match the requested sort order")
+  return key
+
+# WHERE fragment selecting rows strictly after the cursor key, as a row-value
+# comparison SQLite can answer with an index range scan
+def keyset_clause(expression, id_column, order):
+  operator = '>' if order == 'asc' else '<'
+  return f'({expression}, {id_column}) {operator} (?, ?)'
+
+# The two seeks that replace keyset_clause where the sort column has long runs
+# of equal values (e.g. review counts, 0 for every word never reviewed).
+# SQLite serves a row-value range on an index only through its first column
+# and filters the rest, so a cursor inside a run would walk the whole run.
+# Instead: the rest of the run, (expression = ? AND id > ?), then the rows past
+# it, (expression > ?), each an index range on (expression, id). Returns the
+# two WHERE fragments with their parameters for the cursor's key.
+def keyset_seeks(expression, id_column, order, key):
+  operator = '>' if order == 'asc' else '<'
+  value, last_id = key
+  return [
+    (f'{expression} = ? AND {id_column} {operator} ?', [value, last_id]),
+    (f'{expression} {operator} ?', [value]),
+  ]
+
+# Given limit + 1 fetched rows, trim the look-ahead row and build the cursor
+# for the next page (None on the last page)
+def next_page(rows, limit, sort_by, order, key):
+  if len(rows) <= limit:
+    return rows, None
+  rows = rows[:limit]
+  return rows, encode_cursor(sort_by, order, key(rows[-1]))
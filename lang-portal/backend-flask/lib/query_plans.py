@@ -0,0 +1,137 @@
+from lib.pagination import encode_cursor
+
+# GET routes on the hot path. Every SQL statement they issue is captured and
+# run through EXPLAIN QUERY PLAN.
+HOT_ROUTES = [
+  '/words',
+  '/words?sort_by=romaji&order=desc',
+  '/words?sort_by=romaji&cursor=' + encode_cursor('romaji', 'asc', ['m', 0]),
+  '/words?sort_by=correct_count',
+  '/words?sort_by=correct_count&cursor=' + encode_cursor('correct_count', 'asc', [5, 100]),
+  '/words?sort_by=wrong_count&order=desc&cursor=' + encode_cursor('wrong_count', 'desc', [5, 100]),
+  '/words/1',
+  '/words/search?q=tabe',
+  '/words/search?q=mountian',
+  '/kanji/日/words',
+  '/groups',
+  '/groups/1',
+  '/groups/1/words',
+  '/groups/1/study_sessions',
+  '/api/groups/1/due',
+  '/api/groups/1/snapshot',
+  '/api/groups/1/words/raw',
+  '/api/study-sessions',
+  '/api/study-sessions?cursor=' + encode_cursor('created_at', 'desc', ['2000-01-01 00:00:00', 0]),
+  '/api/study-sessions/1',
+  '/api/study-activities/1/sessions',
+  '/dashboard/recent-session',
+  '/dashboard/stats',
+  '/dashboard/timeseries',
+  '/dashboard/timeseries?granularity=week&group_id=1',
+  '/export/review_items?since=2000-01-01',
+  '/export/sessions?since=2000-01-01',
+]
+
+# Tables that grow with study history; a full scan of any of them is a regression
+LARGE_TABLES = {'words', 'word_counts', 'session_activity', 'word_review_items', 'word_reviews', 'study_sessions', 'word_groups', 'word_schedule', 'group_due_words', 'study_rollups', 'study_rollup_words', 'word_parts'}
+
+# Scans that are known and accepted, as (route, table); SORTED stands for a
+# temp b-tree sort. Keep this list short and remove entries as the underlying
+# queries are fixed.
+SORTED = 'ORDER BY'
+KNOWN_SCANS = {
+  # A group's members are read off (group_id, word_id) and sorted: the cost
+  # grows with the group's size, not with the page (see get_group_words)
+  ('/groups/1/words', SORTED),
+  # Likewise the words of one session, bounded by its reviews
+  ('/api/study-sessions/1', SORTED),
+}
+
+def explain(connection, sql, parameters=()):
+  return [row[3] for row in connection.execute('EXPLAIN QUERY PLAN ' + sql, parameters)]
+
+# A SCAN step reads a whole table or a whole index; only SEARCH steps are
+# bounded by a constraint such as (col=?) or (col>?). The one SCAN allowed is
+# the outer loop of a LIMITed query walking an index in the requested order
+# (nothing sorted afterwards), which stops after the page.
+def full_scans(plan, sql=''):
+  ordered_page = 'LIMIT' in sql.upper() and not sorts(plan)
+  scans = []
+  for i, detail in enumerate(plan):
+    words = detail.split()
+    if len(words) < 2 or words[0] != 'SCAN' or 'VIRTUAL TABLE' in detail or words[1] == 'CONSTANT':
+      continue
+    if i == 0 and ordered_page and 'INDEX' in detail:
+      continue
+    scans.append(words[1])
+  return scans
+
+# Whether the plan sorts rows in a temp b-tree for ORDER BY (all or part of it)
+def sorts(plan):
+  return any(detail.startswith('USE TEMP B-TREE') and 'ORDER BY' in detail for detail in plan)
+
+def is_paged(sql):
+  return 'OFFSET' in sql.upper()
+
+# Tables a plan reads, by the name or alias it uses
+def plan_tables(plan):
+  return [detail.split()[1] for detail in plan if detail.split()[0] in ('SCAN', 'SEARCH') and len(detail.split()) >= 2]
+
+def _tables(connection):
+  rows = connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")
+  return {row[0] for row in rows}
+
+# Alias-aware: `SCAN ss` refers to study_sessions in the statement that aliased it
+def _resolve(table, sql, tables):
+  if table in tables:
+    return table
+  tokens = sql.replace(',', ' ').replace('\n', ' ').split()
+  for i, token in enumerate(tokens[1:], start=1):
+    if token == table and tokens[i - 1] in tables:
+      return tokens[i - 1]
+    if token == table and i >= 2 and tokens[i - 1].upper() == 'AS' and tokens[i - 2] in tables:
+      return tokens[i - 2]
+  return table
+
+def capture(app, path):
+  statements = []
+  with app.app_context():
+    # The test client reuses this app context, so the pooled connection (and
+    # its trace callback) is the one the route will read from
+    connection = app.db.get()
+    connection.set_trace_callback(statements.append)
+    # Streaming routes (exports) read on a connection of their own
+    app.db.set_trace_callback(statements.append)
+    try:
+      response = app.test_client().get(path)
+      response.get_data()
+    finally:
+      connection.set_trace_callback(None)
+      app.db.set_trace_callback(None)
+  return response, [sql for sql in statements if sql.lstrip().upper().startswith(('SELECT', 'WITH'))]
+
+# Returns a list of (route, table, sql, plan) for every unexpected full scan
+def check(app, routes=HOT_ROUTES):
+  failures = []
+  with app.app_context():
+    connection = app.db.get()
+    tables = _tables(connection)
+  for path in routes:
+    response, statements = capture(app, path)
+    if response.status_code >= 500:
+      failures.append((path, None, response.get_data(as_text=True), []))
+      continue
+    with app.app_context():
+      connection = app.db.get()
+      for sql in statements:
+        plan = explain(connection, sql)
+        for table in full_scans(plan, sql):
+          table = _resolve(table, sql, tables)
+          if table in LARGE_TABLES and (path, table) not in KNOWN_SCANS:
+            failures.append((path, table, sql, plan))
+        # A page of a listing (LIMIT ? OFFSET ?) sorted after reading every
+        # row it could come from costs as much as all of them at any depth
+        if is_paged(sql) and sorts(plan) and (path, SORTED) not in KNOWN_SCANS:
+          if any(_resolve(table, sql, tables) in LARGE_TABLES for table in plan_tables(plan)):
+            failures.append((path, SORTED, sql, plan))
+  return failures
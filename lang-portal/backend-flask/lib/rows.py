@@ -0,0 +1,58 @@
+from operator import itemgetter
+
+# Query results to response dicts. A RowMapper is declared once per response
+# shape as a list of fields, each either a column name (used as the key too),
+# (key, column) or (key, column, convert). Columns are resolved against the
+# cursor's description once per query and each row becomes one dict(zip())
+# over an itemgetter instead of a key lookup per field on sqlite3.Row.
+#
+#   WORD = RowMapper('id', 'kanji', ('correct', 'correct_count'), ('new', 'due_at', is_none))
+#   words = WORD.all(cursor)
+
+def is_none(value):
+  return value is None
+
+class RowMapper:
+  def __init__(self, *fields):
+    self.fields = [(field, field, None) if isinstance(field, str) else tuple(field) + (None,) * (3 - len(field))
+                   for field in fields]
+    self.keys = tuple(key for key, _, _ in self.fields)
+    self._plans = {}
+
+  def _plan(self, description):
+    columns = tuple(column[0] for column in description)
+    plan = self._plans.get(columns)
+    if plan is None:
+      index = {name: position for position, name in enumerate(columns)}
+      positions = [index[column] for _, column, _ in self.fields]
+      converters = [(position, convert) for position, (_, _, convert) in enumerate(self.fields) if convert]
+      # itemgetter with one index returns the value rather than a 1-tuple
+      getter = itemgetter(*positions) if len(positions) > 1 else (lambda row, position=positions[0]: (row[position],))
+      plan = self._plans[columns] = (getter, converters)
+    return plan
+
+  # Fetch the rest of the cursor's result as dicts (before the cursor runs
+  # anything else, the columns come from its description)
+  def all(self, cursor):
+    rows = cursor.fetchall()
+    getter, converters = self._plan(cursor.description)
+    keys = self.keys
+    if not converters:
+      return [dict(zip(keys, getter(row))) for row in rows]
+    mapped = []
+    for row in rows:
+      values = list(getter(row))
+      for position, convert in converters:
+        values[position] = convert(values[position])
+      mapped.append(dict(zip(keys, values)))
+    return mapped
+
+  def one(self, cursor):
+    row = cursor.fetchone()
+    if row is None:
+      return None
+    getter, converters = self._plan(cursor.description)
+    values = list(getter(row))
+    for position, convert in converters:
+      values[position] = convert(values[position])
+    return dict(zip(self.keys, values))
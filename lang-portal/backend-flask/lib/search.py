@@ -0,0 +1,194 @@
+import difflib
+import itertools
+import re
+
+from lib.kana import has_kana, normalize_romaji, to_kana, to_romaji
+
+# Word search for GET /words/search. Two FTS5 indexes are kept in sync with
+# `words` by triggers (sql/migrations/0006_create_words_search.sql). Results
+# come in three tiers: exact matches on a whole field, word/prefix matches
+# ranked by bm25, and fuzzy matches ranked by similarity to catch typos.
+
+MAX_RESULTS = 100
+
+# bm25 is computed for at most this many matches (see _ranked)
+RANK_WINDOW = 1000
+
+# Fuzzy matching: queries shorter than this are not fuzzy matched. Candidates
+# share most of the query's FUZZY_TRIGRAMS rarest trigrams, or its first two
+# letters. Up to FUZZY_CANDIDATES of each kind are scored (in Python, which
+# is cheaper than bm25 here), and those with a similarity of at least
+# min_similarity(query) are kept.
+FUZZY_MIN_LENGTH = 3
+FUZZY_TRIGRAMS = 6
+FUZZY_CANDIDATES = 100
+FUZZY_MIN_SIMILARITY = 0.75
+
+# A short query reaches 0.75 against longer words that merely contain most of
+# its letters ("eat" and "great"), so below FUZZY_SHORT_LENGTH characters
+# only a near-identical field counts ("eat" and "eats", "ikku" and "iku")
+FUZZY_SHORT_LENGTH = 5
+FUZZY_SHORT_MIN_SIMILARITY = 0.85
+
+TOKEN = re.compile(r'\w+')
+
+WORD_COLUMNS = '''
+  w.id, w.kanji, w.romaji, w.english,
+  COALESCE(r.correct_count, 0) AS correct_count,
+  COALESCE(r.wrong_count, 0) AS wrong_count
+'''
+
+def _phrase(text):
+  return '"' + text.replace('"', '""') + '"'
+
+def _prefixes(tokens):
+  return ' AND '.join(_phrase(token) + '*' for token in tokens)
+
+# The query as typed, its romaji reading when it contains kana, and its kana
+# reading when it is romaji, all normalized (lowercase, no macrons)
+def readings(query):
+  text = normalize_romaji(query.strip())
+  romaji = to_romaji(text) if has_kana(text) else None
+  kana = to_kana(text) if not has_kana(text) else None
+  return text, romaji, kana
+
+# FTS5 MATCH expression: every token of the query as a prefix in any column,
+# or the romaji reading in the romaji column, or the kana reading in the
+# kanji and parts columns
+def match_expression(text, romaji=None, kana=None):
+  tokens = TOKEN.findall(text)
+  if not tokens:
+    return None
+  alternatives = [f'({_prefixes(tokens)})']
+  if romaji and TOKEN.findall(romaji) != tokens:
+    alternatives.append(f'romaji : ({_prefixes(TOKEN.findall(romaji))})')
+  if kana:
+    alternatives.append(f'{{kanji parts}} : ({_phrase(kana)}*)')
+  return ' OR '.join(alternatives)
+
+# Similarity in [0, 1] between the query (the matcher's second sequence) and
+# a field, compared with the whole field and with each of its words so that a
+# short query can match one word of a longer English gloss. Candidates that
+# cannot reach `floor` are skipped with the cheap upper bounds.
+def similarity(matcher, text, floor=0.0):
+  text = text.lower()
+  best = 0.0
+  for candidate in [text] + text.split():
+    matcher.set_seq1(candidate)
+    bound = max(best, floor)
+    if matcher.real_quick_ratio() >= bound and matcher.quick_ratio() >= bound:
+      best = max(best, matcher.ratio())
+  return best
+
+def min_similarity(text):
+  return FUZZY_SHORT_MIN_SIMILARITY if len(text) < FUZZY_SHORT_LENGTH else FUZZY_MIN_SIMILARITY
+
+def _words(cursor, ids):
+  if not ids:
+    return []
+  cursor.execute(f'''
+    SELECT {WORD_COLUMNS}
+    FROM words w
+    LEFT JOIN word_reviews r ON r.word_id = w.id
+    WHERE w.id IN ({','.join('?' * len(ids))})
+  ''', ids)
+  words = {word['id']: word for word in cursor.fetchall()}
+  return [words[id] for id in ids if id in words]
+
+# Ids of the best `limit` matches in an FTS5 table by bm25. Past RANK_WINDOW
+# matches only the first RANK_WINDOW (by word id) are ranked, so very common
+# terms stay cheap.
+def _ranked(cursor, table, expression, limit):
+  cursor.execute(f'''
+    SELECT rowid FROM {table} WHERE {table} MATCH ? ORDER BY rowid LIMIT 1 OFFSET ?
+  ''', (expression, RANK_WINDOW - 1))
+  cutoff = cursor.fetchone()
+  window = 'AND rowid <= ?' if cutoff else ''
+  cursor.execute(f'''
+    SELECT rowid FROM {table}
+    WHERE {table} MATCH ? {window}
+    ORDER BY rank
+    LIMIT ?
+  ''', (expression, *([cutoff[0]] if cutoff else []), limit))
+  return [row[0] for row in cursor.fetchall()]
+
+def _exact_matches(cursor, values, limit):
+  values = sorted(value for value in values if value)
+  placeholders = ','.join('?' * len(values))
+  cursor.execute(f'''
+    SELECT {WORD_COLUMNS}
+    FROM words w
+    LEFT JOIN word_reviews r ON r.word_id = w.id
+    WHERE w.kanji IN ({placeholders}) OR w.romaji IN ({placeholders}) OR w.english IN ({placeholders})
+    ORDER BY w.id
+    LIMIT ?
+  ''', (*values, *values, *values, limit))
+  return cursor.fetchall()
+
+def _fuzzy_matches(cursor, text, limit, exclude_ids):
+  # The rarest trigrams of the query; common ones ("to ", "ing") match a
+  # large share of the table and say little about similarity
+  query_trigrams = sorted({text[i:i + 3] for i in range(len(text) - 2)})
+  cursor.execute(f'''
+    SELECT term FROM words_trigram_vocab
+    WHERE term IN ({','.join('?' * len(query_trigrams))})
+    ORDER BY doc
+    LIMIT ?
+  ''', (*query_trigrams, FUZZY_TRIGRAMS))
+  rare = [_phrase(row['term']) for row in cursor.fetchall()]
+
+  ids = []
+  if rare:
+    # A typo breaks up to three trigrams, so candidates must share all but three
+    shared = max(min(2, len(rare)), len(rare) - 3)
+    expression = ' OR '.join('(' + ' AND '.join(group) + ')' for group in itertools.combinations(rare, shared))
+    cursor.execute('SELECT rowid FROM words_trigram WHERE words_trigram MATCH ? LIMIT ?', (expression, FUZZY_CANDIDATES))
+    ids.extend(row[0] for row in cursor.fetchall())
+  # Short words have too few trigrams (ikku -> iku), the leading letters catch those
+  leading = ' OR '.join(_phrase(token[:2]) + '*' for token in TOKEN.findall(text))
+  if leading:
+    cursor.execute('SELECT rowid FROM words_fts WHERE words_fts MATCH ? LIMIT ?', (leading, FUZZY_CANDIDATES))
+    ids.extend(row[0] for row in cursor.fetchall())
+  ids = [id for id in dict.fromkeys(ids) if id not in exclude_ids]
+
+  matcher = difflib.SequenceMatcher(None, b=text)
+  floor = min_similarity(text)
+  scored = []
+  for word in _words(cursor, ids):
+    score = max(similarity(matcher, word[column], floor) for column in ('romaji', 'english', 'kanji'))
+    if score >= floor:
+      scored.append((score, word))
+  scored.sort(key=lambda item: (-item[0], item[1]['id']))
+  return [word for _, word in scored[:limit]]
+
+# Ranked matches for `query`, each tagged with how it matched
+def search_words(cursor, query, limit=20):
+  text, romaji, kana = readings(query)
+  expression = match_expression(text, romaji, kana)
+  if expression is None:
+    return []
+
+  results = []
+  found = set()
+  def add(words, match):
+    for word in words:
+      if word['id'] not in found and len(results) < limit:
+        found.add(word['id'])
+        results.append({
+          "id": word["id"],
+          "kanji": word["kanji"],
+          "romaji": word["romaji"],
+          "english": word["english"],
+          "correct_count": word["correct_count"],
+          "wrong_count": word["wrong_count"],
+          "match": match
+        })
+
+  add(_exact_matches(cursor, {query.strip(), text, romaji, kana}, limit), 'exact')
+  if len(results) < limit:
+    add(_words(cursor, _ranked(cursor, 'words_fts', expression, limit + len(found))), 'prefix')
+
+  fuzzy_text = romaji or text
+  if len(results) < limit and len(fuzzy_text) >= FUZZY_MIN_LENGTH:
+    add(_fuzzy_matches(cursor, fuzzy_text, limit - len(results), found), 'fuzzy')
+  return results
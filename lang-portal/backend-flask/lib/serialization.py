@@ -0,0 +1,61 @@
+import json
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+  import orjson
+except ImportError:  # Optional: without it everything goes through the stdlib json
+  orjson = None
+
+# JSON for every response (jsonify, app.json) and request body. With orjson
+# installed, encoding and decoding run in C and responses are built straight
+# from the encoded bytes. Output matches the stdlib provider apart from
+# non-ASCII text being sent as UTF-8 instead of \u escapes: keys are still
+# sorted and dates, dataclasses and other types go through Flask's `default`.
+# JSON_PROVIDER picks 'orjson', 'json' or 'auto' (orjson when installed).
+
+class OrjsonProvider(DefaultJSONProvider):
+  def _options(self, indent=False):
+    options = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS
+    if self.sort_keys:
+      options |= orjson.OPT_SORT_KEYS
+    if indent:
+      options |= orjson.OPT_INDENT_2
+    return options
+
+  def dumps(self, obj, **kwargs):
+    # Arguments only the stdlib understands (e.g. cls) fall back to it
+    if kwargs.keys() - {'indent', 'separators'}:
+      return super().dumps(obj, **kwargs)
+    return orjson.dumps(obj, default=self.default, option=self._options(bool(kwargs.get('indent')))).decode('utf-8')
+
+  def loads(self, s, **kwargs):
+    if kwargs:
+      return super().loads(s, **kwargs)
+    return orjson.loads(s)
+
+  def response(self, *args, **kwargs):
+    obj = self._prepare_response_obj(args, kwargs)
+    indent = (self.compact is None and self._app.debug) or self.compact is False
+    body = orjson.dumps(obj, default=self.default, option=self._options(indent) | orjson.OPT_APPEND_NEWLINE)
+    return self._app.response_class(body, mimetype=self.mimetype)
+
+PROVIDERS = {
+  'orjson': OrjsonProvider,
+  'json': DefaultJSONProvider,
+}
+
+def provider_class(name='auto'):
+  if name == 'auto':
+    name = 'orjson' if orjson is not None else 'json'
+  if name == 'orjson' and orjson is None:
+    raise RuntimeError("JSON_PROVIDER is 'orjson' but orjson is not installed")
+  return PROVIDERS[name]
+
+# Compact one-line JSON of plain data (lists, dicts, str, numbers, None),
+# e.g. for NDJSON exports
+if orjson is not None:
+  def dumps_line(obj):
+    return orjson.dumps(obj).decode('utf-8')
+else:
+  dumps_line = json.JSONEncoder(ensure_ascii=False, separators=(',', ':')).encode
@@ -0,0 +1,86 @@
+import gzip
+import hashlib
+import json
+
+from flask import Response, make_response, request
+
+# Group vocabulary snapshots (see sql/migrations/0009_create_group_snapshots.sql).
+# A snapshot is the whole group in one compact JSON document, stored gzip
+# compressed so serving it is a single row read. Study activities cache it
+# on disk and revalidate with If-None-Match, which costs a 304 and no body
+# while the group is unchanged.
+
+# Bumped whenever the document's layout changes
+SNAPSHOT_FORMAT = 1
+
+# Build (or rebuild) the snapshot of a group on a write cursor. Returns it,
+# or None if the group doesn't exist.
+def build(cursor, group_id):
+  cursor.execute('SELECT id, name FROM groups WHERE id = ?', (group_id,))
+  group = cursor.fetchone()
+  if group is None:
+    return None
+
+  cursor.execute('''
+    SELECT DISTINCT w.id, w.kanji, w.romaji, w.english, w.parts
+    FROM word_groups wg
+    JOIN words w ON w.id = wg.word_id
+    WHERE wg.group_id = ?
+    ORDER BY w.id
+  ''', (group_id,))
+  words = [{
+    "id": word["id"],
+    "kanji": word["kanji"],
+    "romaji": word["romaji"],
+    "english": word["english"],
+    "parts": json.loads(word["parts"]) if word["parts"] else []
+  } for word in cursor.fetchall()]
+
+  document = json.dumps({
+    "format": SNAPSHOT_FORMAT,
+    "group_id": group["id"],
+    "group_name": group["name"],
+    "words": words
+  }, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+  snapshot = {
+    "etag": hashlib.sha256(document).hexdigest(),
+    # mtime=0 keeps the compressed bytes a function of the content alone
+    "body": gzip.compress(document, compresslevel=9, mtime=0),
+    "size": len(document),
+    "words_count": len(words)
+  }
+  cursor.execute('''
+    INSERT INTO group_snapshots (group_id, etag, body, size, words_count)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (group_id) DO UPDATE SET
+      etag = excluded.etag,
+      body = excluded.body,
+      size = excluded.size,
+      words_count = excluded.words_count,
+      built_at = CURRENT_TIMESTAMP
+  ''', (group_id, snapshot['etag'], snapshot['body'], snapshot['size'], snapshot['words_count']))
+  return snapshot
+
+# The stored snapshot of a group, or None if it has to be (re)built
+def get(cursor, group_id):
+  cursor.execute('SELECT etag, body FROM group_snapshots WHERE group_id = ?', (group_id,))
+  snapshot = cursor.fetchone()
+  return snapshot if snapshot is not None and snapshot['body'] is not None else None
+
+# Serve a snapshot with a strong ETag: the stored gzip bytes to clients that
+# accept gzip, decompressed JSON (under its own ETag) to those that don't
+def serve(snapshot):
+  compressed = request.accept_encodings['gzip'] > 0
+  etag = snapshot['etag'] if compressed else snapshot['etag'] + '-identity'
+  if request.if_none_match.contains(etag):
+    response = make_response('', 304)
+  else:
+    body = snapshot['body'] if compressed else gzip.decompress(snapshot['body'])
+    response = Response(body, content_type='application/json')
+    if compressed:
+      response.headers['Content-Encoding'] = 'gzip'
+  response.set_etag(etag)
+  # Cacheable, but always revalidated
+  response.headers['Cache-Control'] = 'no-cache'
+  response.headers['Vary'] = 'Accept-Encoding'
+  return response
@@ -0,0 +1,74 @@
+import json
+import os
+import random
+from datetime import datetime, timedelta, timezone
+
+from lib.db import Db
+
+KANA = 'あいうえおかきくけこさしすせそたちつてとなにぬねのはひふへほまみむめもやゆよらりるれろわをん'
+KANJI = '一二三人日月火水木金土山川田口目耳手足力学生先名年大小中上下左右出入本文字花草'
+SYLLABLES = ['a', 'i', 'u', 'e', 'o', 'ka', 'ki', 'ku', 'ke', 'ko', 'sa', 'shi', 'su', 'se', 'so',
+             'ta', 'chi', 'tsu', 'te', 'to', 'na', 'ni', 'nu', 'ne', 'no', 'ma', 'mi', 'mu', 'me', 'mo']
+ENGLISH = ['to go', 'to eat', 'to see', 'big', 'small', 'red', 'water', 'mountain', 'river', 'book',
+           'to pay', 'to read', 'quiet', 'busy', 'person', 'day', 'month', 'fire', 'tree', 'gold']
+
+def _word(rng, n):
+  length = rng.randint(1, 4)
+  parts = [{"kanji": rng.choice(KANJI + KANA), "romaji": [rng.choice(SYLLABLES)]} for _ in range(length)]
+  return (
+    ''.join(part['kanji'] for part in parts) + str(n),
+    ''.join(part['romaji'][0] for part in parts) + str(n),
+    rng.choice(ENGLISH) + f' ({n})',
+    json.dumps(parts)
+  )
+
+# Build a synthetic lang-portal database of the given size. Rows are bulk
+# loaded before the migrations run so index builds happen once at the end.
+def generate(database, words=20000, groups=50, activities=3, sessions=50000, reviews=1000000, days=365, seed=0):
+  if os.path.exists(database):
+    os.remove(database)
+  rng = random.Random(seed)
+  db = Db(database=database)
+  # UTC, like CURRENT_TIMESTAMP and the rest of the app
+  now = datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+  with db.transaction() as cursor:
+    db.setup_tables(cursor)
+
+    cursor.executemany('INSERT INTO study_activities (id, name, url, preview_url) VALUES (?, ?, ?, ?)', (
+      (i, f'Activity {i}', f'http://localhost:{8080 + i}', None) for i in range(1, activities + 1)
+    ))
+    cursor.executemany('INSERT INTO groups (id, name) VALUES (?, ?)', (
+      (i, f'Group {i}') for i in range(1, groups + 1)
+    ))
+    cursor.executemany('INSERT INTO words (id, kanji, romaji, english, parts) VALUES (?, ?, ?, ?, ?)', (
+      (i,) + _word(rng, i) for i in range(1, words + 1)
+    ))
+    cursor.executemany('INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)', (
+      (i, (i % groups) + 1) for i in range(1, words + 1)
+    ))
+    cursor.execute('''
+      UPDATE groups
+      SET words_count = (SELECT COUNT(*) FROM word_groups WHERE group_id = groups.id)
+    ''')
+
+    session_times = {}
+    def session_rows():
+      for i in range(1, sessions + 1):
+        created_at = now - timedelta(seconds=rng.randint(0, days * 86400))
+        session_times[i] = created_at
+        yield (i, rng.randint(1, groups), rng.randint(1, activities), created_at.strftime('%Y-%m-%d %H:%M:%S'))
+    cursor.executemany('INSERT INTO study_sessions (id, group_id, study_activity_id, created_at) VALUES (?, ?, ?, ?)', session_rows())
+
+    def review_rows():
+      for _ in range(reviews):
+        session_id = rng.randint(1, sessions)
+        created_at = session_times[session_id] + timedelta(seconds=rng.randint(0, 1800))
+        yield (rng.randint(1, words), session_id, rng.random() < 0.7, created_at.strftime('%Y-%m-%d %H:%M:%S'))
+    cursor.executemany('INSERT INTO word_review_items (word_id, study_session_id, correct, created_at) VALUES (?, ?, ?, ?)', review_rows())
+
+    db.run_migrations(cursor)
+    cursor.execute('ANALYZE')
+
+  db.dispose()
+  return database
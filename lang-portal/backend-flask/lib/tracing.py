@@ -0,0 +1,187 @@
+import functools
+import re
+import sqlite3
+import time
+from collections import deque
+
+from flask import g, has_app_context, request
+
+from lib.query_plans import explain
+
+# Per-request SQL tracing. Cursors handed out by Db are wrapped so every
+# statement a request issues is recorded with the shape of its bound
+# parameters (types only, never values), the rows it returned or changed and
+# its wall time, execute plus fetches.
+
+# Per-statement Server-Timing entries beyond this many are summed into `db`
+SERVER_TIMING_MAX_QUERIES = 20
+
+def param_shape(parameters):
+  if parameters is None:
+    return None
+  if isinstance(parameters, dict):
+    return {name: type(value).__name__ for name, value in parameters.items()}
+  return [type(value).__name__ for value in parameters]
+
+class TracedQuery:
+  def __init__(self, sql, parameters):
+    self.sql = sql
+    self.parameters = parameters  # Kept for EXPLAIN QUERY PLAN, not reported
+    self.params = param_shape(parameters)
+    self.batch = None  # Number of parameter sets for executemany
+    self.rows = 0
+    self.seconds = 0.0
+
+  @property
+  def ms(self):
+    return self.seconds * 1000
+
+  def to_dict(self):
+    query = {'sql': self.sql.strip(), 'params': self.params, 'rows': self.rows, 'ms': round(self.ms, 3)}
+    if self.batch is not None:
+      query['batch'] = self.batch
+    return query
+
+class TracingCursor:
+  def __init__(self, cursor, queries):
+    self._cursor = cursor
+    self._queries = queries
+    self._query = None
+
+  def _timed(self, method, *args):
+    started = time.perf_counter()
+    try:
+      return method(*args)
+    finally:
+      self._query.seconds += time.perf_counter() - started
+
+  def _changed(self):
+    # Statements without a result set report the rows they changed
+    if self._cursor.description is None and self._cursor.rowcount > 0:
+      self._query.rows += self._cursor.rowcount
+
+  def execute(self, sql, parameters=()):
+    self._query = TracedQuery(sql, parameters)
+    self._queries.append(self._query)
+    self._timed(self._cursor.execute, sql, parameters)
+    self._changed()
+    return self
+
+  def executemany(self, sql, seq_of_parameters):
+    query = self._query = TracedQuery(sql, None)
+    query.batch = 0
+    self._queries.append(query)
+
+    def counted():
+      for parameters in seq_of_parameters:
+        if query.batch == 0:
+          query.parameters, query.params = parameters, param_shape(parameters)
+        query.batch += 1
+        yield parameters
+
+    self._timed(self._cursor.executemany, sql, counted())
+    self._changed()
+    return self
+
+  def fetchone(self):
+    row = self._timed(self._cursor.fetchone) if self._query else self._cursor.fetchone()
+    if row is not None and self._query:
+      self._query.rows += 1
+    return row
+
+  def fetchmany(self, size=None):
+    size = size or self._cursor.arraysize
+    rows = self._timed(self._cursor.fetchmany, size) if self._query else self._cursor.fetchmany(size)
+    if self._query:
+      self._query.rows += len(rows)
+    return rows
+
+  def fetchall(self):
+    rows = self._timed(self._cursor.fetchall) if self._query else self._cursor.fetchall()
+    if self._query:
+      self._query.rows += len(rows)
+    return rows
+
+  def __iter__(self):
+    while True:
+      row = self.fetchone()
+      if row is None:
+        return
+      yield row
+
+  def __getattr__(self, name):
+    return getattr(self._cursor, name)
+
+@functools.lru_cache(maxsize=1024)
+def _timing_description(text):
+  text = re.sub(r'\s+', ' ', text).strip()
+  if len(text) > 60:
+    text = text[:57] + '...'
+  return '"' + text.replace('\\', '\\\\').replace('"', '\\"') + '"'
+
+# Records the queries of every request, adds them to the response as
+# Server-Timing entries, keeps the last `history` requests for /debug/queries
+# and logs statements slower than `slow_query_ms` with their query plan.
+class QueryTracer:
+  def __init__(self, app, slow_query_ms=100, history=100):
+    self.app = app
+    self.slow_query_ms = slow_query_ms
+    self.recent = deque(maxlen=history)
+    app.before_request(self._start)
+    app.after_request(self._finish)
+
+  def wrap(self, cursor):
+    if not has_app_context() or 'sql_queries' not in g:
+      return cursor
+    return TracingCursor(cursor, g.sql_queries)
+
+  def _start(self):
+    g.sql_queries = []
+
+  def _finish(self, response):
+    queries = g.pop('sql_queries', None)
+    if queries is None:
+      return response
+
+    total_ms = sum(query.ms for query in queries)
+    timings = [f'db;dur={total_ms:.3f};desc="{len(queries)} queries"']
+    # SQL text only where /debug/queries would show it too; any client can
+    # read these headers
+    describe = self.app.debug or self.app.config.get('DEBUG_QUERIES')
+    for i, query in enumerate(queries[:SERVER_TIMING_MAX_QUERIES], start=1):
+      timing = f'sql-{i};dur={query.ms:.3f}'
+      if describe:
+        timing += f';desc={_timing_description(query.sql)}'
+      timings.append(timing)
+    response.headers.add('Server-Timing', ', '.join(timings))
+
+    for query in queries:
+      if query.ms >= self.slow_query_ms:
+        self.log_slow_query(query)
+
+    if request.endpoint != 'get_debug_queries':
+      self.recent.append({
+        'method': request.method,
+        'path': request.full_path.rstrip('?'),
+        'status': response.status_code,
+        'query_count': len(queries),
+        'total_ms': round(total_ms, 3),
+        'queries': [query.to_dict() for query in queries],
+      })
+    return response
+
+  def query_plan(self, query):
+    if query.parameters is None and query.batch is not None:
+      return ['(no parameters)']
+    try:
+      # Explained on the request's reader; EXPLAIN is allowed under query_only
+      return explain(self.app.db.get(), query.sql, query.parameters or ()) or ['(no plan)']
+    except sqlite3.Error as e:
+      return [f'(plan unavailable: {e})']
+
+  def log_slow_query(self, query):
+    self.app.logger.warning(
+      'Slow query (%.1fms, %d rows) on %s %s\n%s\nparams: %s\nplan:\n  %s',
+      query.ms, query.rows, request.method, request.path,
+      query.sql.strip(), query.params, '\n  '.join(self.query_plan(query))
+    )
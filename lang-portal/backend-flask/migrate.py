@@ -1,31 +1,33 @@
-import sqlite3
+import argparse
 import os
 
-def run_migrations():
-    # Connect to the database
-    db_path = os.path.join(os.path.dirname(__file__), 'word_bank.db')
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    
+from lib.db import Db
+
+# Apply pending migrations to the app's database; same as `invoke migrate`
+# (see lib/migrations.py)
+def run_migrations(database='words.db', dry_run=False):
+    db = Db(database=database)
     try:
-        # Get list of migration files
-        migrations_dir = os.path.join(os.path.dirname(__file__), 'sql', 'migrations')
-        migration_files = sorted([f for f in os.listdir(migrations_dir) if f.endswith('.sql')])
-        
-        # Run each migration
-        for migration_file in migration_files:
-            print(f"Running migration: {migration_file}")
-            with open(os.path.join(migrations_dir, migration_file)) as f:
-                migration_sql = f.read()
-                conn.executescript(migration_sql)
-                conn.commit()
-        
-        print("Migrations completed successfully")
-    except Exception as e:
-        print(f"Error running migrations: {str(e)}")
-        conn.rollback()
+        if dry_run:
+            plan = db.migration_plan()
+            for migration in plan['pending']:
+                print(f"Pending migration: {migration.filename}")
+            for migration in plan['backfilling']:
+                print(f"Unfinished backfill: {migration.filename}")
+            if not plan['pending'] and not plan['backfilling']:
+                print("Database is up to date")
+        else:
+            db.migrate(log=print)
+            print("Migrations completed successfully")
     finally:
-        conn.close()
+        db.dispose()
 
 if __name__ == '__main__':
-    run_migrations()
+    parser = argparse.ArgumentParser(description='Apply pending schema migrations')
+    parser.add_argument('--database', default='words.db', help='SQLite database (default: words.db)')
+    parser.add_argument('--dry-run', action='store_true', help='list pending migrations without applying them')
+    args = parser.parse_args()
+    database = os.path.abspath(args.database)
+    # Migration and rebuild scripts are read relative to the backend directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    run_migrations(database, dry_run=args.dry_run)
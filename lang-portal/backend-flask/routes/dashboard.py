@@ -1,10 +1,32 @@
-from flask import jsonify
+from flask import jsonify, request
 from flask_cors import cross_origin
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta, timezone
+
+# Periods returned by /dashboard/timeseries when `from` is omitted, and the
+# most it returns at once
+DEFAULT_TIMESERIES_PERIODS = {'day': 30, 'week': 12}
+MAX_TIMESERIES_PERIODS = 366
+
+# First day of the period containing `day` (weeks start on Monday, as in
+# sql/migrations/0008_create_study_rollups.sql)
+def period_start(day, granularity):
+    return day - timedelta(days=day.weekday()) if granularity == 'week' else day
+
+def parse_day(value, name):
+    if value is None:
+        return None
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        raise ValueError(f"{name} must be a date (YYYY-MM-DD)")
 
 def load(app):
+    # Dashboards read from the read replica when one is configured (see
+    # lib/db.py), so they never compete with review writes on the primary.
+    # Outside the response cache, so its generations come from the replica too.
     @app.route('/dashboard/recent-session', methods=['GET'])
     @cross_origin()
+    @app.db.replica_reads
     def get_recent_session():
         try:
             cursor = app.db.cursor()
@@ -16,12 +38,16 @@ def load(app):
                     ss.group_id,
                     sa.name as activity_name,
                     ss.created_at,
-                    COUNT(CASE WHEN wri.correct = 1 THEN 1 END) as correct_count,
-                    COUNT(CASE WHEN wri.correct = 0 THEN 1 END) as wrong_count
+                    (
+                        SELECT COUNT(*) FROM word_review_items wri
+                        WHERE wri.study_session_id = ss.id AND wri.correct = 1
+                    ) as correct_count,
+                    (
+                        SELECT COUNT(*) FROM word_review_items wri
+                        WHERE wri.study_session_id = ss.id AND wri.correct = 0
+                    ) as wrong_count
                 FROM study_sessions ss
                 JOIN study_activities sa ON ss.study_activity_id = sa.id
-                LEFT JOIN word_review_items wri ON ss.id = wri.study_session_id
-                GROUP BY ss.id
                 ORDER BY ss.created_at DESC
                 LIMIT 1
             ''')
@@ -45,85 +71,43 @@ def load(app):
 
     @app.route('/dashboard/stats', methods=['GET'])
     @cross_origin()
+    @app.db.replica_reads
     def get_study_stats():
         try:
             cursor = app.db.cursor()
-            
-            # Get total vocabulary count
-            cursor.execute('SELECT COUNT(*) as total_vocabulary FROM words')
-            total_vocabulary = cursor.fetchone()["total_vocabulary"]
 
-            # Get total unique words studied
+            # Everything comes from the trigger-maintained snapshot (see
+            # sql/migrations/0004_create_dashboard_stats.sql). Only the parts
+            # relative to today are resolved here: the streak lapses once a
+            # full day passes without study, and active groups come from the
+            # last 30 daily buckets.
             cursor.execute('''
-                SELECT COUNT(DISTINCT word_id) as total_words
-                FROM word_review_items wri
-                JOIN study_sessions ss ON wri.study_session_id = ss.id
+                SELECT
+                    total_vocabulary,
+                    total_words_studied,
+                    mastered_words,
+                    correct_count * 1.0 / NULLIF(correct_count + wrong_count, 0) as success_rate,
+                    total_sessions,
+                    (
+                        SELECT COUNT(DISTINCT group_id)
+                        FROM dashboard_daily_sessions
+                        WHERE study_date >= date('now', '-30 days')
+                    ) as active_groups,
+                    CASE
+                        WHEN last_study_date >= date('now', '-1 day') THEN current_streak
+                        ELSE 0
+                    END as current_streak
+                FROM dashboard_stats
+                WHERE id = 1
             ''')
-            total_words = cursor.fetchone()["total_words"]
-            
-            # Get mastered words (words with >80% success rate and at least 5 attempts)
-            cursor.execute('''
-                WITH word_stats AS (
-                    SELECT 
-                        word_id,
-                        COUNT(*) as total_attempts,
-                        SUM(CASE WHEN correct = 1 THEN 1 ELSE 0 END) * 1.0 / COUNT(*) as success_rate
-                    FROM word_review_items wri
-                    JOIN study_sessions ss ON wri.study_session_id = ss.id
-                    GROUP BY word_id
-                    HAVING total_attempts >= 5
-                )
-                SELECT COUNT(*) as mastered_words
-                FROM word_stats
-                WHERE success_rate >= 0.8
-            ''')
-            mastered_words = cursor.fetchone()["mastered_words"]
-            
-            # Get overall success rate
-            cursor.execute('''
-                SELECT 
-                    SUM(CASE WHEN correct = 1 THEN 1 ELSE 0 END) * 1.0 / COUNT(*) as success_rate
-                FROM word_review_items wri
-                JOIN study_sessions ss ON wri.study_session_id = ss.id
-            ''')
-            success_rate = cursor.fetchone()["success_rate"] or 0
-            
-            # Get total number of study sessions
-            cursor.execute('SELECT COUNT(*) as total_sessions FROM study_sessions')
-            total_sessions = cursor.fetchone()["total_sessions"]
-            
-            # Get number of groups with activity in the last 30 days
-            cursor.execute('''
-                SELECT COUNT(DISTINCT group_id) as active_groups
-                FROM study_sessions
-                WHERE created_at >= date('now', '-30 days')
-            ''')
-            active_groups = cursor.fetchone()["active_groups"]
-            
-            # Calculate current streak (consecutive days with at least one study session)
-            cursor.execute('''
-                WITH daily_sessions AS (
-                    SELECT 
-                        date(created_at) as study_date,
-                        COUNT(*) as session_count
-                    FROM study_sessions
-                    GROUP BY date(created_at)
-                ),
-                streak_calc AS (
-                    SELECT 
-                        study_date,
-                        julianday(study_date) - julianday(lag(study_date, 1) over (order by study_date)) as days_diff
-                    FROM daily_sessions
-                )
-                SELECT COUNT(*) as streak
-                FROM (
-                    SELECT study_date
-                    FROM streak_calc
-                    WHERE days_diff = 1 OR days_diff IS NULL
-                    ORDER BY study_date DESC
-                )
-            ''')
-            current_streak = cursor.fetchone()["streak"]
+            stats = cursor.fetchone()
+            total_vocabulary = stats["total_vocabulary"]
+            total_words = stats["total_words_studied"]
+            mastered_words = stats["mastered_words"]
+            success_rate = stats["success_rate"] or 0
+            total_sessions = stats["total_sessions"]
+            active_groups = stats["active_groups"]
+            current_streak = stats["current_streak"]
             
             return jsonify({
                 "total_vocabulary": total_vocabulary,
@@ -137,3 +121,69 @@ def load(app):
             
         except Exception as e:
             return jsonify({"error": str(e)}), 500
+
+    @app.route('/dashboard/timeseries', methods=['GET'])
+    @cross_origin()
+    @app.db.replica_reads
+    @app.cache.cached('history')
+    def get_study_timeseries():
+        try:
+            granularity = request.args.get('granularity', 'day')
+            if granularity not in DEFAULT_TIMESERIES_PERIODS:
+                return jsonify({"error": "granularity must be 'day' or 'week'"}), 400
+            step = timedelta(days=7 if granularity == 'week' else 1)
+
+            try:
+                to_day = parse_day(request.args.get('to'), 'to') or datetime.now(timezone.utc).date()
+                from_day = parse_day(request.args.get('from'), 'from') or to_day - step * (DEFAULT_TIMESERIES_PERIODS[granularity] - 1)
+            except ValueError as e:
+                return jsonify({"error": str(e)}), 400
+            first, last = period_start(from_day, granularity), period_start(to_day, granularity)
+            if first > last:
+                return jsonify({"error": "from must not be after to"}), 400
+            if (last - first) // step + 1 > MAX_TIMESERIES_PERIODS:
+                return jsonify({"error": f"at most {MAX_TIMESERIES_PERIODS} periods per request"}), 400
+
+            group_id = request.args.get('group_id', type=int)
+            study_activity_id = request.args.get('study_activity_id', type=int)
+
+            # One rollup row per period: the one for this group and activity,
+            # where 0 stands for all of them, so distinct words are counted
+            # once across groups and activities
+            cursor = app.db.cursor()
+            cursor.execute('''
+                SELECT period_start, sessions, reviews, correct, wrong, words
+                FROM study_rollups
+                WHERE granularity = ? AND period_start BETWEEN ? AND ?
+                    AND group_id = ? AND study_activity_id = ?
+            ''', (granularity, first.isoformat(), last.isoformat(), group_id or 0, study_activity_id or 0))
+            rows = {row["period_start"]: row for row in cursor.fetchall()}
+
+            # Periods without any activity are filled with zeros
+            series = []
+            day = first
+            while day <= last:
+                row = rows.get(day.isoformat())
+                reviews = row["reviews"] if row else 0
+                series.append({
+                    "date": day.isoformat(),
+                    "sessions": row["sessions"] if row else 0,
+                    "reviews": reviews,
+                    "correct": row["correct"] if row else 0,
+                    "wrong": row["wrong"] if row else 0,
+                    "words": row["words"] if row else 0,
+                    "success_rate": row["correct"] / reviews if reviews else None
+                })
+                day += step
+
+            return jsonify({
+                "granularity": granularity,
+                "from": first.isoformat(),
+                "to": last.isoformat(),
+                "group_id": group_id,
+                "study_activity_id": study_activity_id,
+                "series": series
+            })
+
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
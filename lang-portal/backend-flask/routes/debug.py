@@ -0,0 +1,32 @@
+from flask import request, jsonify
+from flask_cors import cross_origin
+
+def load(app):
+    # Queries issued by the most recent requests, newest first. Only served in
+    # debug mode or with DEBUG_QUERIES set, since it exposes SQL text.
+    @app.route('/debug/queries', methods=['GET'])
+    @cross_origin()
+    def get_debug_queries():
+        try:
+            if not (app.debug or app.config.get('DEBUG_QUERIES')):
+                return jsonify({"error": "Not found"}), 404
+            tracer = app.db.tracer
+            if tracer is None:
+                return jsonify({"error": "SQL tracing is disabled"}), 404
+
+            limit = request.args.get('limit', 20, type=int)
+            slow_only = request.args.get('slow', 'false').lower() == 'true'
+
+            requests = list(reversed(tracer.recent))
+            if slow_only:
+                requests = [
+                    entry for entry in requests
+                    if any(query['ms'] >= tracer.slow_query_ms for query in entry['queries'])
+                ]
+
+            return jsonify({
+                'slow_query_ms': tracer.slow_query_ms,
+                'requests': requests[:limit]
+            })
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
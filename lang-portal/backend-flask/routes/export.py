@@ -0,0 +1,98 @@
+from flask import Response, request, jsonify
+from flask_cors import cross_origin
+from lib.export import CONTENT_TYPES, chunks, csv_lines, ndjson_lines, parse_since, stream_rows
+
+# Exportable tables. Rows come in id order and an export resumes with
+# after_id. `since` filters on the timestamp column where there is one; rows
+# then come in (timestamp, id) order, the order of the timestamp's index, so
+# they stream straight off it without a sort, and since plus after_id (the
+# last row's timestamp and id) resume after that row.
+EXPORTS = {
+  'review_items': {
+    'sql': 'SELECT id, word_id, study_session_id, correct, created_at FROM word_review_items',
+    'columns': ['id', 'word_id', 'study_session_id', 'correct', 'created_at'],
+    'id_column': 'id',
+    'since_column': 'created_at',
+    'bool_columns': ['correct'],
+  },
+  'words': {
+    'sql': 'SELECT id, kanji, romaji, english, parts FROM words',
+    'columns': ['id', 'kanji', 'romaji', 'english', 'parts'],
+    'id_column': 'id',
+    'since_column': None,
+    'json_columns': ['parts'],
+  },
+  'sessions': {
+    'sql': '''
+      SELECT ss.id, ss.group_id, ss.study_activity_id, ss.created_at, COALESCE(rc.count, 0)
+      FROM study_sessions ss
+      LEFT JOIN row_counts rc ON rc.scope = 'session_review_items' AND rc.scope_id = ss.id
+    ''',
+    'columns': ['id', 'group_id', 'study_activity_id', 'created_at', 'review_items_count'],
+    'id_column': 'ss.id',
+    'since_column': 'ss.created_at',
+  },
+}
+
+def load(app):
+  # Endpoint: GET /export/review_items|words|sessions?format=ndjson|csv&since=&after_id=
+  # Streams the whole table; gzip compressed when the client accepts it
+  @app.route('/export/<any(review_items, words, sessions):name>', methods=['GET'])
+  @cross_origin()
+  def export_table(name):
+    try:
+      export = EXPORTS[name]
+      format = request.args.get('format', 'ndjson')
+      if format not in CONTENT_TYPES:
+        return jsonify({"error": f"format must be one of {', '.join(CONTENT_TYPES)}"}), 400
+
+      conditions = []
+      params = []
+      id_column = export['id_column']
+      order_by = id_column
+      after_id = request.args.get('after_id', type=int)
+      since = request.args.get('since')
+      if since:
+        since_column = export['since_column']
+        if since_column is None:
+          return jsonify({"error": f"{name} has no timestamp, use after_id"}), 400
+        try:
+          since = parse_since(since)
+        except ValueError as e:
+          return jsonify({"error": str(e)}), 400
+        conditions.append(f"{since_column} >= ?")
+        params.append(since)
+        # Resume after the row (since, after_id): a range of the index plus
+        # the rows of that one timestamp already sent, skipped by the filter
+        if after_id is not None:
+          conditions.append(f"({since_column} > ? OR {id_column} > ?)")
+          params.extend([since, after_id])
+        order_by = f"{since_column}, {id_column}"
+      elif after_id is not None:
+        conditions.append(f"{id_column} > ?")
+        params.append(after_id)
+
+      sql = export['sql']
+      if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+      sql += f" ORDER BY {order_by}"
+
+      rows = stream_rows(app.db.pool(), sql, params)
+      if format == 'csv':
+        lines = csv_lines(export['columns'], rows)
+      else:
+        lines = ndjson_lines(
+          export['columns'], rows,
+          json_columns=export.get('json_columns', ()),
+          bool_columns=export.get('bool_columns', ())
+        )
+
+      gzip = request.accept_encodings['gzip'] > 0
+      response = Response(chunks(lines, gzip=gzip), content_type=CONTENT_TYPES[format])
+      response.headers['Content-Disposition'] = f'attachment; filename={name}.{format}'
+      response.headers['Vary'] = 'Accept-Encoding'
+      if gzip:
+        response.headers['Content-Encoding'] = 'gzip'
+      return response
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
@@ -1,10 +1,42 @@
 from flask import request, jsonify, g
 from flask_cors import cross_origin
 import json
+from datetime import datetime, timedelta
+from lib.pagination import InvalidCursor, decode_cursor, keyset_clause, next_page
+from lib.counts import get_count, include_total, total_pages
+from lib import snapshots
+from lib.rows import RowMapper, is_none
+from routes.words import WORD_FIELDS, WORD_LIST_SORTS
+
+# Sessions without any reviews are shown as lasting this long
+DEFAULT_SESSION_LENGTH = timedelta(minutes=30)
+
+# End time for a session with no reviews: its start plus the default length,
+# formatted like SQLite's datetime()
+def default_end_time(start_time):
+  try:
+    started = datetime.fromisoformat(start_time)
+  except (TypeError, ValueError):
+    return start_time
+  return (started + DEFAULT_SESSION_LENGTH).strftime('%Y-%m-%d %H:%M:%S')
+
+# Batch sizes for GET /api/groups/<id>/due
+DEFAULT_DUE_LIMIT = 20
+MAX_DUE_LIMIT = 100
+
+DUE_WORD_COLUMNS = '''
+  w.id, w.kanji, w.romaji, w.english,
+  gd.due_at, ws.interval_days, ws.ease, ws.repetitions
+'''
+DUE_WORD_FIELDS = RowMapper(
+  'id', 'kanji', 'romaji', 'english', 'due_at', 'interval_days', 'ease', 'repetitions',
+  ('new', 'due_at', is_none)
+)
 
 def load(app):
   @app.route('/groups', methods=['GET'])
   @cross_origin()
+  @app.cache.cached('vocabulary')
   def get_groups():
     try:
       cursor = app.db.cursor()
@@ -35,10 +67,8 @@ def load(app):
 
       groups = cursor.fetchall()
 
-      # Query the total number of groups
-      cursor.execute('SELECT COUNT(*) FROM groups')
-      total_groups = cursor.fetchone()[0]
-      total_pages = (total_groups + groups_per_page - 1) // groups_per_page
+      # Total number of groups, from the maintained counter
+      total_groups = get_count(cursor, 'groups') if include_total(request.args) else None
 
       # Format the response
       groups_data = []
@@ -52,7 +82,7 @@ def load(app):
       # Return groups and pagination metadata
       return jsonify({
         'groups': groups_data,
-        'total_pages': total_pages,
+        'total_pages': total_pages(total_groups, groups_per_page),
         'current_page': page
       })
     except Exception as e:
@@ -60,6 +90,7 @@ def load(app):
 
   @app.route('/groups/<int:id>', methods=['GET'])
   @cross_origin()
+  @app.cache.cached('vocabulary')
   def get_group(id):
     try:
       cursor = app.db.cursor()
@@ -99,84 +130,84 @@ def load(app):
       order = request.args.get('order', 'asc')
 
       # Validate sort parameters
-      valid_columns = ['kanji', 'romaji', 'english', 'correct_count', 'wrong_count']
-      if sort_by not in valid_columns:
+      if sort_by not in WORD_LIST_SORTS:
         sort_by = 'kanji'
       if order not in ['asc', 'desc']:
         order = 'asc'
+      sort_column = WORD_LIST_SORTS[sort_by][0]
+
+      # An opaque cursor (keyset pagination) takes precedence over page/offset.
+      # Unlike /words, no index is ordered by group and sort column: every
+      # page reads the group's members off (group_id, word_id) and sorts them,
+      # so it costs the same at any depth but grows with the group's size.
+      cursor_token = request.args.get('cursor')
+      keyset_filter = ''
+      params = []
+      if cursor_token:
+        keyset_filter = 'AND ' + keyset_clause(sort_column, 'w.id', order)
+        params.extend(decode_cursor(cursor_token, sort_by, order))
+        offset = 0
 
       # First, check if the group exists
-      cursor.execute('SELECT name FROM groups WHERE id = ?', (id,))
+      cursor.execute('SELECT name, words_count FROM groups WHERE id = ?', (id,))
       group = cursor.fetchone()
       if not group:
         return jsonify({"error": "Group not found"}), 404
 
       # Query to fetch words with pagination and sorting
       cursor.execute(f'''
-        SELECT w.*, 
-               COALESCE(wr.correct_count, 0) as correct_count,
-               COALESCE(wr.wrong_count, 0) as wrong_count
+        SELECT w.*, c.correct_count, c.wrong_count
         FROM words w
         JOIN word_groups wg ON w.id = wg.word_id
-        LEFT JOIN word_reviews wr ON w.id = wr.word_id
-        WHERE wg.group_id = ?
-        ORDER BY {sort_by} {order}
+        JOIN word_counts c ON c.word_id = w.id
+        WHERE wg.group_id = ? {keyset_filter}
+        ORDER BY {sort_column} {order}, w.id {order}
         LIMIT ? OFFSET ?
-      ''', (id, words_per_page, offset))
+      ''', (id, *params, words_per_page + 1, offset))
       
-      words = cursor.fetchall()
-
-      # Get total words count for pagination
-      cursor.execute('''
-        SELECT COUNT(*) 
-        FROM word_groups 
-        WHERE group_id = ?
-      ''', (id,))
-      total_words = cursor.fetchone()[0]
-      total_pages = (total_words + words_per_page - 1) // words_per_page
+      words, next_cursor = next_page(
+        WORD_FIELDS.all(cursor), words_per_page, sort_by, order,
+        key=lambda word: (word[sort_by], word["id"])
+      )
 
-      # Format the response
-      words_data = []
-      for word in words:
-        words_data.append({
-          "id": word["id"],
-          "kanji": word["kanji"],
-          "romaji": word["romaji"],
-          "english": word["english"],
-          "correct_count": word["correct_count"],
-          "wrong_count": word["wrong_count"]
-        })
+      # Total words in the group, from the words_count counter cache
+      total_words = group["words_count"] if include_total(request.args) else None
 
-      return jsonify({
-        'words': words_data,
-        'total_pages': total_pages,
-        'current_page': page
-      })
+      response = {
+        'words': words,
+        'total_pages': total_pages(total_words, words_per_page),
+        'next_cursor': next_cursor
+      }
+      if not cursor_token:
+        response['current_page'] = page
+      return jsonify(response)
+    except InvalidCursor as e:
+      return jsonify({"error": str(e)}), 400
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
-  @app.route('/api/groups/<id>/words/raw', methods=['GET'])
+  @app.route('/api/groups/<int:id>/words/raw', methods=['GET'])
   @cross_origin()
   def get_group_words_raw(id):
     try:
         cursor = app.db.cursor()
 
         # Check if the group exists
-        cursor.execute('SELECT id FROM groups WHERE id = ?', (id,))
+        cursor.execute('SELECT id, name FROM groups WHERE id = ?', (id,))
         group = cursor.fetchone()
         if not group:
             return jsonify({"error": "Group not found"}), 404
 
         # Fetch all words for the group
         cursor.execute('''
-            SELECT 
+            SELECT DISTINCT
                 w.id,
                 w.kanji,
                 w.romaji,
                 w.english
             FROM words w
-            JOIN group_words gw ON gw.word_id = w.id
-            WHERE gw.group_id = ?
+            JOIN word_groups wg ON wg.word_id = w.id
+            WHERE wg.group_id = ?
             ORDER BY w.kanji
         ''', (id,))
         words = cursor.fetchall()
@@ -184,6 +215,7 @@ def load(app):
         # Return the raw list of words
         return jsonify({
             "group_id": id,
+            "group_name": group["name"],
             "words": [{
                 "id": word["id"],
                 "kanji": word["kanji"],
@@ -194,6 +226,67 @@ def load(app):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+  # The whole group as one precomputed, content-hashed document (see
+  # lib/snapshots.py); study activities fetch this at startup
+  @app.route('/api/groups/<int:id>/snapshot', methods=['GET'])
+  @cross_origin()
+  def get_group_snapshot(id):
+    try:
+      snapshot = snapshots.get(app.db.cursor(), id)
+      if snapshot is None:
+        # Never built, or the group's words changed since
+        with app.db.transaction() as cursor:
+          snapshot = snapshots.build(cursor, id)
+        if snapshot is None:
+          return jsonify({"error": "Group not found"}), 404
+      return snapshots.serve(snapshot)
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  @app.route('/api/groups/<int:id>/due', methods=['GET'])
+  @cross_origin()
+  def get_group_due_words(id):
+    try:
+      cursor = app.db.cursor()
+      limit = max(1, min(request.args.get('limit', DEFAULT_DUE_LIMIT, type=int), MAX_DUE_LIMIT))
+
+      cursor.execute("SELECT id, datetime('now') AS now FROM groups WHERE id = ?", (id,))
+      group = cursor.fetchone()
+      if not group:
+        return jsonify({"error": "Group not found"}), 404
+
+      # Most overdue first, then words never reviewed, both straight off the
+      # (group_id, due_at) index of the due queue
+      cursor.execute(f'''
+        SELECT {DUE_WORD_COLUMNS}
+        FROM group_due_words gd
+        JOIN words w ON w.id = gd.word_id
+        JOIN word_schedule ws ON ws.word_id = gd.word_id
+        WHERE gd.group_id = ? AND gd.due_at <= ?
+        ORDER BY gd.due_at, gd.word_id
+        LIMIT ?
+      ''', (id, group['now'], limit))
+      words = DUE_WORD_FIELDS.all(cursor)
+      if len(words) < limit:
+        cursor.execute(f'''
+          SELECT {DUE_WORD_COLUMNS}
+          FROM group_due_words gd
+          JOIN words w ON w.id = gd.word_id
+          LEFT JOIN word_schedule ws ON ws.word_id = gd.word_id
+          WHERE gd.group_id = ? AND gd.due_at IS NULL
+          ORDER BY gd.word_id
+          LIMIT ?
+        ''', (id, limit - len(words)))
+        words += DUE_WORD_FIELDS.all(cursor)
+
+      return jsonify({
+        "group_id": id,
+        "now": group['now'],
+        "words": words
+      })
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
   @app.route('/groups/<int:id>/study_sessions', methods=['GET'])
   @cross_origin()
   def get_group_study_sessions(id):
@@ -208,10 +301,12 @@ def load(app):
       # Get sorting parameters
       sort_by = request.args.get('sort_by', 'created_at')
       order = request.args.get('order', 'desc')  # Default to newest first
+      if order not in ['asc', 'desc']:
+        order = 'desc'
 
       # Map frontend sort keys to database columns
       sort_mapping = {
-        'startTime': 'created_at',
+        'startTime': 's.created_at',
         'endTime': 'last_activity_time',
         'activityName': 'a.name',
         'groupName': 'g.name',
@@ -219,53 +314,36 @@ def load(app):
       }
 
       # Use mapped sort column or default to created_at
-      sort_column = sort_mapping.get(sort_by, 'created_at')
+      sort_column = sort_mapping.get(sort_by, 's.created_at')
 
-      # Get total count for pagination
-      cursor.execute('''
-        SELECT COUNT(*)
-        FROM study_sessions
-        WHERE group_id = ?
-      ''', (id,))
-      total_sessions = cursor.fetchone()[0]
-      total_pages = (total_sessions + sessions_per_page - 1) // sessions_per_page
+      # Total sessions for this group, from the maintained counter
+      total_sessions = get_count(cursor, 'group_sessions', id) if include_total(request.args) else None
 
-      # Get study sessions for this group with dynamic calculations
+      # One set-based query. The review count and the last review time are
+      # joined from the per-session rows the triggers maintain (row_counts and
+      # session_activity), so no session's reviews are read at all.
       cursor.execute(f'''
         SELECT 
           s.id,
           s.group_id,
           s.study_activity_id,
           s.created_at as start_time,
-          (
-            SELECT MAX(created_at)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as last_activity_time,
+          act.last_activity_at as last_activity_time,
           a.name as activity_name,
           g.name as group_name,
-          (
-            SELECT COUNT(*)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as review_count
+          COALESCE(rc.count, 0) as review_count
         FROM study_sessions s
         JOIN study_activities a ON s.study_activity_id = a.id
         JOIN groups g ON s.group_id = g.id
+        LEFT JOIN row_counts rc ON rc.scope = 'session_review_items' AND rc.scope_id = s.id
+        LEFT JOIN session_activity act ON act.study_session_id = s.id
         WHERE s.group_id = ?
-        ORDER BY {sort_column} {order}
+        ORDER BY {sort_column} {order}, s.id {order}
         LIMIT ? OFFSET ?
       ''', (id, sessions_per_page, offset))
       
-      sessions = cursor.fetchall()
       sessions_data = []
-      
-      for session in sessions:
-        # If there's no last_activity_time, use start_time + 30 minutes
-        end_time = session["last_activity_time"]
-        if not end_time:
-            end_time = cursor.execute('SELECT datetime(?, "+30 minutes")', (session["start_time"],)).fetchone()[0]
-        
+      for session in cursor.fetchall():
         sessions_data.append({
           "id": session["id"],
           "group_id": session["group_id"],
@@ -273,13 +351,13 @@ def load(app):
           "study_activity_id": session["study_activity_id"],
           "activity_name": session["activity_name"],
           "start_time": session["start_time"],
-          "end_time": end_time,
+          "end_time": session["last_activity_time"] or default_end_time(session["start_time"]),
           "review_items_count": session["review_count"]
         })
 
       return jsonify({
         'study_sessions': sessions_data,
-        'total_pages': total_pages,
+        'total_pages': total_pages(total_sessions, sessions_per_page),
         'current_page': page
       })
     except Exception as e:
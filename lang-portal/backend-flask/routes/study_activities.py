@@ -1,10 +1,12 @@
 from flask import jsonify, request
 from flask_cors import cross_origin
-import math
+from lib.counts import get_count, include_total, total_pages
+from lib.pagination import MAX_PER_PAGE
 
 def load(app):
     @app.route('/api/study-activities', methods=['GET'])
     @cross_origin()
+    @app.cache.cached('activities')
     def get_study_activities():
         cursor = app.db.cursor()
         cursor.execute('SELECT id, name, url, preview_url FROM study_activities')
@@ -19,6 +21,7 @@ def load(app):
 
     @app.route('/api/study-activities/<int:id>', methods=['GET'])
     @cross_origin()
+    @app.cache.cached('activities')
     def get_study_activity(id):
         cursor = app.db.cursor()
         cursor.execute('SELECT id, name, url, preview_url FROM study_activities WHERE id = ?', (id,))
@@ -45,18 +48,12 @@ def load(app):
             return jsonify({'error': 'Activity not found'}), 404
 
         # Get pagination parameters
-        page = request.args.get('page', 1, type=int)
-        per_page = request.args.get('per_page', 10, type=int)
+        page = max(1, request.args.get('page', 1, type=int))
+        per_page = max(1, min(request.args.get('per_page', 10, type=int), MAX_PER_PAGE))
         offset = (page - 1) * per_page
 
-        # Get total count
-        cursor.execute('''
-            SELECT COUNT(*) as count 
-            FROM study_sessions ss
-            JOIN groups g ON g.id = ss.group_id
-            WHERE ss.study_activity_id = ?
-        ''', (id,))
-        total_count = cursor.fetchone()['count']
+        # Total sessions for this activity, from the maintained counter
+        total_count = get_count(cursor, 'activity_sessions', id) if include_total(request.args) else None
 
         # Get paginated sessions
         cursor.execute('''
@@ -67,13 +64,12 @@ def load(app):
                 sa.name as activity_name,
                 ss.created_at,
                 ss.study_activity_id as activity_id,
-                COUNT(wri.id) as review_items_count
+                COALESCE(rc.count, 0) as review_items_count
             FROM study_sessions ss
             JOIN groups g ON g.id = ss.group_id
             JOIN study_activities sa ON sa.id = ss.study_activity_id
-            LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
+            LEFT JOIN row_counts rc ON rc.scope = 'session_review_items' AND rc.scope_id = ss.id
             WHERE ss.study_activity_id = ?
-            GROUP BY ss.id, ss.group_id, g.name, sa.name, ss.created_at, ss.study_activity_id
             ORDER BY ss.created_at DESC
             LIMIT ? OFFSET ?
         ''', (id, per_page, offset))
@@ -93,7 +89,7 @@ def load(app):
             'total': total_count,
             'page': page,
             'per_page': per_page,
-            'total_pages': math.ceil(total_count / per_page)
+            'total_pages': total_pages(total_count, per_page)
         })
 
     @app.route('/api/study-activities/<int:id>/launch', methods=['GET'])
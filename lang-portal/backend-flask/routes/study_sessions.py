@@ -1,7 +1,48 @@
-from flask import request, jsonify, g
+from flask import request, jsonify, g, url_for
 from flask_cors import cross_origin
-from datetime import datetime
+from datetime import datetime, timezone
+import json
 import math
+import os
+from lib.pagination import MAX_PER_PAGE, InvalidCursor, decode_cursor, keyset_clause, next_page
+from lib.counts import get_count, include_total, total_pages
+from lib.cache import bump_generation
+from lib import backups
+from lib.rows import RowMapper
+
+# Upper bound on items accepted by one batched review submission
+MAX_REVIEWS_PER_BATCH = 1000
+# The end time is the start time for now, since we don't track end times
+SESSION_FIELDS = RowMapper(
+  'id', 'group_id', 'group_name', 'activity_id', 'activity_name',
+  ('start_time', 'created_at'), ('end_time', 'created_at'), 'review_items_count'
+)
+SESSION_WORD_FIELDS = RowMapper(
+  'id', 'kanji', 'romaji', 'english',
+  ('correct_count', 'session_correct_count'), ('wrong_count', 'session_wrong_count')
+)
+
+# Validate one item of a batched review submission and return its row values,
+# or raise ValueError. reviewed_at is optional ISO 8601, stored as UTC.
+def parse_review_item(item):
+  if not isinstance(item, dict):
+    raise ValueError("each review must be an object")
+  word_id = item.get('word_id')
+  correct = item.get('correct')
+  if not isinstance(word_id, int) or isinstance(word_id, bool):
+    raise ValueError("word_id must be an integer")
+  if correct not in (True, False, 0, 1):
+    raise ValueError("correct must be a boolean")
+  reviewed_at = item.get('reviewed_at')
+  if reviewed_at is not None:
+    try:
+      reviewed_at = datetime.fromisoformat(str(reviewed_at).replace('Z', '+00:00'))
+    except ValueError:
+      raise ValueError(f"invalid reviewed_at: {item.get('reviewed_at')}")
+    if reviewed_at.tzinfo is not None:
+      reviewed_at = reviewed_at.astimezone(timezone.utc).replace(tzinfo=None)
+    reviewed_at = reviewed_at.strftime('%Y-%m-%d %H:%M:%S')
+  return word_id, bool(correct), reviewed_at
 
 def load(app):
   # todo /study_sessions POST
@@ -13,21 +54,24 @@ def load(app):
       cursor = app.db.cursor()
       
       # Get pagination parameters
-      page = request.args.get('page', 1, type=int)
-      per_page = request.args.get('per_page', 10, type=int)
+      page = max(1, request.args.get('page', 1, type=int))
+      per_page = max(1, min(request.args.get('per_page', 10, type=int), MAX_PER_PAGE))
       offset = (page - 1) * per_page
 
-      # Get total count
-      cursor.execute('''
-        SELECT COUNT(*) as count 
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
-      ''')
-      total_count = cursor.fetchone()['count']
+      # Total sessions, from the maintained counter
+      total_count = get_count(cursor, 'study_sessions') if include_total(request.args) else None
 
-      # Get paginated sessions
-      cursor.execute('''
+      # An opaque cursor (keyset pagination on created_at, id) takes precedence over page/offset
+      cursor_token = request.args.get('cursor')
+      where_clause = ''
+      params = []
+      if cursor_token:
+        where_clause = 'WHERE ' + keyset_clause('ss.created_at', 'ss.id', 'desc')
+        params.extend(decode_cursor(cursor_token, 'created_at', 'desc'))
+        offset = 0
+
+      # Get paginated sessions (one extra row tells us if there is a next page)
+      cursor.execute(f'''
         SELECT 
           ss.id,
           ss.group_id,
@@ -35,33 +79,33 @@ def load(app):
           sa.id as activity_id,
           sa.name as activity_name,
           ss.created_at,
-          COUNT(wri.id) as review_items_count
+          COALESCE(rc.count, 0) as review_items_count
         FROM study_sessions ss
         JOIN groups g ON g.id = ss.group_id
         JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-        GROUP BY ss.id
-        ORDER BY ss.created_at DESC
+        LEFT JOIN row_counts rc ON rc.scope = 'session_review_items' AND rc.scope_id = ss.id
+        {where_clause}
+        ORDER BY ss.created_at DESC, ss.id DESC
         LIMIT ? OFFSET ?
-      ''', (per_page, offset))
-      sessions = cursor.fetchall()
+      ''', (*params, per_page + 1, offset))
+      sessions, next_cursor = next_page(
+        SESSION_FIELDS.all(cursor), per_page, 'created_at', 'desc',
+        key=lambda session: (session['start_time'], session['id'])
+      )
 
-      return jsonify({
-        'items': [{
-          'id': session['id'],
-          'group_id': session['group_id'],
-          'group_name': session['group_name'],
-          'activity_id': session['activity_id'],
-          'activity_name': session['activity_name'],
-          'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time since we don't track end time
-          'review_items_count': session['review_items_count']
-        } for session in sessions],
+      response = {
+        'items': sessions,
         'total': total_count,
-        'page': page,
         'per_page': per_page,
-        'total_pages': math.ceil(total_count / per_page)
-      })
+        'total_pages': total_pages(total_count, per_page),
+        'next_cursor': next_cursor
+      }
+      # A cursor page has no page number, as in /words
+      if not cursor_token:
+        response['page'] = page
+      return jsonify(response)
+    except InvalidCursor as e:
+      return jsonify({"error": str(e)}), 400
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
@@ -89,13 +133,13 @@ def load(app):
         GROUP BY ss.id
       ''', (id,))
       
-      session = cursor.fetchone()
+      session = SESSION_FIELDS.one(cursor)
       if not session:
         return jsonify({"error": "Study session not found"}), 404
 
       # Get pagination parameters
-      page = request.args.get('page', 1, type=int)
-      per_page = request.args.get('per_page', 10, type=int)
+      page = max(1, request.args.get('page', 1, type=int))
+      per_page = max(1, min(request.args.get('per_page', 10, type=int), MAX_PER_PAGE))
       offset = (page - 1) * per_page
 
       # Get the words reviewed in this session with their review status
@@ -112,7 +156,7 @@ def load(app):
         LIMIT ? OFFSET ?
       ''', (id, per_page, offset))
       
-      words = cursor.fetchall()
+      words = SESSION_WORD_FIELDS.all(cursor)
 
       # Get total count of words
       cursor.execute('''
@@ -125,24 +169,8 @@ def load(app):
       total_count = cursor.fetchone()['count']
 
       return jsonify({
-        'session': {
-          'id': session['id'],
-          'group_id': session['group_id'],
-          'group_name': session['group_name'],
-          'activity_id': session['activity_id'],
-          'activity_name': session['activity_name'],
-          'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time
-          'review_items_count': session['review_items_count']
-        },
-        'words': [{
-          'id': word['id'],
-          'kanji': word['kanji'],
-          'romaji': word['romaji'],
-          'english': word['english'],
-          'correct_count': word['session_correct_count'],
-          'wrong_count': word['session_wrong_count']
-        } for word in words],
+        'session': session,
+        'words': words,
         'total': total_count,
         'page': page,
         'per_page': per_page,
@@ -162,19 +190,16 @@ def load(app):
         if not group_id or not study_activity_id:
             return jsonify({"error": "group_id and study_activity_id are required"}), 400
 
-        cursor = app.db.cursor()
-
-        # Insert a new study session
-        cursor.execute('''
-            INSERT INTO study_sessions (group_id, study_activity_id, created_at)
-            VALUES (?, ?, datetime('now'))
-        ''', (group_id, study_activity_id))
+        with app.db.transaction() as cursor:
+            # Insert a new study session
+            cursor.execute('''
+                INSERT INTO study_sessions (group_id, study_activity_id, created_at)
+                VALUES (?, ?, datetime('now'))
+            ''', (group_id, study_activity_id))
 
-        # Commit the transaction
-        app.db.commit()
-
-        # Get the ID of the newly created study session
-        study_session_id = cursor.lastrowid
+            # Get the ID of the newly created study session
+            study_session_id = cursor.lastrowid
+            bump_generation(cursor, 'history')
 
         return jsonify({
             "message": "Study session created successfully",
@@ -194,22 +219,20 @@ def load(app):
         if word_id is None or correct is None:
             return jsonify({"error": "word_id and correct are required"}), 400
 
-        cursor = app.db.cursor()
-
-        # Check if the study session exists
-        cursor.execute('SELECT id FROM study_sessions WHERE id = ?', (id,))
-        session = cursor.fetchone()
-        if not session:
-            return jsonify({"error": "Study session not found"}), 404
-
-        # Insert a review item for the word in the study session
-        cursor.execute('''
-            INSERT INTO word_review_items (study_session_id, word_id, correct, reviewed_at)
-            VALUES (?, ?, ?, datetime('now'))
-        ''', (id, word_id, correct))
+        with app.db.transaction() as cursor:
+            # Check if the study session exists
+            cursor.execute('SELECT id FROM study_sessions WHERE id = ?', (id,))
+            session = cursor.fetchone()
+            if not session:
+                return jsonify({"error": "Study session not found"}), 404
 
-        # Commit the transaction
-        app.db.commit()
+            # Insert a review item for the word in the study session. Triggers
+            # update the word_reviews aggregate in the same transaction.
+            cursor.execute('''
+                INSERT INTO word_review_items (study_session_id, word_id, correct, created_at)
+                VALUES (?, ?, ?, datetime('now'))
+            ''', (id, word_id, bool(correct)))
+            bump_generation(cursor, 'history')
 
         return jsonify({
             "message": "Review item added successfully",
@@ -220,20 +243,106 @@ def load(app):
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+  @app.route('/api/study-sessions/<int:id>/reviews', methods=['POST'])
+  @cross_origin()
+  def review_study_session_batch(id):
+    try:
+        data = request.get_json(silent=True)
+        # Accept a bare array or {"reviews": [...]}
+        items = data.get('reviews') if isinstance(data, dict) else data
+        if not isinstance(items, list) or not items:
+            return jsonify({"error": "a non-empty array of reviews is required"}), 400
+        if len(items) > MAX_REVIEWS_PER_BATCH:
+            return jsonify({"error": f"at most {MAX_REVIEWS_PER_BATCH} reviews per request"}), 400
+
+        try:
+            reviews = [parse_review_item(item) for item in items]
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        word_ids = sorted({word_id for word_id, _, _ in reviews})
+
+        with app.db.transaction() as cursor:
+            # Validate the session and every word id with a single query
+            cursor.execute('''
+                SELECT
+                    EXISTS (SELECT 1 FROM study_sessions WHERE id = ?) as session_exists,
+                    (
+                        SELECT json_group_array(value)
+                        FROM json_each(?)
+                        WHERE value NOT IN (SELECT id FROM words)
+                    ) as missing_word_ids
+            ''', (id, json.dumps(word_ids)))
+            validation = cursor.fetchone()
+            if not validation["session_exists"]:
+                return jsonify({"error": "Study session not found"}), 404
+            missing_word_ids = json.loads(validation["missing_word_ids"])
+            if missing_word_ids:
+                return jsonify({"error": "Words not found", "word_ids": missing_word_ids}), 400
+
+            # One statement, one transaction, one commit for the whole batch.
+            # Triggers update the per-word and dashboard aggregates as rows land.
+            cursor.executemany('''
+                INSERT INTO word_review_items (study_session_id, word_id, correct, created_at)
+                VALUES (?, ?, ?, COALESCE(?, datetime('now')))
+            ''', [(id, word_id, correct, reviewed_at) for word_id, correct, reviewed_at in reviews])
+            bump_generation(cursor, 'history')
+
+        return jsonify({
+            "message": "Review items added successfully",
+            "study_session_id": id,
+            "count": len(reviews)
+        }), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+  # Archive when BACKUPS_DIR is set, then delete in short transactions (see
+  # lib/backups.py and Db.clear_history_in_batches). Runs as a background job: the requesting
+  # learner's history only when serving several learners.
+  def reset_history():
+    archive = None
+    if app.config.get('BACKUPS_DIR'):
+      directory = app.config['BACKUPS_DIR']
+      if g.get('learner'):
+        directory = os.path.join(directory, 'learners')
+      archive = backups.snapshot(app.db.pool().database, directory,
+                                 label='reset', keep=app.config.get('BACKUPS_KEEP'))
+    sessions = app.db.clear_history_in_batches()
+    # Don't leave the dashboards showing the old history until the next refresh
+    if app.db.replica and not g.get('learner'):
+      app.db.refresh_replica()
+    return {"sessions_deleted": sessions, "archive": archive}
+
+  def reset_job_response(job):
+    return {
+      "job_id": job["id"],
+      "status": job["status"],
+      "started_at": job["started_at"],
+      "finished_at": job["finished_at"],
+      "result": job["result"],
+      "error": job["error"],
+      "status_url": url_for('get_reset_study_sessions', job_id=job["id"])
+    }
+
   @app.route('/api/study-sessions/reset', methods=['POST'])
   @cross_origin()
   def reset_study_sessions():
     try:
-      cursor = app.db.cursor()
-      
-      # First delete all word review items since they have foreign key constraints
-      cursor.execute('DELETE FROM word_review_items')
-      
-      # Then delete all study sessions
-      cursor.execute('DELETE FROM study_sessions')
-      
-      app.db.commit()
-      
-      return jsonify({"message": "Study history cleared successfully"}), 200
+      # Started in the background; a reset already running is returned as is
+      job = app.jobs.start('reset', reset_history)
+      response = reset_job_response(job)
+      response["message"] = "Clearing study history"
+      return jsonify(response), 202
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  @app.route('/api/study-sessions/reset/<job_id>', methods=['GET'])
+  @cross_origin()
+  def get_reset_study_sessions(job_id):
+    try:
+      job = app.jobs.get(job_id)
+      if job is None or job["kind"] != 'reset':
+        return jsonify({"error": "Reset not found"}), 404
+      return jsonify(reset_job_response(job))
     except Exception as e:
       return jsonify({"error": str(e)}), 500
\ No newline at end of file
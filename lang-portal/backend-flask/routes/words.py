@@ -1,6 +1,31 @@
 from flask import request, jsonify, g
 from flask_cors import cross_origin
 import json
+from lib.pagination import InvalidCursor, decode_cursor, keyset_seeks, next_page
+from lib.counts import get_count, include_total, total_pages
+from lib.rows import RowMapper
+from lib.search import MAX_RESULTS, search_words
+
+# /words sorts as (sort column, id column) on words joined to word_counts. The
+# id is taken from the same table as the sort column, so every sort (and the
+# keyset seeks of its cursor pages) is a range of one index: words (kanji),
+# (romaji), (english) or word_counts (correct_count, word_id), (wrong_count, word_id)
+WORD_LIST_SORTS = {
+  'kanji': ('w.kanji', 'w.id'),
+  'romaji': ('w.romaji', 'w.id'),
+  'english': ('w.english', 'w.id'),
+  'correct_count': ('c.correct_count', 'c.word_id'),
+  'wrong_count': ('c.wrong_count', 'c.word_id')
+}
+
+# One row of the /words listing
+WORD_FIELDS = RowMapper('id', 'kanji', 'romaji', 'english', 'correct_count', 'wrong_count')
+
+# Page size of /kanji/<kanji>/words
+DEFAULT_KANJI_WORDS_LIMIT = 50
+MAX_KANJI_WORDS_LIMIT = 200
+
+KANJI_WORD_FIELDS = RowMapper('id', 'kanji', 'romaji', 'english', ('parts', 'parts', json.loads))
 
 def load(app):
   # Endpoint: GET /words with pagination (50 words per page)
@@ -22,57 +47,88 @@ def load(app):
       order = request.args.get('order', 'asc')  # Default to ascending order
 
       # Validate sort_by and order
-      valid_columns = ['kanji', 'romaji', 'english', 'correct_count', 'wrong_count']
-      if sort_by not in valid_columns:
+      if sort_by not in WORD_LIST_SORTS:
         sort_by = 'kanji'
       if order not in ['asc', 'desc']:
         order = 'asc'
+      sort_column, id_column = WORD_LIST_SORTS[sort_by]
 
-      # Query to fetch words with sorting
-      cursor.execute(f'''
-        SELECT w.id, w.kanji, w.romaji, w.english, 
-            COALESCE(r.correct_count, 0) AS correct_count,
-            COALESCE(r.wrong_count, 0) AS wrong_count
-        FROM words w
-        LEFT JOIN word_reviews r ON w.id = r.word_id
-        ORDER BY {sort_by} {order}
+      # CROSS JOIN keeps the sort column's table as the outer loop, so SQLite
+      # walks its index in order even without ANALYZE statistics
+      tables = 'word_counts c CROSS JOIN words w' if id_column == 'c.word_id' else 'words w CROSS JOIN word_counts c'
+
+      # Query to fetch words with sorting (one extra row tells us if there is a next page)
+      query = f'''
+        SELECT w.id, w.kanji, w.romaji, w.english, c.correct_count, c.wrong_count
+        FROM {tables} ON c.word_id = w.id
+        {{where}}
+        ORDER BY {sort_column} {order}, {id_column} {order}
         LIMIT ? OFFSET ?
-      ''', (words_per_page, offset))
+      '''
 
-      words = cursor.fetchall()
+      # An opaque cursor (keyset pagination) takes precedence over page/offset.
+      # Its page is read with up to two index seeks, see keyset_seeks()
+      cursor_token = request.args.get('cursor')
+      if cursor_token:
+        key = decode_cursor(cursor_token, sort_by, order)
+        rows = []
+        for condition, params in keyset_seeks(sort_column, id_column, order, key):
+          cursor.execute(query.format(where='WHERE ' + condition), (*params, words_per_page + 1 - len(rows), 0))
+          rows += WORD_FIELDS.all(cursor)
+          if len(rows) > words_per_page:
+            break
+      else:
+        cursor.execute(query.format(where=''), (words_per_page + 1, offset))
+        rows = WORD_FIELDS.all(cursor)
 
-      # Query the total number of words
-      cursor.execute('SELECT COUNT(*) FROM words')
-      total_words = cursor.fetchone()[0]
-      total_pages = (total_words + words_per_page - 1) // words_per_page
+      words, next_cursor = next_page(
+        rows, words_per_page, sort_by, order,
+        key=lambda word: (word[sort_by], word["id"])
+      )
 
-      # Format the response
-      words_data = []
-      for word in words:
-        words_data.append({
-          "id": word["id"],
-          "kanji": word["kanji"],
-          "romaji": word["romaji"],
-          "english": word["english"],
-          "correct_count": word["correct_count"],
-          "wrong_count": word["wrong_count"]
-        })
+      # Total number of words, from the maintained counter
+      total_words = get_count(cursor, 'words') if include_total(request.args) else None
+
+      response = {
+        "words": words,
+        "total_pages": total_pages(total_words, words_per_page),
+        "total_words": total_words,
+        "next_cursor": next_cursor
+      }
+      if not cursor_token:
+        response["current_page"] = page
+      return jsonify(response)
+
+    except InvalidCursor as e:
+      return jsonify({"error": str(e)}), 400
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: GET /words/search?q= ranked search over kanji, romaji, kana and English
+  @app.route('/words/search', methods=['GET'])
+  @cross_origin()
+  @app.cache.cached('vocabulary', 'history')
+  def search_words_route():
+    try:
+      query = request.args.get('q', '').strip()
+      if not query:
+        return jsonify({"error": "q is required"}), 400
+      limit = min(max(request.args.get('limit', 20, type=int), 1), MAX_RESULTS)
+
+      cursor = app.db.cursor()
+      words = search_words(cursor, query, limit)
 
       return jsonify({
-        "words": words_data,
-        "total_pages": total_pages,
-        "current_page": page,
-        "total_words": total_words
+        "query": query,
+        "words": words
       })
-
     except Exception as e:
       return jsonify({"error": str(e)}), 500
-    finally:
-      app.db.close()
 
   # Endpoint: GET /words/:id to get a single word with its details
   @app.route('/words/<int:word_id>', methods=['GET'])
   @cross_origin()
+  @app.cache.cached('vocabulary', 'history')
   def get_word(word_id):
     try:
       cursor = app.db.cursor()
@@ -119,4 +175,41 @@ def load(app):
       })
       
     except Exception as e:
-      return jsonify({"error": str(e)}), 500
\ No newline at end of file
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: GET /kanji/<kanji>/words every word with <kanji> among its parts,
+  # in id order (`after_id` continues from a previous page)
+  @app.route('/kanji/<kanji>/words', methods=['GET'])
+  @cross_origin()
+  @app.cache.cached('vocabulary')
+  def get_kanji_words(kanji):
+    try:
+      cursor = app.db.cursor()
+      limit = max(1, min(request.args.get('limit', DEFAULT_KANJI_WORDS_LIMIT, type=int), MAX_KANJI_WORDS_LIMIT))
+      after_id = request.args.get('after_id', 0, type=int)
+
+      # A range of the (kanji, word_id) index of word_parts; a word with the
+      # part twice is listed once. One extra row tells us if there is more.
+      cursor.execute('''
+        SELECT w.id, w.kanji, w.romaji, w.english, w.parts
+        FROM (
+          SELECT DISTINCT word_id
+          FROM word_parts
+          WHERE kanji = ? AND word_id > ?
+          ORDER BY word_id
+          LIMIT ?
+        ) wp
+        JOIN words w ON w.id = wp.word_id
+        ORDER BY w.id
+      ''', (kanji, after_id, limit + 1))
+      words = KANJI_WORD_FIELDS.all(cursor)
+
+      more = len(words) > limit
+      words = words[:limit]
+      return jsonify({
+        "kanji": kanji,
+        "words": words,
+        "next_after_id": words[-1]["id"] if more else None
+      })
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
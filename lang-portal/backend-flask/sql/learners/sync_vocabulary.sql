@@ -0,0 +1,31 @@
+-- Bring a learner database's vocabulary up to date with the shared database,
+-- attached as `shared`. Rows are added or updated by id, never removed (the
+-- learner's history may refer to them). The learner's own triggers keep its
+-- search index, word parts, counters, due queues and snapshots in step.
+INSERT INTO groups (id, name, words_count)
+SELECT id, name, words_count FROM shared.groups WHERE true
+ON CONFLICT (id) DO UPDATE SET name = excluded.name, words_count = excluded.words_count
+WHERE name IS NOT excluded.name OR words_count IS NOT excluded.words_count;
+
+INSERT INTO words (id, kanji, romaji, english, parts)
+SELECT id, kanji, romaji, english, parts FROM shared.words WHERE true
+ON CONFLICT (id) DO UPDATE SET
+  kanji = excluded.kanji, romaji = excluded.romaji, english = excluded.english, parts = excluded.parts
+WHERE kanji IS NOT excluded.kanji OR romaji IS NOT excluded.romaji
+  OR english IS NOT excluded.english OR parts IS NOT excluded.parts;
+
+INSERT INTO word_groups (word_id, group_id)
+SELECT s.word_id, s.group_id FROM shared.word_groups s
+WHERE NOT EXISTS (
+  SELECT 1 FROM main.word_groups wg WHERE wg.word_id = s.word_id AND wg.group_id = s.group_id
+);
+
+INSERT INTO study_activities (id, name, url, preview_url)
+SELECT id, name, url, preview_url FROM shared.study_activities WHERE true
+ON CONFLICT (id) DO UPDATE SET name = excluded.name, url = excluded.url, preview_url = excluded.preview_url
+WHERE name IS NOT excluded.name OR url IS NOT excluded.url OR preview_url IS NOT excluded.preview_url;
+
+-- What the copy is now up to date with
+INSERT INTO vocabulary_sync (scope, generation)
+SELECT scope, generation FROM shared.cache_generations WHERE scope IN ('vocabulary', 'activities')
+ON CONFLICT (scope) DO UPDATE SET generation = excluded.generation;
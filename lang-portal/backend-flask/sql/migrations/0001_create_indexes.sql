@@ -0,0 +1,23 @@
+-- Secondary indexes for the joins and sorts used by the listing routes
+
+-- Group membership, both directions (group listings and word detail)
+CREATE INDEX IF NOT EXISTS idx_word_groups_group_id_word_id ON word_groups (group_id, word_id);
+CREATE INDEX IF NOT EXISTS idx_word_groups_word_id_group_id ON word_groups (word_id, group_id);
+
+-- Review items per session (counts, last activity) and per word (success rates)
+CREATE INDEX IF NOT EXISTS idx_word_review_items_study_session_id ON word_review_items (study_session_id, created_at, correct);
+CREATE INDEX IF NOT EXISTS idx_word_review_items_word_id ON word_review_items (word_id, correct);
+
+-- One aggregate row per word
+CREATE UNIQUE INDEX IF NOT EXISTS idx_word_reviews_word_id ON word_reviews (word_id);
+
+-- Session listings (global, per group, per activity) newest first
+CREATE INDEX IF NOT EXISTS idx_study_sessions_created_at ON study_sessions (created_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group_id_created_at ON study_sessions (group_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_study_sessions_study_activity_id_created_at ON study_sessions (study_activity_id, created_at);
+
+-- Sortable word and group columns
+CREATE INDEX IF NOT EXISTS idx_words_kanji ON words (kanji);
+CREATE INDEX IF NOT EXISTS idx_words_romaji ON words (romaji);
+CREATE INDEX IF NOT EXISTS idx_words_english ON words (english);
+CREATE INDEX IF NOT EXISTS idx_groups_name ON groups (name);
@@ -0,0 +1,87 @@
+-- Trigger-maintained row counts so paginated listings never run COUNT(*)
+--   scope 'words' / 'groups' / 'study_sessions'  -> table totals (scope_id 0)
+--   scope 'group_sessions'                       -> sessions per group
+--   scope 'activity_sessions'                    -> sessions per study activity
+--   scope 'session_review_items'                 -> review items per session
+CREATE TABLE IF NOT EXISTS row_counts (
+  scope TEXT NOT NULL,
+  scope_id INTEGER NOT NULL DEFAULT 0,
+  count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (scope, scope_id)
+) WITHOUT ROWID;
+
+-- Recompute from scratch so the counters are correct for existing data
+DELETE FROM row_counts;
+INSERT INTO row_counts (scope, scope_id, count) SELECT 'words', 0, COUNT(*) FROM words;
+INSERT INTO row_counts (scope, scope_id, count) SELECT 'groups', 0, COUNT(*) FROM groups;
+INSERT INTO row_counts (scope, scope_id, count) SELECT 'study_sessions', 0, COUNT(*) FROM study_sessions;
+INSERT INTO row_counts (scope, scope_id, count)
+  SELECT 'group_sessions', group_id, COUNT(*) FROM study_sessions GROUP BY group_id;
+INSERT INTO row_counts (scope, scope_id, count)
+  SELECT 'activity_sessions', study_activity_id, COUNT(*) FROM study_sessions GROUP BY study_activity_id;
+INSERT INTO row_counts (scope, scope_id, count)
+  SELECT 'session_review_items', study_session_id, COUNT(*) FROM word_review_items GROUP BY study_session_id;
+
+CREATE TRIGGER IF NOT EXISTS trg_words_count_insert AFTER INSERT ON words
+BEGIN
+  INSERT INTO row_counts (scope, scope_id, count) VALUES ('words', 0, 1)
+    ON CONFLICT (scope, scope_id) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_words_count_delete AFTER DELETE ON words
+BEGIN
+  UPDATE row_counts SET count = count - 1 WHERE scope = 'words' AND scope_id = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_groups_count_insert AFTER INSERT ON groups
+BEGIN
+  INSERT INTO row_counts (scope, scope_id, count) VALUES ('groups', 0, 1)
+    ON CONFLICT (scope, scope_id) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_groups_count_delete AFTER DELETE ON groups
+BEGIN
+  UPDATE row_counts SET count = count - 1 WHERE scope = 'groups' AND scope_id = 0;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_study_sessions_count_insert AFTER INSERT ON study_sessions
+BEGIN
+  INSERT INTO row_counts (scope, scope_id, count) VALUES
+    ('study_sessions', 0, 1),
+    ('group_sessions', NEW.group_id, 1),
+    ('activity_sessions', NEW.study_activity_id, 1)
+    ON CONFLICT (scope, scope_id) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_study_sessions_count_delete AFTER DELETE ON study_sessions
+BEGIN
+  UPDATE row_counts SET count = count - 1
+  WHERE (scope = 'study_sessions' AND scope_id = 0)
+     OR (scope = 'group_sessions' AND scope_id = OLD.group_id)
+     OR (scope = 'activity_sessions' AND scope_id = OLD.study_activity_id);
+  DELETE FROM row_counts WHERE scope = 'session_review_items' AND scope_id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_study_sessions_count_update
+AFTER UPDATE OF group_id, study_activity_id ON study_sessions
+BEGIN
+  UPDATE row_counts SET count = count - 1
+  WHERE (scope = 'group_sessions' AND scope_id = OLD.group_id)
+     OR (scope = 'activity_sessions' AND scope_id = OLD.study_activity_id);
+  INSERT INTO row_counts (scope, scope_id, count) VALUES
+    ('group_sessions', NEW.group_id, 1),
+    ('activity_sessions', NEW.study_activity_id, 1)
+    ON CONFLICT (scope, scope_id) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_word_review_items_count_insert AFTER INSERT ON word_review_items
+BEGIN
+  INSERT INTO row_counts (scope, scope_id, count) VALUES ('session_review_items', NEW.study_session_id, 1)
+    ON CONFLICT (scope, scope_id) DO UPDATE SET count = count + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_word_review_items_count_delete AFTER DELETE ON word_review_items
+BEGIN
+  UPDATE row_counts SET count = count - 1
+  WHERE scope = 'session_review_items' AND scope_id = OLD.study_session_id;
+END;
@@ -0,0 +1,63 @@
+-- word_reviews is a per-word aggregate of word_review_items, maintained by the
+-- triggers below. It holds nothing that cannot be derived from the review log,
+-- so it is recreated empty here (which also adds the streak column to older
+-- databases) and refilled from the log by the online backfill at the end.
+DROP TABLE IF EXISTS word_reviews;
+CREATE TABLE word_reviews (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  word_id INTEGER NOT NULL,
+  correct_count INTEGER DEFAULT 0,
+  wrong_count INTEGER DEFAULT 0,
+  last_reviewed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  streak INTEGER DEFAULT 0,  -- Consecutive correct answers since the last wrong one
+  FOREIGN KEY (word_id) REFERENCES words(id)
+);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_word_reviews_word_id ON word_reviews (word_id);
+
+CREATE TRIGGER IF NOT EXISTS trg_word_reviews_insert AFTER INSERT ON word_review_items
+BEGIN
+  INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed, streak)
+  VALUES (NEW.word_id, NEW.correct = 1, NEW.correct = 0, NEW.created_at, NEW.correct = 1)
+  ON CONFLICT (word_id) DO UPDATE SET
+    correct_count = correct_count + excluded.correct_count,
+    wrong_count = wrong_count + excluded.wrong_count,
+    last_reviewed = MAX(last_reviewed, excluded.last_reviewed),
+    streak = CASE WHEN excluded.correct_count = 1 THEN streak + 1 ELSE 0 END;
+END;
+
+-- Deleting history can't restore an exact streak cheaply; cap it at what remains
+CREATE TRIGGER IF NOT EXISTS trg_word_reviews_delete AFTER DELETE ON word_review_items
+BEGIN
+  UPDATE word_reviews SET
+    correct_count = correct_count - (OLD.correct = 1),
+    wrong_count = wrong_count - (OLD.correct = 0),
+    streak = MIN(streak, correct_count - (OLD.correct = 1))
+  WHERE word_id = OLD.word_id;
+  DELETE FROM word_reviews WHERE word_id = OLD.word_id AND correct_count + wrong_count <= 0;
+END;
+
+-- Words reviewed before the triggers, a range of word ids per batch (through
+-- idx_word_review_items_word_id). Each batch recomputes its words from the
+-- whole log, so it overwrites what the triggers added for them meanwhile.
+-- backfill: words batch 500
+INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed, streak)
+SELECT
+  wri.word_id,
+  SUM(wri.correct = 1),
+  SUM(wri.correct = 0),
+  MAX(wri.created_at),
+  SUM(wri.correct = 1 AND wri.id > COALESCE(last_wrong.id, 0))
+FROM word_review_items wri
+LEFT JOIN (
+  SELECT word_id, MAX(id) AS id
+  FROM word_review_items
+  WHERE correct = 0 AND word_id >= :start AND word_id < :end
+  GROUP BY word_id
+) last_wrong ON last_wrong.word_id = wri.word_id
+WHERE wri.word_id >= :start AND wri.word_id < :end
+GROUP BY wri.word_id
+ON CONFLICT (word_id) DO UPDATE SET
+  correct_count = excluded.correct_count,
+  wrong_count = excluded.wrong_count,
+  last_reviewed = excluded.last_reviewed,
+  streak = excluded.streak;
@@ -0,0 +1,117 @@
+-- Materialized dashboard statistics, maintained incrementally by triggers.
+-- sql/rebuild/dashboard_stats.sql recomputes everything from scratch.
+CREATE TABLE IF NOT EXISTS dashboard_stats (
+  id INTEGER PRIMARY KEY CHECK (id = 1),  -- Single snapshot row
+  total_vocabulary INTEGER NOT NULL DEFAULT 0,
+  total_words_studied INTEGER NOT NULL DEFAULT 0,
+  mastered_words INTEGER NOT NULL DEFAULT 0,  -- >=80% success rate over at least 5 attempts
+  correct_count INTEGER NOT NULL DEFAULT 0,
+  wrong_count INTEGER NOT NULL DEFAULT 0,
+  total_sessions INTEGER NOT NULL DEFAULT 0,
+  last_study_date DATE,
+  current_streak INTEGER NOT NULL DEFAULT 0  -- Consecutive study days ending at last_study_date
+);
+INSERT OR IGNORE INTO dashboard_stats (id) VALUES (1);
+
+-- Sessions per day and group, for "active groups in the last 30 days" and streaks
+CREATE TABLE IF NOT EXISTS dashboard_daily_sessions (
+  study_date DATE NOT NULL,
+  group_id INTEGER NOT NULL,
+  sessions_count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (study_date, group_id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_stats_words_insert AFTER INSERT ON words
+BEGIN
+  UPDATE dashboard_stats SET total_vocabulary = total_vocabulary + 1 WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_stats_words_delete AFTER DELETE ON words
+BEGIN
+  UPDATE dashboard_stats SET total_vocabulary = total_vocabulary - 1 WHERE id = 1;
+END;
+
+-- Word-level counters follow the word_reviews aggregate (see 0003)
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_stats_word_reviews_insert AFTER INSERT ON word_reviews
+BEGIN
+  UPDATE dashboard_stats SET
+    total_words_studied = total_words_studied + (NEW.correct_count + NEW.wrong_count > 0),
+    mastered_words = mastered_words + (
+      NEW.correct_count + NEW.wrong_count >= 5
+      AND NEW.correct_count >= 0.8 * (NEW.correct_count + NEW.wrong_count)
+    ),
+    correct_count = correct_count + NEW.correct_count,
+    wrong_count = wrong_count + NEW.wrong_count
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_stats_word_reviews_update
+AFTER UPDATE OF correct_count, wrong_count ON word_reviews
+BEGIN
+  UPDATE dashboard_stats SET
+    total_words_studied = total_words_studied
+      + (NEW.correct_count + NEW.wrong_count > 0)
+      - (OLD.correct_count + OLD.wrong_count > 0),
+    mastered_words = mastered_words
+      + (
+        NEW.correct_count + NEW.wrong_count >= 5
+        AND NEW.correct_count >= 0.8 * (NEW.correct_count + NEW.wrong_count)
+      )
+      - (
+        OLD.correct_count + OLD.wrong_count >= 5
+        AND OLD.correct_count >= 0.8 * (OLD.correct_count + OLD.wrong_count)
+      ),
+    correct_count = correct_count + NEW.correct_count - OLD.correct_count,
+    wrong_count = wrong_count + NEW.wrong_count - OLD.wrong_count
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_stats_word_reviews_delete AFTER DELETE ON word_reviews
+BEGIN
+  UPDATE dashboard_stats SET
+    total_words_studied = total_words_studied - (OLD.correct_count + OLD.wrong_count > 0),
+    mastered_words = mastered_words - (
+      OLD.correct_count + OLD.wrong_count >= 5
+      AND OLD.correct_count >= 0.8 * (OLD.correct_count + OLD.wrong_count)
+    ),
+    correct_count = correct_count - OLD.correct_count,
+    wrong_count = wrong_count - OLD.wrong_count
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_stats_study_sessions_insert AFTER INSERT ON study_sessions
+BEGIN
+  INSERT INTO dashboard_daily_sessions (study_date, group_id, sessions_count)
+  VALUES (date(NEW.created_at), NEW.group_id, 1)
+  ON CONFLICT (study_date, group_id) DO UPDATE SET sessions_count = sessions_count + 1;
+
+  -- Backdated sessions leave the streak alone; a rebuild picks them up
+  UPDATE dashboard_stats SET
+    total_sessions = total_sessions + 1,
+    current_streak = CASE
+      WHEN last_study_date IS NULL THEN 1
+      WHEN date(NEW.created_at) = last_study_date THEN current_streak
+      WHEN date(NEW.created_at) = date(last_study_date, '+1 day') THEN current_streak + 1
+      WHEN date(NEW.created_at) > last_study_date THEN 1
+      ELSE current_streak
+    END,
+    last_study_date = MAX(COALESCE(last_study_date, ''), date(NEW.created_at))
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_dashboard_stats_study_sessions_delete AFTER DELETE ON study_sessions
+BEGIN
+  UPDATE dashboard_daily_sessions SET sessions_count = sessions_count - 1
+  WHERE study_date = date(OLD.created_at) AND group_id = OLD.group_id;
+  DELETE FROM dashboard_daily_sessions
+  WHERE study_date = date(OLD.created_at) AND group_id = OLD.group_id AND sessions_count <= 0;
+
+  UPDATE dashboard_stats SET
+    total_sessions = total_sessions - 1,
+    current_streak = CASE WHEN total_sessions <= 1 THEN 0 ELSE current_streak END,
+    last_study_date = CASE WHEN total_sessions <= 1 THEN NULL ELSE last_study_date END
+  WHERE id = 1;
+END;
+
+-- Fill the new tables from existing data
+-- rebuild: dashboard_stats
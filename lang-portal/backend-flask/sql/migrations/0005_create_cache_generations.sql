@@ -0,0 +1,10 @@
+-- Generation counters for the response cache (lib/cache.py). Write paths bump
+-- the scopes they touch inside their transaction, which invalidates every
+-- cached response depending on that scope, in every worker process.
+--   vocabulary  -> words, groups, word_groups
+--   activities  -> study_activities
+--   history     -> study_sessions, word_review_items (and their aggregates)
+CREATE TABLE IF NOT EXISTS cache_generations (
+  scope TEXT PRIMARY KEY,
+  generation INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
@@ -0,0 +1,72 @@
+-- Full-text search over words (see lib/search.py)
+--   words_fts      word and prefix matches (unicode61, prefix indexes)
+--   words_trigram  substring and typo-tolerant matches (trigram tokenizer)
+-- Both are contentless: they only hold the index, rows are read from words.
+-- The indexed text comes from words_search_source, which also feeds the
+-- 'delete' commands so removals match exactly what was indexed.
+CREATE VIEW IF NOT EXISTS words_search_source AS
+SELECT
+  w.id,
+  w.kanji,
+  lower(w.romaji) AS romaji,
+  w.english,
+  CASE WHEN json_valid(w.parts) THEN (
+    SELECT COALESCE(group_concat(json_extract(p.value, '$.kanji'), ' '), '')
+    FROM json_each(w.parts) p
+    WHERE p.type = 'object'
+  ) ELSE '' END AS parts
+FROM words w;
+
+CREATE VIRTUAL TABLE IF NOT EXISTS words_fts USING fts5(
+  kanji, romaji, english, parts,
+  content = '',
+  tokenize = 'unicode61 remove_diacritics 2',
+  prefix = '1 2 3'
+);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS words_trigram USING fts5(
+  kanji, romaji, english, parts,
+  content = '',
+  tokenize = 'trigram'
+);
+
+-- Document frequency per trigram, used to match on the rarest ones first
+CREATE VIRTUAL TABLE IF NOT EXISTS words_trigram_vocab USING fts5vocab(words_trigram, 'row');
+
+CREATE TRIGGER IF NOT EXISTS trg_words_search_insert AFTER INSERT ON words
+BEGIN
+  INSERT INTO words_fts (rowid, kanji, romaji, english, parts)
+    SELECT id, kanji, romaji, english, parts FROM words_search_source WHERE id = NEW.id;
+  INSERT INTO words_trigram (rowid, kanji, romaji, english, parts)
+    SELECT id, kanji, romaji, english, parts FROM words_search_source WHERE id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_words_search_delete BEFORE DELETE ON words
+BEGIN
+  INSERT INTO words_fts (words_fts, rowid, kanji, romaji, english, parts)
+    SELECT 'delete', id, kanji, romaji, english, parts FROM words_search_source WHERE id = OLD.id;
+  INSERT INTO words_trigram (words_trigram, rowid, kanji, romaji, english, parts)
+    SELECT 'delete', id, kanji, romaji, english, parts FROM words_search_source WHERE id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_words_search_update_before BEFORE UPDATE OF kanji, romaji, english, parts ON words
+BEGIN
+  INSERT INTO words_fts (words_fts, rowid, kanji, romaji, english, parts)
+    SELECT 'delete', id, kanji, romaji, english, parts FROM words_search_source WHERE id = OLD.id;
+  INSERT INTO words_trigram (words_trigram, rowid, kanji, romaji, english, parts)
+    SELECT 'delete', id, kanji, romaji, english, parts FROM words_search_source WHERE id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_words_search_update_after AFTER UPDATE OF kanji, romaji, english, parts ON words
+BEGIN
+  INSERT INTO words_fts (rowid, kanji, romaji, english, parts)
+    SELECT id, kanji, romaji, english, parts FROM words_search_source WHERE id = NEW.id;
+  INSERT INTO words_trigram (rowid, kanji, romaji, english, parts)
+    SELECT id, kanji, romaji, english, parts FROM words_search_source WHERE id = NEW.id;
+END;
+
+-- Rank word matches on kanji and romaji above English, and parts last
+INSERT INTO words_fts (words_fts, rank) VALUES ('rank', 'bm25(10.0, 10.0, 5.0, 2.0)');
+
+-- Fill the new tables from existing data
+-- rebuild: words_search
@@ -0,0 +1,69 @@
+-- Spaced-repetition schedule (SM-2), one row per reviewed word, advanced by a
+-- trigger on every review. Only correct/wrong is recorded, so a correct answer
+-- is graded "good" (ease unchanged) and a wrong one is a lapse: the word starts
+-- over at a one-day interval and its ease drops by 0.2, down to 1.3.
+-- sql/rebuild/word_schedule.sql replays the review log with the same rules.
+CREATE TABLE IF NOT EXISTS word_schedule (
+  word_id INTEGER PRIMARY KEY,
+  ease REAL NOT NULL DEFAULT 2.5,
+  interval_days INTEGER NOT NULL DEFAULT 0,
+  repetitions INTEGER NOT NULL DEFAULT 0,  -- Consecutive correct reviews
+  last_reviewed TIMESTAMP NOT NULL,
+  due_at TIMESTAMP GENERATED ALWAYS AS (datetime(last_reviewed, '+' || interval_days || ' days')) STORED,
+  FOREIGN KEY (word_id) REFERENCES words(id)
+);
+
+-- Due queue: group membership with each word's due_at copied in, so the next
+-- words due in a group are a range scan of (group_id, due_at). Words that were
+-- never reviewed have a NULL due_at.
+CREATE TABLE IF NOT EXISTS group_due_words (
+  group_id INTEGER NOT NULL,
+  word_id INTEGER NOT NULL,
+  due_at TIMESTAMP,
+  PRIMARY KEY (group_id, word_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_group_due_words_group_id_due_at ON group_due_words (group_id, due_at, word_id);
+CREATE INDEX IF NOT EXISTS idx_group_due_words_word_id ON group_due_words (word_id);
+
+CREATE TRIGGER IF NOT EXISTS trg_word_schedule_review_insert AFTER INSERT ON word_review_items
+BEGIN
+  INSERT OR IGNORE INTO word_schedule (word_id, last_reviewed) VALUES (NEW.word_id, NEW.created_at);
+  UPDATE word_schedule SET
+    repetitions = CASE WHEN NEW.correct = 1 THEN repetitions + 1 ELSE 0 END,
+    interval_days = CASE
+      WHEN NEW.correct = 0 OR repetitions = 0 THEN 1
+      WHEN repetitions = 1 THEN 6
+      ELSE CAST(round(interval_days * ease) AS INTEGER)
+    END,
+    ease = CASE WHEN NEW.correct = 1 THEN ease ELSE MAX(1.3, ease - 0.2) END,
+    last_reviewed = MAX(last_reviewed, NEW.created_at)
+  WHERE word_id = NEW.word_id;
+  UPDATE group_due_words
+  SET due_at = (SELECT due_at FROM word_schedule WHERE word_id = NEW.word_id)
+  WHERE word_id = NEW.word_id;
+END;
+
+-- Deleting part of a word's history keeps its schedule; deleting all of it
+-- makes the word new again
+CREATE TRIGGER IF NOT EXISTS trg_word_schedule_review_delete AFTER DELETE ON word_review_items
+WHEN NOT EXISTS (SELECT 1 FROM word_review_items WHERE word_id = OLD.word_id)
+BEGIN
+  DELETE FROM word_schedule WHERE word_id = OLD.word_id;
+  UPDATE group_due_words SET due_at = NULL WHERE word_id = OLD.word_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_group_due_words_insert AFTER INSERT ON word_groups
+BEGIN
+  INSERT OR IGNORE INTO group_due_words (group_id, word_id, due_at)
+  VALUES (NEW.group_id, NEW.word_id, (SELECT due_at FROM word_schedule WHERE word_id = NEW.word_id));
+END;
+
+-- word_groups may hold duplicate pairs; keep the entry while any remains
+CREATE TRIGGER IF NOT EXISTS trg_group_due_words_delete AFTER DELETE ON word_groups
+WHEN NOT EXISTS (SELECT 1 FROM word_groups WHERE group_id = OLD.group_id AND word_id = OLD.word_id)
+BEGIN
+  DELETE FROM group_due_words WHERE group_id = OLD.group_id AND word_id = OLD.word_id;
+END;
+
+-- Fill the new tables from existing data
+-- rebuild: word_schedule
@@ -0,0 +1,124 @@
+-- Study activity per day and per week (weeks start on Monday), per group and
+-- activity, for /dashboard/timeseries. Maintained by triggers on every
+-- session and review, so charts read a few rows per period instead of
+-- grouping the history by date(created_at).
+--   sessions              sessions started in the period
+--   reviews/correct/wrong review items recorded in the period
+--   words                 distinct words reviewed in the period, group and activity
+CREATE TABLE IF NOT EXISTS study_rollups (
+  granularity TEXT NOT NULL CHECK (granularity IN ('day', 'week')),
+  period_start DATE NOT NULL,  -- The day, or the Monday the week starts on
+  group_id INTEGER NOT NULL,
+  study_activity_id INTEGER NOT NULL,
+  sessions INTEGER NOT NULL DEFAULT 0,
+  reviews INTEGER NOT NULL DEFAULT 0,
+  correct INTEGER NOT NULL DEFAULT 0,
+  wrong INTEGER NOT NULL DEFAULT 0,
+  words INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (granularity, period_start, group_id, study_activity_id)
+) WITHOUT ROWID;
+
+-- Words already counted in each rollup row
+CREATE TABLE IF NOT EXISTS study_rollup_words (
+  granularity TEXT NOT NULL,
+  period_start DATE NOT NULL,
+  group_id INTEGER NOT NULL,
+  study_activity_id INTEGER NOT NULL,
+  word_id INTEGER NOT NULL,
+  PRIMARY KEY (granularity, period_start, group_id, study_activity_id, word_id)
+) WITHOUT ROWID;
+
+CREATE TRIGGER IF NOT EXISTS trg_study_rollups_sessions_insert AFTER INSERT ON study_sessions
+BEGIN
+  INSERT INTO study_rollups (granularity, period_start, group_id, study_activity_id, sessions)
+  VALUES
+    ('day', date(NEW.created_at), NEW.group_id, NEW.study_activity_id, 1),
+    ('week', date(NEW.created_at, 'weekday 0', '-6 days'), NEW.group_id, NEW.study_activity_id, 1)
+  ON CONFLICT (granularity, period_start, group_id, study_activity_id) DO UPDATE SET sessions = sessions + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_study_rollups_sessions_delete AFTER DELETE ON study_sessions
+BEGIN
+  UPDATE study_rollups SET sessions = sessions - 1
+  WHERE group_id = OLD.group_id AND study_activity_id = OLD.study_activity_id
+    AND (
+      (granularity = 'day' AND period_start = date(OLD.created_at))
+      OR (granularity = 'week' AND period_start = date(OLD.created_at, 'weekday 0', '-6 days'))
+    );
+END;
+
+-- Reviews are attributed to their session's group and activity
+CREATE TRIGGER IF NOT EXISTS trg_study_rollups_reviews_insert AFTER INSERT ON word_review_items
+BEGIN
+  INSERT INTO study_rollups (granularity, period_start, group_id, study_activity_id, reviews, correct, wrong, words)
+  SELECT
+    p.granularity, p.period_start, s.group_id, s.study_activity_id,
+    1, NEW.correct = 1, NEW.correct = 0,
+    NOT EXISTS (
+      SELECT 1 FROM study_rollup_words w
+      WHERE w.granularity = p.granularity AND w.period_start = p.period_start
+        AND w.group_id = s.group_id AND w.study_activity_id = s.study_activity_id
+        AND w.word_id = NEW.word_id
+    )
+  FROM study_sessions s
+  JOIN (
+    SELECT 'day' AS granularity, date(NEW.created_at) AS period_start
+    UNION ALL
+    SELECT 'week', date(NEW.created_at, 'weekday 0', '-6 days')
+  ) p
+  WHERE s.id = NEW.study_session_id
+  ON CONFLICT (granularity, period_start, group_id, study_activity_id) DO UPDATE SET
+    reviews = reviews + 1,
+    correct = correct + excluded.correct,
+    wrong = wrong + excluded.wrong,
+    words = words + excluded.words;
+
+  INSERT OR IGNORE INTO study_rollup_words (granularity, period_start, group_id, study_activity_id, word_id)
+  SELECT p.granularity, p.period_start, s.group_id, s.study_activity_id, NEW.word_id
+  FROM study_sessions s
+  JOIN (
+    SELECT 'day' AS granularity, date(NEW.created_at) AS period_start
+    UNION ALL
+    SELECT 'week', date(NEW.created_at, 'weekday 0', '-6 days')
+  ) p
+  WHERE s.id = NEW.study_session_id;
+END;
+
+-- Finding out whether a word is still reviewed elsewhere in the period would
+-- mean scanning its reviews, so `words` only drops when the period has no
+-- reviews left (sql/rebuild/study_rollups.sql recomputes it exactly). The
+-- rollup rows are joined on their whole primary key so that deleting a
+-- history stays a lookup per review.
+CREATE TRIGGER IF NOT EXISTS trg_study_rollups_reviews_delete AFTER DELETE ON word_review_items
+BEGIN
+  UPDATE study_rollups SET
+    reviews = reviews - 1,
+    correct = correct - (OLD.correct = 1),
+    wrong = wrong - (OLD.correct = 0),
+    words = CASE WHEN reviews <= 1 THEN 0 ELSE words END
+  FROM study_sessions s, (
+    SELECT 'day' AS granularity, date(OLD.created_at) AS period_start
+    UNION ALL
+    SELECT 'week', date(OLD.created_at, 'weekday 0', '-6 days')
+  ) p
+  WHERE s.id = OLD.study_session_id
+    AND study_rollups.granularity = p.granularity AND study_rollups.period_start = p.period_start
+    AND study_rollups.group_id = s.group_id AND study_rollups.study_activity_id = s.study_activity_id;
+END;
+
+-- A period with no reviews left forgets its words, and one with no sessions
+-- either is removed
+CREATE TRIGGER IF NOT EXISTS trg_study_rollups_emptied AFTER UPDATE OF sessions, reviews ON study_rollups
+WHEN NEW.reviews <= 0
+BEGIN
+  DELETE FROM study_rollup_words
+  WHERE granularity = NEW.granularity AND period_start = NEW.period_start
+    AND group_id = NEW.group_id AND study_activity_id = NEW.study_activity_id;
+  DELETE FROM study_rollups
+  WHERE granularity = NEW.granularity AND period_start = NEW.period_start
+    AND group_id = NEW.group_id AND study_activity_id = NEW.study_activity_id
+    AND sessions <= 0;
+END;
+
+-- Fill the new tables from existing data
+-- rebuild: study_rollups
@@ -0,0 +1,47 @@
+-- Vocabulary snapshot of each group for the study activities: the group's
+-- words and their parts as gzip compressed JSON, built by lib/snapshots.py
+-- (on import, or on the first request after a change) and served as is by
+-- /api/groups/<id>/snapshot. The etag is the SHA-256 of the uncompressed
+-- JSON, so it only changes when the content does. Triggers clear `body` when
+-- a group's words change.
+CREATE TABLE IF NOT EXISTS group_snapshots (
+  group_id INTEGER PRIMARY KEY,
+  etag TEXT NOT NULL,
+  body BLOB,  -- NULL when stale
+  size INTEGER NOT NULL,  -- Uncompressed bytes
+  words_count INTEGER NOT NULL,
+  built_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (group_id) REFERENCES groups(id)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_group_snapshots_word_groups_insert AFTER INSERT ON word_groups
+BEGIN
+  UPDATE group_snapshots SET body = NULL WHERE group_id = NEW.group_id AND body IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_group_snapshots_word_groups_delete AFTER DELETE ON word_groups
+BEGIN
+  UPDATE group_snapshots SET body = NULL WHERE group_id = OLD.group_id AND body IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_group_snapshots_words_update AFTER UPDATE OF kanji, romaji, english, parts ON words
+BEGIN
+  UPDATE group_snapshots SET body = NULL
+  WHERE group_id IN (SELECT group_id FROM word_groups WHERE word_id = NEW.id) AND body IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_group_snapshots_words_delete AFTER DELETE ON words
+BEGIN
+  UPDATE group_snapshots SET body = NULL
+  WHERE group_id IN (SELECT group_id FROM word_groups WHERE word_id = OLD.id) AND body IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_group_snapshots_groups_update AFTER UPDATE OF name ON groups
+BEGIN
+  UPDATE group_snapshots SET body = NULL WHERE group_id = NEW.id AND body IS NOT NULL;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_group_snapshots_groups_delete AFTER DELETE ON groups
+BEGIN
+  DELETE FROM group_snapshots WHERE group_id = OLD.id;
+END;
@@ -0,0 +1,53 @@
+-- The components of each word (the JSON array in words.parts), one row per
+-- part, so words can be found and grouped by component with an index lookup
+-- instead of parsing words.parts row by row. Kept in step with words by
+-- triggers, so the importer fills it as it inserts words. Words that existed
+-- before this migration are backfilled online.
+--   romaji  the part's reading with its syllables joined (["ta", "be"] -> "tabe")
+CREATE TABLE IF NOT EXISTS word_parts (
+  word_id INTEGER NOT NULL,
+  position INTEGER NOT NULL,  -- Index in words.parts, from 0
+  kanji TEXT NOT NULL,
+  romaji TEXT NOT NULL,
+  PRIMARY KEY (word_id, position),
+  FOREIGN KEY (word_id) REFERENCES words(id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_word_parts_kanji_word_id ON word_parts (kanji, word_id);
+
+-- words.parts as rows; entries that aren't objects with a kanji are skipped
+CREATE VIEW IF NOT EXISTS word_parts_source AS
+SELECT
+  w.id AS word_id,
+  p.key AS position,
+  json_extract(p.value, '$.kanji') AS kanji,
+  CASE json_type(p.value, '$.romaji')
+    WHEN 'array' THEN (SELECT COALESCE(group_concat(r.value, ''), '') FROM json_each(p.value, '$.romaji') r)
+    ELSE COALESCE(json_extract(p.value, '$.romaji'), '')
+  END AS romaji
+FROM words w, json_each(CASE WHEN json_valid(w.parts) AND json_type(w.parts) = 'array' THEN w.parts ELSE '[]' END) p
+WHERE p.type = 'object' AND json_type(p.value, '$.kanji') = 'text';
+
+CREATE TRIGGER IF NOT EXISTS trg_word_parts_words_insert AFTER INSERT ON words
+BEGIN
+  INSERT OR IGNORE INTO word_parts (word_id, position, kanji, romaji)
+    SELECT word_id, position, kanji, romaji FROM word_parts_source WHERE word_id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_word_parts_words_update AFTER UPDATE OF parts ON words
+BEGIN
+  DELETE FROM word_parts WHERE word_id = OLD.id;
+  INSERT OR IGNORE INTO word_parts (word_id, position, kanji, romaji)
+    SELECT word_id, position, kanji, romaji FROM word_parts_source WHERE word_id = NEW.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_word_parts_words_delete AFTER DELETE ON words
+BEGIN
+  DELETE FROM word_parts WHERE word_id = OLD.id;
+END;
+
+-- Words from before the triggers. OR IGNORE: words inserted since then
+-- already have their parts.
+-- backfill: words batch 5000
+INSERT OR IGNORE INTO word_parts (word_id, position, kanji, romaji)
+  SELECT word_id, position, kanji, romaji FROM word_parts_source
+  WHERE word_id >= :start AND word_id < :end;
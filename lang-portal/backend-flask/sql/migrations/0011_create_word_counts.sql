@@ -0,0 +1,42 @@
+-- Review counts of every word, reviewed or not, so /words can be sorted by
+-- correct_count or wrong_count straight off an index. word_reviews only has
+-- rows for reviewed words, so sorting on it needs COALESCE over a LEFT JOIN,
+-- which no index serves. Kept in step with words and word_reviews below;
+-- sql/rebuild/word_counts.sql recomputes it.
+CREATE TABLE IF NOT EXISTS word_counts (
+  word_id INTEGER PRIMARY KEY,
+  correct_count INTEGER NOT NULL DEFAULT 0,
+  wrong_count INTEGER NOT NULL DEFAULT 0,
+  FOREIGN KEY (word_id) REFERENCES words(id)
+);
+CREATE INDEX IF NOT EXISTS idx_word_counts_correct_count ON word_counts (correct_count, word_id);
+CREATE INDEX IF NOT EXISTS idx_word_counts_wrong_count ON word_counts (wrong_count, word_id);
+
+CREATE TRIGGER IF NOT EXISTS trg_word_counts_word_insert AFTER INSERT ON words
+BEGIN
+  INSERT OR IGNORE INTO word_counts (word_id) VALUES (NEW.id);
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_word_counts_word_delete AFTER DELETE ON words
+BEGIN
+  DELETE FROM word_counts WHERE word_id = OLD.id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_word_counts_reviews_insert AFTER INSERT ON word_reviews
+BEGIN
+  UPDATE word_counts SET correct_count = NEW.correct_count, wrong_count = NEW.wrong_count
+  WHERE word_id = NEW.word_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_word_counts_reviews_update AFTER UPDATE OF correct_count, wrong_count ON word_reviews
+BEGIN
+  UPDATE word_counts SET correct_count = NEW.correct_count, wrong_count = NEW.wrong_count
+  WHERE word_id = NEW.word_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_word_counts_reviews_delete AFTER DELETE ON word_reviews
+BEGIN
+  UPDATE word_counts SET correct_count = 0, wrong_count = 0 WHERE word_id = OLD.word_id;
+END;
+
+-- rebuild: word_counts
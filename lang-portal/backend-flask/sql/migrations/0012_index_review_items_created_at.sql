@@ -0,0 +1,3 @@
+-- Incremental exports (GET /export/review_items?since=) read the review items
+-- created since a point in time; this makes that a range of one index
+CREATE INDEX IF NOT EXISTS idx_word_review_items_created_at_id ON word_review_items (created_at, id);
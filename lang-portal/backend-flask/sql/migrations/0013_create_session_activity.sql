@@ -0,0 +1,45 @@
+-- Time of each session's most recent review, so session listings join one
+-- row per session instead of running MAX(created_at) over its reviews for
+-- every session listed. Sessions without reviews have no row. Kept in step
+-- by the triggers below; sql/rebuild/session_activity.sql recomputes it.
+CREATE TABLE IF NOT EXISTS session_activity (
+  study_session_id INTEGER PRIMARY KEY,
+  last_activity_at TIMESTAMP NOT NULL,
+  FOREIGN KEY (study_session_id) REFERENCES study_sessions(id)
+);
+
+CREATE TRIGGER IF NOT EXISTS trg_session_activity_review_insert AFTER INSERT ON word_review_items
+BEGIN
+  INSERT INTO session_activity (study_session_id, last_activity_at) VALUES (NEW.study_session_id, NEW.created_at)
+    ON CONFLICT (study_session_id) DO UPDATE SET last_activity_at = MAX(last_activity_at, excluded.last_activity_at);
+END;
+
+-- The latest remaining review is one seek on (study_session_id, created_at);
+-- a session left without reviews gets no row back
+CREATE TRIGGER IF NOT EXISTS trg_session_activity_review_delete AFTER DELETE ON word_review_items
+BEGIN
+  DELETE FROM session_activity WHERE study_session_id = OLD.study_session_id;
+  INSERT INTO session_activity (study_session_id, last_activity_at)
+  SELECT study_session_id, MAX(created_at)
+  FROM word_review_items
+  WHERE study_session_id = OLD.study_session_id
+  GROUP BY study_session_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_session_activity_review_update
+AFTER UPDATE OF study_session_id, created_at ON word_review_items
+BEGIN
+  DELETE FROM session_activity WHERE study_session_id IN (OLD.study_session_id, NEW.study_session_id);
+  INSERT INTO session_activity (study_session_id, last_activity_at)
+  SELECT study_session_id, MAX(created_at)
+  FROM word_review_items
+  WHERE study_session_id IN (OLD.study_session_id, NEW.study_session_id)
+  GROUP BY study_session_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_session_activity_session_delete AFTER DELETE ON study_sessions
+BEGIN
+  DELETE FROM session_activity WHERE study_session_id = OLD.id;
+END;
+
+-- rebuild: session_activity
@@ -0,0 +1,104 @@
+-- Rollup rows across groups and activities. Distinct words can't be added
+-- up across rows (a word studied in two groups would count twice), so every
+-- period also gets rows for all groups (group_id 0), all activities
+-- (study_activity_id 0) and both, each with its own word set. A timeseries
+-- then reads exactly one row per period whatever it is filtered on.
+-- Replaces the triggers of 0008; the rows themselves are recomputed below.
+DROP TRIGGER IF EXISTS trg_study_rollups_sessions_insert;
+DROP TRIGGER IF EXISTS trg_study_rollups_sessions_delete;
+DROP TRIGGER IF EXISTS trg_study_rollups_reviews_insert;
+DROP TRIGGER IF EXISTS trg_study_rollups_reviews_delete;
+
+-- Each session and review counts in four rows per period: its own group and
+-- activity, either one across the other, and the total
+CREATE TRIGGER IF NOT EXISTS trg_study_rollups_sessions_insert AFTER INSERT ON study_sessions
+BEGIN
+  INSERT INTO study_rollups (granularity, period_start, group_id, study_activity_id, sessions)
+  SELECT p.granularity, p.period_start, k.group_id, k.study_activity_id, 1
+  FROM (
+    SELECT 'day' AS granularity, date(NEW.created_at) AS period_start
+    UNION ALL
+    SELECT 'week', date(NEW.created_at, 'weekday 0', '-6 days')
+  ) p, (
+    SELECT NEW.group_id AS group_id, NEW.study_activity_id AS study_activity_id
+    UNION ALL SELECT 0, NEW.study_activity_id
+    UNION ALL SELECT NEW.group_id, 0
+    UNION ALL SELECT 0, 0
+  ) k
+  WHERE true
+  ON CONFLICT (granularity, period_start, group_id, study_activity_id) DO UPDATE SET sessions = sessions + 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS trg_study_rollups_sessions_delete AFTER DELETE ON study_sessions
+BEGIN
+  UPDATE study_rollups SET sessions = sessions - 1
+  WHERE group_id IN (OLD.group_id, 0) AND study_activity_id IN (OLD.study_activity_id, 0)
+    AND (
+      (granularity = 'day' AND period_start = date(OLD.created_at))
+      OR (granularity = 'week' AND period_start = date(OLD.created_at, 'weekday 0', '-6 days'))
+    );
+END;
+
+-- Reviews are attributed to their session's group and activity
+CREATE TRIGGER IF NOT EXISTS trg_study_rollups_reviews_insert AFTER INSERT ON word_review_items
+BEGIN
+  INSERT INTO study_rollups (granularity, period_start, group_id, study_activity_id, reviews, correct, wrong, words)
+  SELECT
+    p.granularity, p.period_start, k.group_id, k.study_activity_id,
+    1, NEW.correct = 1, NEW.correct = 0,
+    NOT EXISTS (
+      SELECT 1 FROM study_rollup_words w
+      WHERE w.granularity = p.granularity AND w.period_start = p.period_start
+        AND w.group_id = k.group_id AND w.study_activity_id = k.study_activity_id
+        AND w.word_id = NEW.word_id
+    )
+  FROM (
+    SELECT group_id, study_activity_id FROM study_sessions WHERE id = NEW.study_session_id
+    UNION ALL SELECT 0, study_activity_id FROM study_sessions WHERE id = NEW.study_session_id
+    UNION ALL SELECT group_id, 0 FROM study_sessions WHERE id = NEW.study_session_id
+    UNION ALL SELECT 0, 0 FROM study_sessions WHERE id = NEW.study_session_id
+  ) k, (
+    SELECT 'day' AS granularity, date(NEW.created_at) AS period_start
+    UNION ALL
+    SELECT 'week', date(NEW.created_at, 'weekday 0', '-6 days')
+  ) p
+  WHERE true
+  ON CONFLICT (granularity, period_start, group_id, study_activity_id) DO UPDATE SET
+    reviews = reviews + 1,
+    correct = correct + excluded.correct,
+    wrong = wrong + excluded.wrong,
+    words = words + excluded.words;
+
+  INSERT OR IGNORE INTO study_rollup_words (granularity, period_start, group_id, study_activity_id, word_id)
+  SELECT p.granularity, p.period_start, k.group_id, k.study_activity_id, NEW.word_id
+  FROM (
+    SELECT group_id, study_activity_id FROM study_sessions WHERE id = NEW.study_session_id
+    UNION ALL SELECT 0, study_activity_id FROM study_sessions WHERE id = NEW.study_session_id
+    UNION ALL SELECT group_id, 0 FROM study_sessions WHERE id = NEW.study_session_id
+    UNION ALL SELECT 0, 0 FROM study_sessions WHERE id = NEW.study_session_id
+  ) k, (
+    SELECT 'day' AS granularity, date(NEW.created_at) AS period_start
+    UNION ALL
+    SELECT 'week', date(NEW.created_at, 'weekday 0', '-6 days')
+  ) p;
+END;
+
+-- As in 0008, `words` only drops when the row has no reviews left
+CREATE TRIGGER IF NOT EXISTS trg_study_rollups_reviews_delete AFTER DELETE ON word_review_items
+BEGIN
+  UPDATE study_rollups SET
+    reviews = reviews - 1,
+    correct = correct - (OLD.correct = 1),
+    wrong = wrong - (OLD.correct = 0),
+    words = CASE WHEN reviews <= 1 THEN 0 ELSE words END
+  FROM study_sessions s, (
+    SELECT 'day' AS granularity, date(OLD.created_at) AS period_start
+    UNION ALL
+    SELECT 'week', date(OLD.created_at, 'weekday 0', '-6 days')
+  ) p
+  WHERE s.id = OLD.study_session_id
+    AND study_rollups.granularity = p.granularity AND study_rollups.period_start = p.period_start
+    AND study_rollups.group_id IN (s.group_id, 0) AND study_rollups.study_activity_id IN (s.study_activity_id, 0);
+END;
+
+-- rebuild: study_rollups
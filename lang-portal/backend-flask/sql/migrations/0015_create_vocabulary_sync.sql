@@ -0,0 +1,9 @@
+-- Learner databases (see Db.create_learner) carry their own copy of the
+-- shared vocabulary. This records the shared database's 'vocabulary' and
+-- 'activities' cache generations (0005) as of the last time the copy was
+-- brought up to date, so Db.sync_learner knows when there is something new.
+-- It stays empty in the shared database.
+CREATE TABLE IF NOT EXISTS vocabulary_sync (
+  scope TEXT PRIMARY KEY,
+  generation INTEGER NOT NULL
+) WITHOUT ROWID;
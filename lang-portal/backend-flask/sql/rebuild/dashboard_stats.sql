@@ -0,0 +1,36 @@
+-- Recompute the dashboard snapshot from the base tables
+DELETE FROM dashboard_daily_sessions;
+INSERT INTO dashboard_daily_sessions (study_date, group_id, sessions_count)
+SELECT date(created_at), group_id, COUNT(*)
+FROM study_sessions
+GROUP BY date(created_at), group_id;
+
+INSERT OR REPLACE INTO dashboard_stats (
+  id, total_vocabulary, total_words_studied, mastered_words,
+  correct_count, wrong_count, total_sessions, last_study_date, current_streak
+)
+SELECT
+  1,
+  (SELECT COUNT(*) FROM words),
+  (SELECT COUNT(*) FROM word_reviews WHERE correct_count + wrong_count > 0),
+  (
+    SELECT COUNT(*) FROM word_reviews
+    WHERE correct_count + wrong_count >= 5
+      AND correct_count >= 0.8 * (correct_count + wrong_count)
+  ),
+  (SELECT COALESCE(SUM(correct_count), 0) FROM word_reviews),
+  (SELECT COALESCE(SUM(wrong_count), 0) FROM word_reviews),
+  (SELECT COUNT(*) FROM study_sessions),
+  (SELECT MAX(study_date) FROM dashboard_daily_sessions),
+  (
+    -- Days in a consecutive run share julianday(day) - row_number
+    WITH days AS (
+      SELECT DISTINCT study_date FROM dashboard_daily_sessions
+    ),
+    runs AS (
+      SELECT study_date, julianday(study_date) - ROW_NUMBER() OVER (ORDER BY study_date) AS run
+      FROM days
+    )
+    SELECT COUNT(*) FROM runs
+    WHERE run = (SELECT run FROM runs ORDER BY study_date DESC LIMIT 1)
+  );
@@ -0,0 +1,6 @@
+-- Latest review time per session, off the (study_session_id, created_at) index
+DELETE FROM session_activity;
+INSERT INTO session_activity (study_session_id, last_activity_at)
+SELECT study_session_id, MAX(created_at)
+FROM word_review_items
+GROUP BY study_session_id;
@@ -0,0 +1,60 @@
+-- Recompute the day and week rollups of sql/migrations/0008_create_study_rollups.sql,
+-- with the rows across groups and activities (0) of 0014_rollup_totals.sql
+DELETE FROM study_rollups;
+DELETE FROM study_rollup_words;
+
+INSERT INTO study_rollup_words (granularity, period_start, group_id, study_activity_id, word_id)
+SELECT DISTINCT 'day', date(wri.created_at), s.group_id, s.study_activity_id, wri.word_id
+FROM word_review_items wri
+JOIN study_sessions s ON s.id = wri.study_session_id;
+
+INSERT OR IGNORE INTO study_rollup_words (granularity, period_start, group_id, study_activity_id, word_id)
+SELECT 'day', period_start, k.group_id, k.study_activity_id, word_id
+FROM (
+  SELECT period_start, 0 AS group_id, study_activity_id, word_id FROM study_rollup_words
+  UNION ALL SELECT period_start, group_id, 0, word_id FROM study_rollup_words
+  UNION ALL SELECT period_start, 0, 0, word_id FROM study_rollup_words
+) k;
+
+INSERT OR IGNORE INTO study_rollup_words (granularity, period_start, group_id, study_activity_id, word_id)
+SELECT 'week', date(period_start, 'weekday 0', '-6 days'), group_id, study_activity_id, word_id
+FROM study_rollup_words
+WHERE granularity = 'day';
+
+CREATE TEMP TABLE rollup_days AS
+SELECT study_date, group_id, study_activity_id, SUM(sessions) AS sessions, SUM(reviews) AS reviews, SUM(correct) AS correct, SUM(wrong) AS wrong
+FROM (
+  SELECT date(created_at) AS study_date, group_id, study_activity_id, 1 AS sessions, 0 AS reviews, 0 AS correct, 0 AS wrong
+  FROM study_sessions
+  UNION ALL
+  SELECT date(wri.created_at), s.group_id, s.study_activity_id, 0, 1, wri.correct = 1, wri.correct = 0
+  FROM word_review_items wri
+  JOIN study_sessions s ON s.id = wri.study_session_id
+)
+GROUP BY study_date, group_id, study_activity_id;
+
+INSERT INTO rollup_days
+SELECT study_date, 0, study_activity_id, SUM(sessions), SUM(reviews), SUM(correct), SUM(wrong)
+FROM rollup_days GROUP BY study_date, study_activity_id
+UNION ALL
+SELECT study_date, group_id, 0, SUM(sessions), SUM(reviews), SUM(correct), SUM(wrong)
+FROM rollup_days GROUP BY study_date, group_id
+UNION ALL
+SELECT study_date, 0, 0, SUM(sessions), SUM(reviews), SUM(correct), SUM(wrong)
+FROM rollup_days GROUP BY study_date;
+
+INSERT INTO study_rollups (granularity, period_start, group_id, study_activity_id, sessions, reviews, correct, wrong)
+SELECT 'day', study_date, group_id, study_activity_id, sessions, reviews, correct, wrong
+FROM rollup_days
+UNION ALL
+SELECT 'week', date(study_date, 'weekday 0', '-6 days'), group_id, study_activity_id, SUM(sessions), SUM(reviews), SUM(correct), SUM(wrong)
+FROM rollup_days
+GROUP BY 2, 3, 4;
+
+DROP TABLE temp.rollup_days;
+
+UPDATE study_rollups SET words = (
+  SELECT COUNT(*) FROM study_rollup_words w
+  WHERE w.granularity = study_rollups.granularity AND w.period_start = study_rollups.period_start
+    AND w.group_id = study_rollups.group_id AND w.study_activity_id = study_rollups.study_activity_id
+);
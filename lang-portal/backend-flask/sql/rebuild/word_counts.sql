@@ -0,0 +1,6 @@
+-- One row per word with its counts from word_reviews (0 when never reviewed)
+DELETE FROM word_counts;
+INSERT INTO word_counts (word_id, correct_count, wrong_count)
+SELECT w.id, COALESCE(r.correct_count, 0), COALESCE(r.wrong_count, 0)
+FROM words w
+LEFT JOIN word_reviews r ON r.word_id = w.id;
@@ -0,0 +1,45 @@
+-- Replay the review log through the SM-2 rules of
+-- sql/migrations/0007_create_word_schedule.sql, one review per word per step,
+-- in the order the reviews happened
+DROP TABLE IF EXISTS temp.schedule_replay;
+CREATE TEMP TABLE schedule_replay AS
+SELECT
+  word_id,
+  ROW_NUMBER() OVER (PARTITION BY word_id ORDER BY created_at, id) AS n,
+  COUNT(*) OVER (PARTITION BY word_id) AS reviews,
+  correct,
+  created_at
+FROM word_review_items;
+CREATE UNIQUE INDEX temp.idx_schedule_replay ON schedule_replay (word_id, n);
+
+DELETE FROM word_schedule;
+INSERT INTO word_schedule (word_id, ease, interval_days, repetitions, last_reviewed)
+WITH RECURSIVE replay (word_id, n, reviews, ease, interval_days, repetitions, last_reviewed) AS (
+  SELECT word_id, 0, reviews, 2.5, 0, 0, NULL FROM schedule_replay WHERE n = 1
+  UNION ALL
+  SELECT
+    s.word_id,
+    r.n,
+    s.reviews,
+    CASE WHEN r.correct = 1 THEN s.ease ELSE MAX(1.3, s.ease - 0.2) END,
+    CASE
+      WHEN r.correct = 0 OR s.repetitions = 0 THEN 1
+      WHEN s.repetitions = 1 THEN 6
+      ELSE CAST(round(s.interval_days * s.ease) AS INTEGER)
+    END,
+    CASE WHEN r.correct = 1 THEN s.repetitions + 1 ELSE 0 END,
+    r.created_at
+  FROM replay s
+  JOIN schedule_replay r ON r.word_id = s.word_id AND r.n = s.n + 1
+)
+SELECT word_id, ease, interval_days, repetitions, last_reviewed
+FROM replay
+WHERE n = reviews;
+
+DROP TABLE temp.schedule_replay;
+
+DELETE FROM group_due_words;
+INSERT OR IGNORE INTO group_due_words (group_id, word_id, due_at)
+SELECT wg.group_id, wg.word_id, ws.due_at
+FROM word_groups wg
+LEFT JOIN word_schedule ws ON ws.word_id = wg.word_id;
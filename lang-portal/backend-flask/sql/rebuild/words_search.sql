@@ -0,0 +1,11 @@
+-- Re-index every word for search
+INSERT INTO words_fts (words_fts) VALUES ('delete-all');
+INSERT INTO words_trigram (words_trigram) VALUES ('delete-all');
+
+INSERT INTO words_fts (rowid, kanji, romaji, english, parts)
+  SELECT id, kanji, romaji, english, parts FROM words_search_source;
+INSERT INTO words_trigram (rowid, kanji, romaji, english, parts)
+  SELECT id, kanji, romaji, english, parts FROM words_search_source;
+
+INSERT INTO words_fts (words_fts) VALUES ('optimize');
+INSERT INTO words_trigram (words_trigram) VALUES ('optimize');
@@ -0,0 +1,9 @@
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version INTEGER PRIMARY KEY,  -- NNNN of sql/migrations/NNNN_name.sql
+  name TEXT NOT NULL,
+  checksum TEXT NOT NULL,  -- sha256 of the file when it was applied
+  applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  duration_ms REAL,
+  backfill_position INTEGER,  -- Next rowid to backfill
+  backfilled_at TIMESTAMP  -- NULL while an online backfill is unfinished
+);
@@ -4,5 +4,6 @@ CREATE TABLE IF NOT EXISTS word_reviews (
   correct_count INTEGER DEFAULT 0,
   wrong_count INTEGER DEFAULT 0,
   last_reviewed TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+  streak INTEGER DEFAULT 0,  -- Consecutive correct answers since the last wrong one
   FOREIGN KEY (word_id) REFERENCES words(id)
 );
\ No newline at end of file
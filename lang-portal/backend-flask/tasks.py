@@ -1,4 +1,4 @@
-from invoke import task
+from invoke import task, Exit
 from lib.db import db
 
 @task
@@ -6,4 +6,191 @@ def init_db(c):
   from flask import Flask
   app = Flask(__name__)
   db.init(app)
-  print("Database initialized successfully.")
\ No newline at end of file
+  print("Database initialized successfully.")
+
+@task
+def backup(c, target, database='words.db'):
+  from lib import backups
+  backups.backup(database, target)
+  print(f"Backed up {database} to {target}.")
+
+@task
+def snapshot(c, database='words.db', directory='backups', label='manual', keep=None):
+  from lib import backups
+  path = backups.snapshot(database, directory, label=label, keep=int(keep) if keep else None)
+  print(f"Saved snapshot {path}.")
+
+@task
+def snapshots(c, database='words.db', directory='backups'):
+  from lib import backups
+  for path in backups.snapshots(directory, database):
+    print(path)
+
+@task
+def restore(c, source, database='words.db', snapshot_first=True, directory='backups'):
+  import os
+  from lib import backups
+  if snapshot_first and os.path.exists(database):
+    print(f"Saved snapshot {backups.snapshot(database, directory, label='restore')}.")
+  try:
+    backups.restore(source, database)
+  except backups.InvalidBackup as e:
+    raise Exit(str(e), code=1)
+  print(f"Restored {database} from {source}.")
+
+@task
+def clear_history(c, database='words.db', batch_size=2000, pause=0.0):
+  from lib.db import Db
+  target = Db(database=database)
+  try:
+    sessions = target.clear_history_in_batches(batch_size=batch_size, pause=pause)
+  finally:
+    target.dispose()
+  print(f"Deleted {sessions} study sessions and their review items.")
+
+@task
+def replicate(c, replica='words-replica.db', database='words.db', interval=30.0, once=False):
+  import time
+  from lib import backups
+  while True:
+    started = time.perf_counter()
+    backups.refresh(database, replica)
+    print(f"Refreshed {replica} from {database} ({(time.perf_counter() - started) * 1000:.0f}ms).")
+    if once:
+      break
+    time.sleep(interval)
+
+def print_migration_plan(plan):
+  for migration in plan['pending']:
+    backfill = f" + online backfill of {migration.backfill_table}" if migration.backfill_sql else ''
+    rebuilds = f" + rebuild {', '.join(migration.rebuilds)}" if migration.rebuilds else ''
+    print(f"pending      {migration.filename}{rebuilds}{backfill}")
+  for migration in plan['backfilling']:
+    print(f"backfilling  {migration.filename} ({migration.backfill_table})")
+  if not plan['pending'] and not plan['backfilling']:
+    print("Database is up to date.")
+
+def migrate_database(target, dry_run=False, pause=0.0):
+  if dry_run:
+    print_migration_plan(target.migration_plan())
+  else:
+    plan = target.migrate(pause=pause, log=print)
+    print("Migrations applied successfully." if plan['pending'] or plan['backfilling'] else "Database is up to date.")
+  for migration in target.migration_plan()['changed']:
+    print(f"WARNING {migration.filename} changed after it was applied; add a new migration instead")
+
+@task
+def migrate(c, dry_run=False, pause=0.0, database=None, learners_dir=None):
+  from lib.db import Db
+  target = Db(database=database) if database else db
+  migrate_database(target, dry_run=dry_run, pause=pause)
+  # Then every learner's database (new learners are copied from the migrated one)
+  if learners_dir:
+    learners = Db(learners_dir=learners_dir)
+    for learner in learners.learners():
+      print(f"{learner}:")
+      learner_db = Db(database=learners.learner_database(learner))
+      try:
+        migrate_database(learner_db, dry_run=dry_run, pause=pause)
+      finally:
+        learner_db.dispose()
+
+@task
+def import_words(c, path, group, format=None, learners_dir=None):
+  from lib import importer
+  with db.transaction() as cursor:
+    stats = importer.import_words(cursor, path, group, format=format)
+  print(f"Imported {path} into '{group}': {stats}")
+  # Then every learner's copy of the vocabulary
+  if learners_dir:
+    from lib.db import Db
+    learners = Db(database=db.database, learners_dir=learners_dir)
+    try:
+      for learner in learners.sync_learners():
+        print(f"Synced vocabulary to {learner}.")
+    finally:
+      learners.dispose()
+
+@task
+def rebuild(c, name):
+  with db.transaction() as cursor:
+    db.rebuild(cursor, name)
+  print(f"Rebuilt {name} from sql/rebuild/{name}.sql.")
+
+@task
+def synthetic_db(c, database='synthetic.db', words=20000, groups=50, sessions=50000, reviews=1000000):
+  from lib import synthetic
+  synthetic.generate(database, words=words, groups=groups, sessions=sessions, reviews=reviews)
+  print(f"Generated {database} with {words} words, {sessions} sessions and {reviews} review items.")
+
+@task
+def check_query_plans(c, database='synthetic.db', words=20000, sessions=50000, reviews=1000000):
+  from lib import synthetic, query_plans
+  from app import create_app
+  synthetic.generate(database, words=words, sessions=sessions, reviews=reviews)
+  app = create_app({'DATABASE': database})
+  failures = query_plans.check(app)
+  for path, table, sql, plan in failures:
+    print(f"{path}: full scan of {table}")
+    print(f"  {' '.join(sql.split())}")
+    for detail in plan:
+      print(f"    {detail}")
+  if failures:
+    raise Exit(f"{len(failures)} hot queries fall back to a full table scan", code=1)
+  print(f"All {len(query_plans.HOT_ROUTES)} hot routes use indexes.")
+
+@task
+def benchmark(c, database='benchmark.db', words=20000, groups=50, sessions=50000, reviews=1000000,
+              requests=200, concurrency=16, server=True, baseline='benchmark_baseline.json',
+              save=False, tolerance=0.25):
+  import os
+  from lib import synthetic, benchmark as bench
+  from app import create_app
+  synthetic.generate(database, words=words, groups=groups, sessions=sessions, reviews=reviews)
+  app = create_app({'DATABASE': database})
+  results = bench.run(app, requests=requests, concurrency=concurrency, server=server)
+  print(bench.report(results))
+  if save:
+    bench.save_baseline(results, baseline)
+    print(f"Saved baseline to {baseline}")
+  elif os.path.exists(baseline):
+    regressions = bench.compare(results, baseline, tolerance=tolerance)
+    for regression in regressions:
+      print(f"REGRESSION {regression}")
+    if regressions:
+      raise Exit(f"{len(regressions)} endpoints regressed against {baseline}", code=1)
+    print(f"No regressions against {baseline}")
+
+@task
+def benchmark_asgi(c, database='benchmark.db', words=20000, groups=50, sessions=50000, reviews=1000000,
+                   requests=5000, concurrency=500, generate=True):
+  from lib import synthetic, benchmark as bench
+  if generate:
+    synthetic.generate(database, words=words, groups=groups, sessions=sessions, reviews=reviews)
+  results = bench.compare_servers(database, requests=requests, concurrency=concurrency)
+  print(bench.report_servers(results))
+
+@task
+def benchmark_startup(c, database='words.db', runs=10, baseline='startup_baseline.json', save=False, tolerance=0.25):
+  import os
+  from lib import benchmark as bench
+  result = bench.bench_startup(database, runs=runs)
+  print(bench.report_startup(result))
+  if save:
+    bench.save_baseline(result, baseline)
+    print(f"Saved baseline to {baseline}")
+  elif os.path.exists(baseline):
+    regressions = bench.compare_startup(result, baseline, tolerance=tolerance)
+    for regression in regressions:
+      print(f"REGRESSION {regression}")
+    if regressions:
+      raise Exit(f"Startup regressed against {baseline}", code=1)
+    print(f"No startup regressions against {baseline}")
+
+@task
+def benchmark_json(c, database='benchmark.db', words=20000, groups=50, sessions=50000, reviews=1000000,
+                   requests=500, generate=True):
+  from lib import synthetic, benchmark as bench
+  if generate:
+    synthetic.generate(database, words=words, groups=groups, sessions=sessions, reviews=reviews)
+  print(bench.report_serialization(bench.bench_serialization(database, requests=requests)))
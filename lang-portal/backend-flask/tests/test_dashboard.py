@@ -0,0 +1,27 @@
+import sqlite3
+
+import pytest
+
+# A word reviewed in several groups or activities in a week counts once
+@pytest.mark.parametrize('filters, where', [
+  ('', ''),
+  ('&group_id=3', 'AND s.group_id = 3'),
+  ('&study_activity_id=2', 'AND s.study_activity_id = 2'),
+  ('&group_id=3&study_activity_id=2', 'AND s.group_id = 3 AND s.study_activity_id = 2'),
+])
+def test_timeseries_counts_distinct_words(app, synthetic_database, filters, where):
+  response = app.test_client().get('/dashboard/timeseries?granularity=week' + filters)
+  assert response.status_code == 200
+  series = response.get_json()['series']
+  connection = sqlite3.connect(synthetic_database)
+  try:
+    for entry in series:
+      words, reviews = connection.execute(f'''
+        SELECT COUNT(DISTINCT wri.word_id), COUNT(*)
+        FROM word_review_items wri
+        JOIN study_sessions s ON s.id = wri.study_session_id
+        WHERE date(wri.created_at) BETWEEN ? AND date(?, '+6 days') {where}
+      ''', (entry['date'], entry['date'])).fetchone()
+      assert (entry['words'], entry['reviews']) == (words, reviews)
+  finally:
+    connection.close()
@@ -0,0 +1,32 @@
+import json
+
+from lib import query_plans
+from lib.query_plans import explain, sorts
+
+def rows(app, url):
+  response = app.test_client().get(url)
+  assert response.status_code == 200
+  return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+def test_since_export_is_in_created_at_order(app):
+  items = rows(app, '/export/review_items?since=2000-01-01')
+  assert items
+  assert [(item['created_at'], item['id']) for item in items] == sorted((item['created_at'], item['id']) for item in items)
+
+# since plus after_id resume after the last row received, ties included
+def test_since_export_resumes_after_a_row(app):
+  items = rows(app, '/export/review_items?since=2000-01-01')
+  last = items[len(items) // 2]
+  rest = rows(app, f"/export/review_items?since={last['created_at']}&after_id={last['id']}")
+  assert rest == items[len(items) // 2 + 1:]
+
+def test_since_export_streams_off_the_index(app):
+  for path in ('/export/review_items?since=2000-01-01', '/export/sessions?since=2000-01-01&after_id=5'):
+    response, statements = query_plans.capture(app, path)
+    assert response.status_code == 200
+    with app.app_context():
+      connection = app.db.get()
+      for sql in statements:
+        plan = explain(connection, sql)
+        assert not sorts(plan), plan
+        assert not query_plans.full_scans(plan, sql), plan
@@ -0,0 +1,52 @@
+import json
+import shutil
+
+import pytest
+
+from conftest import backend_cwd
+
+@pytest.fixture
+def make_app(synthetic_database, tmp_path):
+  from app import create_app
+  database = str(tmp_path / 'words.db')
+  shutil.copy(synthetic_database, database)
+  apps = []
+  def make(**config):
+    with backend_cwd():
+      apps.append(create_app({
+        'DATABASE': database, 'LEARNERS_DIR': str(tmp_path / 'learners'), 'RESPONSE_CACHE_SIZE': 0, **config
+      }))
+    return apps[-1]
+  yield make
+  for app in apps:
+    app.db.dispose()
+
+def test_requests_without_a_learner_use_the_default(make_app, tmp_path):
+  client = make_app(DEFAULT_LEARNER='default').test_client()
+  assert client.get('/groups').status_code == 200
+  assert (tmp_path / 'learners' / 'default.db').exists()
+
+def test_learner_header_required_without_a_default(make_app):
+  client = make_app(DEFAULT_LEARNER='').test_client()
+  assert client.get('/groups').status_code == 400
+  assert client.get('/groups', headers={'X-Learner': 'alice'}).status_code == 200
+
+# Words imported into the shared database reach learners created before
+def test_imports_reach_existing_learners(make_app, tmp_path):
+  from lib import importer
+  app = make_app()
+  client = app.test_client()
+  alice = {'X-Learner': 'alice'}
+  total_words = client.get('/words', headers=alice).get_json()['total_words']
+
+  path = tmp_path / 'nouns.jsonl'
+  path.write_text(json.dumps({'kanji': '猫', 'romaji': 'neko', 'english': 'cat', 'parts': []}) + '\n', encoding='utf-8')
+  with backend_cwd(), app.app_context():
+    with app.db.transaction() as cursor:
+      importer.import_words(cursor, str(path), 'Core Nouns')
+    assert app.db.sync_learners() == ['alice']
+    assert app.db.sync_learners() == []
+
+  assert client.get('/words', headers=alice).get_json()['total_words'] == total_words + 1
+  words = client.get('/words/search?q=neko', headers=alice).get_json()['words']
+  assert (words[0]['english'], words[0]['match']) == ('cat', 'exact')
@@ -0,0 +1,87 @@
+import sqlite3
+
+import pytest
+
+from lib.pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_clause, keyset_seeks, next_page
+
+def test_cursor_round_trip():
+  token = encode_cursor('romaji', 'desc', ['taberu', 42])
+  assert '=' not in token
+  assert decode_cursor(token, 'romaji', 'desc') == ['taberu', 42]
+
+@pytest.mark.parametrize('token', ['', 'not a cursor', encode_cursor('romaji', 'asc', ['a'])])
+def test_invalid_cursor(token):
+  with pytest.raises(InvalidCursor):
+    decode_cursor(token, 'romaji', 'asc')
+
+def test_cursor_for_another_sort():
+  token = encode_cursor('romaji', 'asc', ['a', 1])
+  with pytest.raises(InvalidCursor):
+    decode_cursor(token, 'kanji', 'asc')
+  with pytest.raises(InvalidCursor):
+    decode_cursor(token, 'romaji', 'desc')
+
+def test_keyset_clause():
+  assert keyset_clause('w.kanji', 'w.id', 'asc') == '(w.kanji, w.id) > (?, ?)'
+  assert keyset_clause('w.kanji', 'w.id', 'desc') == '(w.kanji, w.id) < (?, ?)'
+
+def test_keyset_seeks():
+  assert keyset_seeks('c.correct_count', 'c.word_id', 'asc', [3, 10]) == [
+    ('c.correct_count = ? AND c.word_id > ?', [3, 10]),
+    ('c.correct_count > ?', [3]),
+  ]
+  assert keyset_seeks('c.correct_count', 'c.word_id', 'desc', [3, 10]) == [
+    ('c.correct_count = ? AND c.word_id < ?', [3, 10]),
+    ('c.correct_count < ?', [3]),
+  ]
+
+def test_next_page_last_page():
+  rows = [{'id': 1}, {'id': 2}]
+  assert next_page(rows, 2, 'id', 'asc', key=lambda row: (row['id'], row['id'])) == (rows, None)
+
+def test_next_page_trims_look_ahead_row():
+  rows = [{'id': 1, 'kanji': 'a'}, {'id': 2, 'kanji': 'b'}, {'id': 3, 'kanji': 'c'}]
+  page, cursor = next_page(rows, 2, 'kanji', 'asc', key=lambda row: (row['kanji'], row['id']))
+  assert page == rows[:2]
+  assert decode_cursor(cursor, 'kanji', 'asc') == ['b', 2]
+
+# Following next_cursor through /words visits every word once, in the order
+# of the sort, including through long runs of equal review counts
+@pytest.mark.parametrize('sort_by', ['kanji', 'correct_count', 'wrong_count'])
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_words_cursor_pages(app, synthetic_database, sort_by, order):
+  connection = sqlite3.connect(synthetic_database)
+  try:
+    column = 'w.kanji' if sort_by == 'kanji' else f'COALESCE(r.{sort_by}, 0)'
+    expected = [row[0] for row in connection.execute(f'''
+      SELECT w.id FROM words w LEFT JOIN word_reviews r ON r.word_id = w.id
+      ORDER BY {column} {order}, w.id {order}
+    ''')]
+  finally:
+    connection.close()
+
+  client = app.test_client()
+  seen = []
+  url = f'/words?sort_by={sort_by}&order={order}'
+  page = client.get(url).get_json()
+  while True:
+    seen += [word['id'] for word in page['words']]
+    if not page['next_cursor']:
+      break
+    page = client.get(f"{url}&cursor={page['next_cursor']}").get_json()
+  assert seen == expected
+
+@pytest.mark.parametrize('per_page, expected', [(0, 1), (-5, 1), (1000, 100)])
+def test_per_page_is_clamped(app, per_page, expected):
+  response = app.test_client().get(f'/api/study-sessions?per_page={per_page}')
+  assert response.status_code == 200
+  assert response.get_json()['per_page'] == expected
+  assert len(response.get_json()['items']) == expected
+
+def test_cursor_pages_have_no_page_number(app):
+  client = app.test_client()
+  first = client.get('/api/study-sessions').get_json()
+  assert first['page'] == 1
+  second = client.get(f"/api/study-sessions?cursor={first['next_cursor']}").get_json()
+  assert 'page' not in second
+  assert second['items'][0]['id'] != first['items'][0]['id']
@@ -0,0 +1,37 @@
+from lib import query_plans
+from lib.query_plans import full_scans, sorts
+
+def test_table_scan():
+  assert full_scans(['SCAN w']) == ['w']
+
+def test_search_is_not_a_scan():
+  plan = ['SEARCH w USING INDEX idx_words_kanji (kanji>?)', 'SEARCH c USING INTEGER PRIMARY KEY (rowid=?)']
+  assert full_scans(plan, 'SELECT ... LIMIT ?') == []
+
+def test_full_index_scan():
+  plan = ['SCAN w USING COVERING INDEX idx_words_english', 'USE TEMP B-TREE FOR ORDER BY']
+  assert sorts(plan)
+  assert full_scans(plan, 'SELECT ... ORDER BY x LIMIT ?') == ['w']
+
+def test_ordered_page_off_an_index():
+  plan = ['SCAN w USING COVERING INDEX idx_words_kanji', 'SEARCH c USING INTEGER PRIMARY KEY (rowid=?)']
+  assert not sorts(plan)
+  assert full_scans(plan, 'SELECT ... ORDER BY w.kanji LIMIT ?') == []
+  # Without a LIMIT the walk reads the whole index
+  assert full_scans(plan, 'SELECT ... ORDER BY w.kanji') == ['w']
+
+def test_inner_index_scan():
+  plan = ['SEARCH s USING INDEX idx (id=?)', 'SCAN w USING INDEX idx_words_kanji']
+  assert full_scans(plan, 'SELECT ... LIMIT ?') == ['w']
+
+def test_virtual_tables_are_not_scans():
+  assert full_scans(['SCAN words_fts VIRTUAL TABLE INDEX 0:M1', 'SCAN CONSTANT ROW']) == []
+
+def test_partial_sort():
+  assert sorts(['SCAN c USING COVERING INDEX idx', 'USE TEMP B-TREE FOR RIGHT PART OF ORDER BY'])
+  assert not sorts(['SEARCH wri USING INDEX idx (study_session_id=?)', 'USE TEMP B-TREE FOR GROUP BY'])
+
+# The same check as `invoke check-query-plans`, on a smaller database
+def test_hot_routes_use_indexes(app):
+  failures = query_plans.check(app)
+  assert failures == [], '\n'.join(f"{path}: {table}\n  {' '.join(sql.split())}\n  {plan}" for path, table, sql, plan in failures)
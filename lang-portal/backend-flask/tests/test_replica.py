@@ -0,0 +1,36 @@
+import shutil
+import threading
+
+from conftest import backend_cwd
+
+def test_replica_is_copied_outside_the_pool_lock(synthetic_database, tmp_path, monkeypatch):
+  from app import create_app
+  from lib import db as db_module
+  database = str(tmp_path / 'words.db')
+  shutil.copy(synthetic_database, database)
+  with backend_cwd():
+    app = create_app({'DATABASE': database, 'REPLICA_DATABASE': str(tmp_path / 'replica.db'), 'RESPONSE_CACHE_SIZE': 0})
+  copying, release, copied = threading.Event(), threading.Event(), threading.Event()
+  refresh = db_module.backups.refresh
+  def slow_refresh(source, target):
+    copying.set()
+    release.wait(10)
+    refresh(source, target)
+    copied.set()
+  monkeypatch.setattr(db_module.backups, 'refresh', slow_refresh)
+  try:
+    client = app.test_client()
+    dashboard = threading.Thread(target=lambda: client.get('/dashboard/stats'))
+    dashboard.start()
+    assert copying.wait(10)
+    # Routes on the primary don't wait for the first copy of the replica
+    assert client.get('/groups').status_code == 200
+    assert not copied.is_set()
+    release.set()
+    dashboard.join(10)
+    assert app.db._replica_pool is not None
+    # Nothing refreshes it in the background unless REPLICA_REFRESH is set
+    assert app.db._replicator is None
+  finally:
+    release.set()
+    app.db.dispose()
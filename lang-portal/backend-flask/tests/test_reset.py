@@ -0,0 +1,70 @@
+import shutil
+import sqlite3
+import time
+
+import pytest
+
+from conftest import backend_cwd
+
+@pytest.fixture
+def make_app(synthetic_database, tmp_path):
+  from app import create_app
+  apps = []
+  def make(**config):
+    database = str(tmp_path / 'words.db')
+    shutil.copy(synthetic_database, database)
+    with backend_cwd():
+      apps.append(create_app({'DATABASE': database, **config}))
+    return apps[-1]
+  yield make
+  for app in apps:
+    app.db.dispose()
+
+@pytest.fixture
+def reset_app(make_app, tmp_path):
+  return make_app(BACKUPS_DIR=str(tmp_path / 'backups'), BACKUPS_KEEP=2)
+
+def wait_for(client, url, timeout=60):
+  deadline = time.monotonic() + timeout
+  while True:
+    job = client.get(url).get_json()
+    if job['status'] != 'running' or time.monotonic() > deadline:
+      return job
+    time.sleep(0.05)
+
+# The reset answers at once and finishes in the background
+def test_reset_runs_as_a_job(reset_app):
+  client = reset_app.test_client()
+  response = client.post('/api/study-sessions/reset')
+  assert response.status_code == 202
+  started = response.get_json()
+  assert started['status'] in ('running', 'done')
+
+  job = wait_for(client, started['status_url'])
+  assert job['status'] == 'done', job['error']
+  assert job['result']['sessions_deleted'] == 2000
+
+  connection = sqlite3.connect(reset_app.config['DATABASE'])
+  try:
+    assert connection.execute('SELECT COUNT(*) FROM word_review_items').fetchone()[0] == 0
+    assert connection.execute('SELECT COUNT(*) FROM study_sessions').fetchone()[0] == 0
+  finally:
+    connection.close()
+
+  # The archive still has the history
+  archive = sqlite3.connect(job['result']['archive'])
+  try:
+    assert archive.execute('SELECT COUNT(*) FROM study_sessions').fetchone()[0] == 2000
+  finally:
+    archive.close()
+
+def test_unknown_reset(reset_app):
+  assert reset_app.test_client().get('/api/study-sessions/reset/nope').status_code == 404
+
+# Without BACKUPS_DIR nothing is archived
+def test_reset_without_archive(make_app, tmp_path):
+  client = make_app().test_client()
+  job = wait_for(client, client.post('/api/study-sessions/reset').get_json()['status_url'])
+  assert job['status'] == 'done', job['error']
+  assert job['result']['archive'] is None
+  assert not (tmp_path / 'backups').exists()
@@ -0,0 +1,22 @@
+import difflib
+
+from lib.search import min_similarity, similarity
+
+def score(query, text):
+  return similarity(difflib.SequenceMatcher(None, b=query), text)
+
+def test_short_query_needs_a_near_identical_word():
+  assert score('eat', 'great') >= 0.75
+  assert score('eat', 'great') < min_similarity('eat')
+  assert score('eat', 'to eats') >= min_similarity('eat')
+  assert score('ikku', 'iku') >= min_similarity('ikku')
+
+def test_longer_query_tolerates_typos():
+  assert score('mountian', 'mountain') >= min_similarity('mountian')
+  assert score('exercize', 'to exercise') >= min_similarity('exercize')
+
+def test_fuzzy_search(app):
+  response = app.test_client().get('/words/search?q=mountian')
+  words = response.get_json()['words']
+  assert words
+  assert all(word['match'] == 'fuzzy' and 'mountain' in word['english'] for word in words)
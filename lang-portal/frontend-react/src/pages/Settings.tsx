@@ -24,8 +24,8 @@ export default function Settings() {
         setShowResetDialog(false);
         setResetConfirmation('');
         
-        // Show success message
-        alert('Study history has been cleared successfully');
+        // The backend clears the history in the background
+        alert('Clearing study history has started');
       } catch (error) {
         console.error('Error resetting history:', error);
         alert('Failed to reset history. Please try again.');
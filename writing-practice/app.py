@@ -6,6 +6,7 @@ from typing import Optional, List, Dict
 import openai
 import logging
 import random
+from vocabulary import load_group_vocabulary
 
 # Setup Custom Logging -----------------------
 # Create a custom logger for your app only
@@ -62,25 +63,13 @@ class JapaneseLearningApp:
                 self.vocabulary = None
                 return
                 
-            # Make API request with the actual group_id
-            url = f'http://localhost:5000/api/groups/{group_id}/words/raw'
-            logger.debug(url)
-            response = requests.get(url)
-            logger.debug(f"Response status: {response.status_code}")
-            
-            # Check if response is successful and contains data
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    logger.debug(f"Received data for group: {data.get('group_name', 'unknown')}") 
-                    self.vocabulary = data
-                except requests.exceptions.JSONDecodeError as e:
-                    logger.error(f"JSON decode error: {e}")
-                    st.error(f"Invalid JSON response from API: {response.text}")
-                    self.vocabulary = None
+            # Cached on disk and revalidated against the API's snapshot
+            data = load_group_vocabulary(group_id)
+            if data is not None:
+                logger.debug(f"Received data for group: {data.get('group_name', 'unknown')}")
+                self.vocabulary = data
             else:
-                logger.error(f"API request failed: {response.status_code}")
-                st.error(f"API request failed with status code: {response.status_code}")
+                st.error(f"Failed to load vocabulary of group {group_id}")
                 self.vocabulary = None
         except Exception as e:
             logger.error(f"Failed to load vocabulary: {e}")
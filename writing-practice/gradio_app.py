@@ -7,6 +7,7 @@ from openai import OpenAI
 import os
 import dotenv
 import yaml
+from vocabulary import load_group_vocabulary
 
 dotenv.load_dotenv()
 
@@ -38,15 +39,13 @@ class JapaneseWritingApp:
         try:
             # Get group_id from environment variable or use default
             group_id = os.getenv('GROUP_ID', '1')
-            url = f"http://localhost:5000/api/groups/{group_id}/words/raw"
-            logger.debug(f"Fetching vocabulary from: {url}")
-            
-            response = requests.get(url)
-            if response.status_code == 200:
-                self.vocabulary = response.json()
+            # Cached on disk and revalidated against the API's snapshot
+            vocabulary = load_group_vocabulary(group_id)
+            if vocabulary is not None:
+                self.vocabulary = vocabulary
                 logger.info(f"Loaded {len(self.vocabulary.get('words', []))} words")
             else:
-                logger.error(f"Failed to load vocabulary. Status code: {response.status_code}")
+                logger.error(f"Failed to load vocabulary of group {group_id}")
                 self.vocabulary = {"words": []}
         except Exception as e:
             logger.error(f"Error loading vocabulary: {str(e)}")
@@ -0,0 +1,56 @@
+import json
+import logging
+import os
+
+import requests
+
+logger = logging.getLogger('japanese_app')
+
+API_URL = os.getenv('LANG_PORTAL_URL', 'http://localhost:5000')
+CACHE_DIR = os.getenv('VOCABULARY_CACHE_DIR', '.vocabulary_cache')
+
+def _cache_paths(group_id):
+    base = os.path.join(CACHE_DIR, f'group_{group_id}')
+    return base + '.json', base + '.etag'
+
+def load_group_vocabulary(group_id, timeout=10):
+    """Load a group's words from the lang-portal snapshot endpoint.
+
+    The snapshot is kept on disk with its ETag and revalidated on every call,
+    so an unchanged group costs one 304 instead of a download. Falls back to
+    the cached copy when the API can't be reached. Returns the snapshot
+    ({"group_id", "group_name", "words": [...]}) or None.
+    """
+    data_path, etag_path = _cache_paths(group_id)
+    headers = {}
+    if os.path.exists(data_path) and os.path.exists(etag_path):
+        with open(etag_path, 'r') as f:
+            headers['If-None-Match'] = f'"{f.read().strip()}"'
+
+    url = f'{API_URL}/api/groups/{group_id}/snapshot'
+    try:
+        response = requests.get(url, headers=headers, timeout=timeout)
+    except requests.exceptions.RequestException as e:
+        logger.error(f"Failed to fetch {url}: {e}")
+        response = None
+
+    if response is not None and response.status_code == 200:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        with open(data_path, 'wb') as f:
+            f.write(response.content)
+        with open(etag_path, 'w') as f:
+            f.write(response.headers.get('ETag', '').strip('"'))
+        logger.info(f"Downloaded vocabulary snapshot of group {group_id}")
+        return response.json()
+
+    if response is not None and response.status_code == 304:
+        logger.info(f"Vocabulary snapshot of group {group_id} is up to date")
+    elif response is not None:
+        logger.error(f"API request failed with status code: {response.status_code}")
+        if response.status_code == 404:
+            return None
+
+    if os.path.exists(data_path):
+        with open(data_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return None